@@ -0,0 +1,107 @@
+"""
+Synthetic, offline forcing and land fixtures for the benchmarks.
+
+The files mimic the layouts the loaders see in production: OSCAR interim
+currents with variables dimensioned (time, lon, lat), and hourly ERA5 10 m
+wind with `valid_time` and descending `latitude`. No CDS or NOAA access
+is needed.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+
+# Idealized continents (west, south, east, north) in 0-360 longitudes
+CONTINENTS = (
+    (235.0, 10.0, 300.0, 60.0),   # North America
+    (280.0, -55.0, 325.0, 10.0),  # South America
+    (100.0, 0.0, 145.0, 60.0),    # East Asia
+    (115.0, -38.0, 150.0, -12.0),  # Australia
+    (200.0, 19.0, 205.0, 22.0),   # Hawaii-sized island
+)
+
+
+def land_geometry():
+    """Union of the idealized continents as a shapely geometry."""
+    from shapely import box, union_all
+
+    boxes = []
+    for west, south, east, north in CONTINENTS:
+        # LandMask rasterizes in -180..180
+        west, east = ((west + 180) % 360) - 180, ((east + 180) % 360) - 180
+        if west <= east:
+            boxes.append(box(west, south, east, north))
+        else:
+            boxes += [box(west, south, 180, north), box(-180, south, east, north)]
+    return union_all(boxes)
+
+
+def _gyre_field(lons, lats, phase):
+    lon, lat = np.meshgrid(np.radians(lons), np.radians(lats), indexing='ij')
+    u = 0.3 * np.cos(3 * lat) * np.cos(lon + phase)
+    v = 0.1 * np.sin(2 * lon - phase) * np.cos(lat)
+    return u, v
+
+
+def write_oscar(path, start=datetime(2020, 1, 1), records=4, resolution=0.25):
+    """OSCAR-like currents: float32 u, v dimensioned (time, lon, lat), 1-day records."""
+    from netCDF4 import Dataset
+
+    lons = np.arange(0, 360, resolution)
+    lats = np.arange(-89.75, 89.76, resolution)
+    with Dataset(path, 'w') as nc:
+        nc.createDimension('time', records)
+        nc.createDimension('lon', len(lons))
+        nc.createDimension('lat', len(lats))
+        time = nc.createVariable('time', 'f8', ('time',))
+        time.units = f'days since {start:%Y-%m-%d}'
+        time[:] = np.arange(records)
+        nc.createVariable('lon', 'f8', ('lon',))[:] = lons
+        nc.createVariable('lat', 'f8', ('lat',))[:] = lats
+        u = nc.createVariable('u', 'f4', ('time', 'lon', 'lat'))
+        v = nc.createVariable('v', 'f4', ('time', 'lon', 'lat'))
+        for k in range(records):
+            u[k], v[k] = _gyre_field(lons, lats, 0.1 * k)
+    return path
+
+
+def write_era5(path, start=datetime(2025, 2, 12), hours=24, resolution=0.25):
+    """ERA5-like hourly 10 m wind with `valid_time` and descending `latitude`."""
+    from netCDF4 import Dataset
+
+    lons = np.arange(0, 360, resolution)
+    lats = np.arange(90, -90.01, -resolution)
+    with Dataset(path, 'w') as nc:
+        nc.createDimension('valid_time', hours)
+        nc.createDimension('latitude', len(lats))
+        nc.createDimension('longitude', len(lons))
+        time = nc.createVariable('valid_time', 'i8', ('valid_time',))
+        time.units = f'hours since {start:%Y-%m-%d}'
+        time[:] = np.arange(hours)
+        nc.createVariable('latitude', 'f8', ('latitude',))[:] = lats
+        nc.createVariable('longitude', 'f8', ('longitude',))[:] = lons
+        u10 = nc.createVariable('u10', 'f4', ('valid_time', 'latitude', 'longitude'))
+        v10 = nc.createVariable('v10', 'f4', ('valid_time', 'latitude', 'longitude'))
+        for k in range(hours):
+            u, v = _gyre_field(lons, lats, 0.05 * k)
+            u10[k], v10[k] = 20 * u.T, 20 * v.T
+    return path
+
+
+def build_fixtures(directory):
+    """Write (or reuse) the fixture files in `directory`; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        'oscar': os.path.join(directory, 'oscar_fixture.nc'),
+        'era5': os.path.join(directory, 'era5_fixture.nc'),
+    }
+    if not os.path.exists(paths['oscar']):
+        write_oscar(paths['oscar'])
+    if not os.path.exists(paths['era5']):
+        write_era5(paths['era5'])
+    return paths
+
+
+def ocean_positions(n, rng):
+    """`n` positions spread over the open Pacific, including near-coast ones."""
+    return np.column_stack((rng.uniform(145, 235, n), rng.uniform(-10, 55, n)))
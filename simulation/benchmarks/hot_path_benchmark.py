@@ -0,0 +1,175 @@
+"""
+Benchmark and regression gate for the simulation hot paths.
+
+Measures, against synthetic local fixtures (see `fixtures.py`):
+
+- tracker construction time
+- single-step `EnsembleTracker.update()` cost
+- `is_on_land`, `get_coastal_repulsion` and `is_approaching_land` throughput
+- current and wind sampling throughput, per point and batched
+- peak traced memory for N particles over T steps
+
+Results are written as JSON. Passing `--baseline` compares every timing and
+memory figure against an earlier result file and exits with status 1 when
+any of them regressed by more than `--tolerance`.
+
+Usage:
+    python benchmarks/hot_path_benchmark.py --json results.json
+    python benchmarks/hot_path_benchmark.py --baseline results.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ensemble_tracker import EnsembleTracker
+from fixtures import build_fixtures, land_geometry, ocean_positions
+from land_mask import LandMask
+from ocean_data import OceanCurrentData
+from wind_data import WindData
+
+
+def measure(function, repeat=5):
+    """Median and best wall time of `repeat` calls, in seconds."""
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - begin)
+    return float(np.median(times)), float(min(times))
+
+
+class Suite:
+    """Collects benchmark results keyed by `name[n=...]`."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def time(self, name, function, n=1, repeat=None):
+        median, best = measure(function, repeat or self.repeat)
+        key = f'{name}[n={n}]'
+        self.results[key] = {'seconds': median, 'best_seconds': best,
+                             'per_second': n / median if median > 0 else float('inf')}
+        print(f"{key:<40} {median * 1e3:>10.3f} ms {n / median:>14,.0f} /s")
+
+    def memory(self, name, function, n, steps):
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        key = f'{name}[n={n},steps={steps}]'
+        self.results[key] = {'peak_bytes': peak}
+        print(f"{key:<40} {peak / 2 ** 20:>10.1f} MiB")
+
+
+def run_suite(sizes, steps, repeat, fixture_dir, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = build_fixtures(fixture_dir)
+
+    print("Preparing land mask and forcing caches...")
+    land_mask = LandMask(resolution=0.1, geometry=land_geometry())
+    ocean_data = OceanCurrentData()
+    ocean_data.load_cache(paths['oscar'] + '.fieldcache', source=paths['oscar'])
+    wind_data = WindData()
+    wind_data.load_cache(paths['era5'] + '.fieldcache', source=paths['era5'])
+
+    def tracker(positions, **kwargs):
+        return EnsembleTracker(positions, rng=seed, land_mask=land_mask,
+                               ocean_data=ocean_data, wind_data=wind_data, **kwargs)
+
+    suite = Suite(repeat)
+    print(f"\n{'benchmark':<40} {'median':>13} {'throughput':>17}")
+
+    # Per-point calls, as PlasticPathTracker makes them
+    points = ocean_positions(1000, rng)
+    suite.time('current_per_point', lambda: [ocean_data.get_current_velocity(p, None) for p in points],
+               n=len(points))
+    suite.time('wind_per_point', lambda: [wind_data.get_wind_velocity(p) for p in points],
+               n=len(points))
+
+    for n in sizes:
+        positions = ocean_positions(n, rng)
+        velocities = rng.normal(0, 0.3, positions.shape)
+        ensemble = tracker(positions)
+
+        suite.time('tracker_construction', lambda: tracker(positions), n=n)
+        suite.time('current_batched', lambda: ocean_data.get_current_velocities(positions), n=n)
+        suite.time('wind_batched', lambda: wind_data.get_wind_velocities(positions), n=n)
+        suite.time('is_on_land', lambda: ensemble.is_on_land(positions), n=n)
+        suite.time('coastal_repulsion', lambda: ensemble.get_coastal_repulsion(positions), n=n)
+        suite.time('is_approaching_land',
+                   lambda: ensemble.is_approaching_land(positions, velocities), n=n)
+        suite.time('update', ensemble.update, n=n)
+
+        suite.memory('peak_memory', lambda: tracker(positions).run(steps), n=n, steps=steps)
+
+    return suite.results
+
+
+def compare(results, baseline, tolerance):
+    """List of regressions beyond `tolerance` (fractional) versus `baseline`."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        # Best-of-N times are far less noisy than medians for short calls
+        for metric in ('best_seconds', 'peak_bytes'):
+            if metric in result and metric in reference:
+                ratio = result[metric] / reference[metric] if reference[metric] else 1.0
+                if ratio > 1 + tolerance:
+                    regressions.append((key, metric, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--steps', type=int, default=20, help='Steps for the memory benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'ocean_map_bench'),
+                        help='Directory for the synthetic NetCDF fixtures')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this earlier results file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional slowdown or memory growth')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.steps, args.repeat, args.fixtures, args.seed)
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'sizes': args.sizes,
+        'steps': args.steps,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for key, metric, ratio in regressions:
+            print(f"REGRESSION {key} {metric}: {ratio:.2f}x baseline")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
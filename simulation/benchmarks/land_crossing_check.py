@@ -0,0 +1,98 @@
+"""
+Check that the near-coast prefilters of the land tests never skip land.
+
+`LandMask.first_crossing` and `EnsembleTracker.is_approaching_land` only
+sample positions that `LandMask.near_coast` keeps. This script compares
+both against the same sampling applied to every position, for short segments scattered around
+single-cell islands, including the diagonal corner case where a segment
+starts in the corner of a cell diagonal to the coast. Exits with status 1 on any mismatch.
+
+Usage:
+    python benchmarks/land_crossing_check.py --segments 20000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ensemble_tracker import EnsembleTracker
+from land_mask import LandMask
+from wind_data import WindData
+
+
+def reference_crossing(land_mask, start, end):
+    """`first_crossing` sampling applied to every segment, without prefiltering."""
+    delta = end - start
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    samples = np.ceil(length / land_mask.resolution).astype(np.int64) + 1
+    crossed = np.zeros(len(start), dtype=bool)
+    for n in np.unique(samples):
+        rows = np.flatnonzero(samples == n)
+        points = (start[rows, None, :]
+                  + delta[rows, None, :] * (np.arange(1, n + 1) / n)[None, :, None])
+        crossed[rows] = land_mask.is_on_land(
+            points[..., 0], np.clip(points[..., 1], -89.75, 89.75)).any(axis=1)
+    return crossed
+
+
+def reference_approach(tracker, positions, velocities, time_steps=10):
+    """`is_approaching_land` probes applied to every particle."""
+    distances = np.arange(1, time_steps + 1) * tracker.dt
+    scale = distances[:, None] * np.array(tracker.APPROACH_FRACTIONS)[None, :]
+    probes = positions[:, None, None, :] + velocities[:, None, None, :] * scale[None, :, :, None]
+    probes = tracker.wrap_positions(probes)
+    return tracker.land_mask.is_on_land(probes[..., 0], probes[..., 1]).any(axis=(1, 2))
+
+
+def check(resolution, segments, rng):
+    """Mismatch counts for one raster resolution."""
+    from shapely import box
+
+    # One land cell, so the distance grid is exactly the centre-to-centre distance
+    land_mask = LandMask(resolution=resolution,
+                         geometry=box(10, 10, 10 + resolution, 10 + resolution))
+    centre = 10 + resolution / 2
+
+    start = centre + rng.uniform(-3, 3, (segments, 2)) * resolution
+    end = start + rng.normal(0, 0.5, (segments, 2)) * resolution
+    # Diagonal corner case: just outside the cell corner, stepping onto land
+    corner = np.array([[10 - 0.01 * resolution, 10 - 0.01 * resolution]])
+    start = np.vstack([start, corner])
+    end = np.vstack([end, corner + 0.06 * resolution])
+
+    crossed, _, _ = land_mask.first_crossing(start, end)
+    missed_crossings = int(np.count_nonzero(reference_crossing(land_mask, start, end) & ~crossed))
+
+    tracker = EnsembleTracker(start, dt=1.0, land_mask=land_mask, wind_data=WindData())
+    velocities = (end - start) / 10
+    approaching, _ = tracker.is_approaching_land(start, velocities)
+    expected = reference_approach(tracker, start, velocities)
+    missed_approaches = int(np.count_nonzero(expected & ~approaching))
+    return missed_crossings, missed_approaches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--segments', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failed = False
+    print(f"{'resolution':>10} {'missed crossings':>17} {'missed approaches':>18}")
+    for resolution in (1.0, 0.25, 0.1):
+        crossings, approaches = check(resolution, args.segments, rng)
+        print(f"{resolution:>10g} {crossings:>17d} {approaches:>18d}")
+        failed |= bool(crossings or approaches)
+
+    if failed:
+        print("FAILED: a near-coast prefilter skipped positions that reach land")
+        sys.exit(1)
+    print("Prefilters kept every position that reaches land")
+
+
+if __name__ == "__main__":
+    main()
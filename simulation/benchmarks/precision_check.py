@@ -0,0 +1,158 @@
+"""
+Validate float32 mode against float64 trajectories.
+
+Runs the same ensemble (same seed, so identical diffusion draws) twice over
+the synthetic fixtures of `fixtures.py`: once with float64 forcing caches
+and particle state, once with `precision='float32'`. At every checkpoint it
+reports the great-circle separation between the two runs, and at the end
+the wall time per step and the bytes held by forcing fields and particle
+state in each mode.
+
+Exits with status 1 when the median separation at the end exceeds
+`--max-median-km` or the 99th percentile exceeds `--max-p99-km`, so the
+check can gate changes to the float32 paths.
+
+Usage:
+    python benchmarks/precision_check.py --particles 20000 --days 60 --json precision.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ensemble_tracker import EnsembleTracker
+from field_cache import default_cache_dir
+from fixtures import build_fixtures, land_geometry, ocean_positions
+from land_mask import LandMask
+from ocean_data import OceanCurrentData
+from wind_data import WindData
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def separation_km(a, b):
+    """Great-circle distance between matching rows of two (N, 2) position arrays."""
+    lon1, lat1 = np.radians(np.asarray(a, dtype=np.float64)).T
+    lon2, lat2 = np.radians(np.asarray(b, dtype=np.float64)).T
+    h = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def field_bytes(*datasets):
+    """Bytes of forcing field data referenced by `OceanCurrentData`/`WindData` objects."""
+    total = 0
+    for data in datasets:
+        sampler = data.sampler
+        if hasattr(sampler, '_chunk_sampler'):
+            total += sum(sampler._chunk_sampler(c).uv.nbytes
+                         for c in range(len(sampler.meta['chunks'])))
+        elif hasattr(sampler, 'uv'):
+            total += sampler.uv.nbytes
+    return total
+
+
+def load_forcing(paths, dtype):
+    """Field-cached fixture currents and wind stored as `dtype`."""
+    ocean_data = OceanCurrentData(dtype=dtype)
+    ocean_data.load_cache(default_cache_dir(paths['oscar'], dtype), source=paths['oscar'])
+    wind_data = WindData(dtype=dtype)
+    wind_data.load_cache(default_cache_dir(paths['era5'], dtype), source=paths['era5'])
+    return ocean_data, wind_data
+
+
+def run_check(particles, days, dt, every, fixture_dir, seed=0, **tracker_kwargs):
+    """Step float64 and float32 trackers side by side; returns the report dict."""
+    paths = build_fixtures(fixture_dir)
+    land_mask = LandMask(resolution=0.1, geometry=land_geometry())
+    start = ocean_positions(particles, np.random.default_rng(seed))
+
+    trackers = {}
+    forcing = {}
+    for precision in ('float64', 'float32'):
+        forcing[precision] = load_forcing(paths, precision)
+        ocean_data, wind_data = forcing[precision]
+        trackers[precision] = EnsembleTracker(
+            start, dt=dt, rng=seed, land_mask=land_mask, ocean_data=ocean_data,
+            wind_data=wind_data, precision=precision, **tracker_kwargs)
+
+    num_steps = int(round(days / dt))
+    seconds = {precision: 0.0 for precision in trackers}
+    checkpoints = []
+    print(f"{'day':>6} {'median km':>10} {'p99 km':>10} {'max km':>10}")
+    for step in range(1, num_steps + 1):
+        for precision, tracker in trackers.items():
+            begin = time.perf_counter()
+            tracker.update()
+            seconds[precision] += time.perf_counter() - begin
+        if step % every == 0 or step == num_steps:
+            distance = separation_km(trackers['float64'].positions, trackers['float32'].positions)
+            checkpoint = {
+                'day': step * dt,
+                'median_km': float(np.median(distance)),
+                'p99_km': float(np.percentile(distance, 99)),
+                'max_km': float(distance.max()),
+            }
+            checkpoints.append(checkpoint)
+            print(f"{checkpoint['day']:>6g} {checkpoint['median_km']:>10.4f} "
+                  f"{checkpoint['p99_km']:>10.4f} {checkpoint['max_km']:>10.4f}")
+
+    modes = {}
+    for precision, tracker in trackers.items():
+        modes[precision] = {
+            'seconds_per_step': seconds[precision] / num_steps,
+            'field_bytes': field_bytes(*forcing[precision]),
+            'state_bytes': tracker.positions.nbytes,
+        }
+        tracker.close()
+    return {'particles': particles, 'days': days, 'dt': dt,
+            'checkpoints': checkpoints, 'modes': modes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--particles', type=int, default=20000)
+    parser.add_argument('--days', type=float, default=60.0)
+    parser.add_argument('--dt', type=float, default=1.0)
+    parser.add_argument('--every', type=int, default=10, help='Steps between checkpoints')
+    parser.add_argument('--integrator', default='euler')
+    parser.add_argument('--land-interaction', choices=('avoid', 'beach'), default='beach')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'ocean_map_bench'),
+                        help='Directory for the synthetic NetCDF fixtures')
+    parser.add_argument('--max-median-km', type=float, default=1.0)
+    parser.add_argument('--max-p99-km', type=float, default=25.0)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    report = run_check(args.particles, args.days, args.dt, args.every, args.fixtures,
+                       seed=args.seed, integrator=args.integrator,
+                       land_interaction=args.land_interaction)
+
+    print(f"\n{'precision':>10} {'ms/step':>9} {'fields MiB':>11} {'state MiB':>10}")
+    for precision, mode in report['modes'].items():
+        print(f"{precision:>10} {mode['seconds_per_step'] * 1e3:>9.2f} "
+              f"{mode['field_bytes'] / 2 ** 20:>11.1f} {mode['state_bytes'] / 2 ** 20:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.json}")
+
+    final = report['checkpoints'][-1]
+    if final['median_km'] > args.max_median_km or final['p99_km'] > args.max_p99_km:
+        print(f"FAILED: float32 drifted {final['median_km']:.3f} km (median), "
+              f"{final['p99_km']:.3f} km (p99) from float64")
+        sys.exit(1)
+    print(f"float32 within {args.max_median_km:g} km median / {args.max_p99_km:g} km p99 of float64")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Check that a killed and resumed campaign release matches an uninterrupted run.
+
+Runs one release of `campaign.py` over the synthetic fixtures of
+`fixtures.py` twice for each integrator and land interaction: once
+straight through, and once killed after a checkpoint and resumed from it.
+Releases are seeded deterministically, so the two trajectories must be
+identical. Exits with status 1 on any difference.
+
+Usage:
+    python benchmarks/resume_check.py --steps 30 --checkpoint-every 7
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import campaign
+from ensemble_tracker import EnsembleTracker
+from field_cache import default_cache_dir, open_field_cache
+from fixtures import build_fixtures, land_geometry
+from integrators import RK45Integrator
+from land_mask import LandMask
+
+# Next to the fixture island, so beaching and avoidance both come into play
+RELEASE = {'release_id': 'island', 'lon': 198.5, 'lat': 20.5}
+
+
+RK45_ATOL = 1e-10
+
+
+class Killed(Exception):
+    """Raised in place of the worker being killed mid-release."""
+
+
+def run_release(output_dir, config, kill_after=None):
+    """Run `RELEASE` in-process, optionally raising `Killed` after `kill_after` steps."""
+    os.makedirs(output_dir, exist_ok=True)
+    config = dict(config, output_dir=output_dir)
+    if config['integrator'] == 'rk45':
+        # A fresh instance per run, as in a new worker process, with a tight
+        # enough tolerance that particles keep sub-stepping across steps
+        config['integrator'] = RK45Integrator(atol=RK45_ATOL)
+    campaign._WORKER['config'] = config
+    update = EnsembleTracker.update
+    calls = [0]
+
+    def killable_update(tracker):
+        if kill_after is not None and calls[0] == kill_after:
+            raise Killed
+        calls[0] += 1
+        update(tracker)
+
+    EnsembleTracker.update = killable_update
+    try:
+        _, path = campaign._run_release(RELEASE)
+    finally:
+        EnsembleTracker.update = update
+    with np.load(path) as result:
+        return result['path_history']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--particles', type=int, default=500)
+    parser.add_argument('--steps', type=int, default=30)
+    parser.add_argument('--checkpoint-every', type=int, default=7)
+    parser.add_argument('--dt', type=float, default=1.0)
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'ocean_map_bench'),
+                        help='Directory for the synthetic NetCDF fixtures')
+    args = parser.parse_args()
+
+    paths = build_fixtures(args.fixtures)
+    ocean_cache = default_cache_dir(paths['oscar'])
+    wind_cache = default_cache_dir(paths['era5'])
+    open_field_cache(paths['oscar'], ocean_cache)
+    open_field_cache(paths['era5'], wind_cache, u_var='u10', v_var='v10', daily_mean=True)
+    ocean_data, wind_data = campaign.load_forcing(ocean_cache, wind_cache)
+    campaign._WORKER.update(land_mask=LandMask(resolution=0.1, geometry=land_geometry()),
+                            ocean_data=ocean_data, wind_data=wind_data)
+
+    # Killed one step before the second checkpoint, so the resume replays steps
+    kill_after = 2 * args.checkpoint_every - 1
+    failed = False
+    print(f"{'integrator':>10} {'land':>6} {'max difference':>15}")
+    for integrator in ('euler', 'rk45'):
+        for land_interaction in ('avoid', 'beach'):
+            config = {
+                'base_seed': 0, 'dt': args.dt, 'integrator': integrator,
+                'land_interaction': land_interaction, 'num_particles': args.particles,
+                'num_steps': args.steps, 'spread': 0.5,
+                'checkpoint_every': args.checkpoint_every,
+            }
+            work_dir = tempfile.mkdtemp(prefix='resume_check_')
+            try:
+                straight = run_release(os.path.join(work_dir, 'straight'),
+                                       dict(config, checkpoint_every=0))
+                resumed_dir = os.path.join(work_dir, 'resumed')
+                try:
+                    run_release(resumed_dir, config, kill_after=kill_after)
+                except Killed:
+                    pass
+                resumed = run_release(resumed_dir, config)
+            finally:
+                shutil.rmtree(work_dir)
+
+            difference = (float(np.abs(straight - resumed).max())
+                          if straight.shape == resumed.shape else np.inf)
+            print(f"{integrator:>10} {land_interaction:>6} {difference:>15.3g}")
+            failed |= difference != 0
+
+    if failed:
+        print("FAILED: resumed releases diverged from uninterrupted runs")
+        sys.exit(1)
+    print("Resumed releases match uninterrupted runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Run large release campaigns across a process pool.
+
+A campaign is a table of releases (CSV or list of dicts) with columns:
+
+    release_id, lon, lat, start_date, num_particles, num_steps[, seed]
+
+Each worker process loads the land mask and the (memory-mapped) forcing
+caches once, then runs any number of releases. Every release gets its own
+deterministic random stream derived from the campaign seed and its
+`release_id`, so results do not depend on worker count or scheduling.
+Results are written as `<release_id>.npz` as soon as they finish, and long
+releases also write periodic checkpoints, so a killed campaign resumes where
+it stopped.
+
+Usage:
+    python campaign.py releases.csv results/ --workers 8 \\
+        --ocean-cache cache/oscar --wind-cache cache/era5
+"""
+import argparse
+import csv
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import numpy as np
+
+from ensemble_tracker import EnsembleTracker
+from land_mask import LandMask
+from ocean_data import OceanCurrentData
+from trajectory_store import TrajectoryStore
+from wind_data import WindData
+
+DEFAULT_WIND_DATE = (2025, 2, 12)
+
+# Per-process shared state, set up once by `_init_worker`
+_WORKER = {}
+
+
+def load_releases(path):
+    """Read a release table from CSV into a list of dicts."""
+    with open(path, newline='') as f:
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+def release_seed(base_seed, release):
+    """Deterministic seed sequence for a release, independent of scheduling."""
+    if release.get('seed') not in (None, ''):
+        return np.random.SeedSequence(int(release['seed']))
+    key = hashlib.sha256(str(release['release_id']).encode()).digest()
+    return np.random.SeedSequence([base_seed, int.from_bytes(key[:8], 'little')])
+
+
+def load_forcing(ocean_cache=None, wind_cache=None, ocean_nests=(), wind_day=None):
+    """
+    Load shared ocean and wind forcing from field caches.
+
+    Regional `ocean_nests` are nested inside `ocean_cache`; without a wind
+    cache the default ERA5 day is fetched through the wind provider.
+    `wind_day` restricts a multi-day wind cache to one date.
+    """
+    ocean_data = OceanCurrentData()
+    if ocean_nests:
+        # Regional caches first, the global cache (if any) as the fallback level
+        domains = list(ocean_nests)
+        if ocean_cache:
+            domains.append(ocean_cache)
+        ocean_data.load_nested(domains)
+    elif ocean_cache:
+        ocean_data.load_cache(ocean_cache)
+
+    wind_data = WindData()
+    if wind_cache:
+        wind_data.load_cache(wind_cache, day=wind_day)
+    else:
+        wind_data.download_era5_data(*DEFAULT_WIND_DATE)
+    return ocean_data, wind_data
+
+
+def default_wind_cache():
+    """
+    Fetch the default ERA5 day and build its field cache; returns the
+    cache directory and the date to select from it.
+
+    Campaigns call this once in the parent process, so worker processes
+    only map the finished cache instead of fetching and building it
+    concurrently in the same directory.
+    """
+    wind_data = WindData()
+    wind_data.download_era5_data(*DEFAULT_WIND_DATE, strict=True)
+    return wind_data.cache_dir, date(*DEFAULT_WIND_DATE)
+
+
+def _init_worker(config):
+    """Load forcing and land data once per worker process."""
+    ocean_data, wind_data = load_forcing(config['ocean_cache'], config['wind_cache'],
+                                         config['ocean_nests'], config['wind_day'])
+
+    _WORKER.update(
+        config=config,
+        land_mask=LandMask(resolution=config['land_resolution']),
+        ocean_data=ocean_data,
+        wind_data=wind_data,
+    )
+
+
+def _atomic_save(path, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _run_release(release):
+    """Run one release inside a worker and return (release_id, result path)."""
+    config = _WORKER['config']
+    release_id = str(release['release_id'])
+    result_path = os.path.join(config['output_dir'], f'{release_id}.npz')
+    checkpoint_path = os.path.join(config['output_dir'], f'{release_id}.checkpoint')
+
+    rng = np.random.default_rng(release_seed(config['base_seed'], release))
+    num_particles = int(release.get('num_particles') or config['num_particles'])
+    num_steps = int(release.get('num_steps') or config['num_steps'])
+    start_date = release.get('start_date')
+    start_date = datetime.fromisoformat(start_date) if start_date else None
+
+    spread = config['spread']
+    starts = np.column_stack((
+        float(release['lon']) + rng.normal(0, spread, num_particles),
+        float(release['lat']) + rng.normal(0, spread, num_particles),
+    ))
+    tracker = EnsembleTracker(
+        starts, dt=config['dt'], rng=rng, integrator=config['integrator'],
+        land_interaction=config['land_interaction'], land_mask=_WORKER['land_mask'],
+        ocean_data=_WORKER['ocean_data'], wind_data=_WORKER['wind_data'], start_date=start_date,
+    )
+
+    # Resume from the last checkpoint of this release, if any. Besides the
+    # positions and random stream, particle status and integrator state
+    # (RK45 step sizes) are restored so the run continues exactly
+    step = 0
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'rb') as f:
+            state = pickle.load(f)
+        step = state['step']
+        tracker.positions = state['positions']
+        tracker.status = state['status']
+        tracker.integrator = state['integrator']
+        tracker.trajectory = TrajectoryStore(tracker.num_particles)
+        for k, positions in enumerate(state['path_history']):
+            tracker.trajectory.append(k * tracker.dt, positions)
+        tracker.elapsed_time = state['elapsed_time']
+        tracker.rng.bit_generator.state = state['rng_state']
+
+    while step < num_steps:
+        tracker.update()
+        step += 1
+        if config['checkpoint_every'] and step % config['checkpoint_every'] == 0 and step < num_steps:
+            state = {
+                'step': step,
+                'positions': tracker.positions,
+                'status': tracker.status,
+                'integrator': tracker.integrator,
+                'path_history': tracker.path_history,
+                'elapsed_time': tracker.elapsed_time,
+                'rng_state': tracker.rng.bit_generator.state,
+            }
+            _atomic_save(checkpoint_path, lambda f: pickle.dump(state, f))
+
+    _atomic_save(result_path, lambda f: np.savez_compressed(
+        f, path_history=tracker.path_history, release_id=release_id,
+        elapsed_time=tracker.elapsed_time))
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return release_id, result_path
+
+
+def iter_campaign(releases, output_dir, workers=None, ocean_cache=None, wind_cache=None,
+                  ocean_nests=None, land_resolution=0.1, base_seed=0, dt=1, integrator='euler',
+                  land_interaction='avoid', num_particles=1000, num_steps=500, spread=0.1,
+                  checkpoint_every=50):
+    """
+    Run a campaign and yield `(release_id, result_path)` as releases finish.
+
+    Releases whose result file already exists are skipped, so calling this
+    again with the same `output_dir` resumes an interrupted campaign.
+
+    Parameters
+    ----------
+    releases : list of dict
+        Release table (see module docstring)
+    output_dir : str
+        Directory for results and checkpoints
+    workers : int, optional
+        Number of worker processes (defaults to the CPU count)
+    ocean_cache, wind_cache : str, optional
+        Field cache directories shared by all workers. Without a wind cache
+        the default ERA5 day is fetched and cached once before the workers
+        start.
+    ocean_nests : list of str, optional
+        Regional high-resolution current caches nested inside `ocean_cache`;
+        each worker opens one only when particles enter its bounds
+    land_resolution : float
+        Land mask resolution in degrees
+    base_seed : int
+        Campaign seed combined with each release_id
+    dt : float
+        Time step in days
+    integrator : str
+        Integrator name passed to EnsembleTracker
+    land_interaction : str
+        'avoid' or 'beach', passed to EnsembleTracker
+    num_particles, num_steps : int
+        Defaults for releases that do not specify them
+    spread : float
+        Standard deviation (degrees) of the initial particle cloud
+    checkpoint_every : int
+        Steps between in-release checkpoints (0 disables them)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending = [release for release in releases
+               if not os.path.exists(os.path.join(output_dir, f"{release['release_id']}.npz"))]
+    skipped = len(releases) - len(pending)
+    if skipped:
+        print(f"Resuming campaign: {skipped} of {len(releases)} releases already done")
+    if not pending:
+        return
+
+    # Build the land mask and wind caches once before workers start reading them
+    LandMask(resolution=land_resolution)
+    wind_day = None
+    if not wind_cache:
+        wind_cache, wind_day = default_wind_cache()
+
+    config = {
+        'output_dir': output_dir,
+        'ocean_cache': ocean_cache,
+        'wind_cache': wind_cache,
+        'wind_day': wind_day,
+        'ocean_nests': list(ocean_nests or []),
+        'land_resolution': land_resolution,
+        'base_seed': base_seed,
+        'dt': dt,
+        'integrator': integrator,
+        'land_interaction': land_interaction,
+        'num_particles': num_particles,
+        'num_steps': num_steps,
+        'spread': spread,
+        'checkpoint_every': checkpoint_every,
+    }
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config,)) as pool:
+        futures = [pool.submit(_run_release, release) for release in pending]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_campaign(releases, output_dir, **kwargs):
+    """Run a campaign to completion, printing progress; returns result paths."""
+    results = {}
+    for release_id, path in iter_campaign(releases, output_dir, **kwargs):
+        results[release_id] = path
+        print(f"Finished release {release_id} ({len(results)} done) -> {path}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a release campaign across a process pool.')
+    parser.add_argument('releases', help='CSV release table')
+    parser.add_argument('output_dir', help='Directory for results and checkpoints')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--ocean-cache')
+    parser.add_argument('--wind-cache')
+    parser.add_argument('--ocean-nest', action='append', default=[],
+                        help='Regional current cache nested in --ocean-cache (repeatable)')
+    parser.add_argument('--land-resolution', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dt', type=float, default=1)
+    parser.add_argument('--integrator', default='euler')
+    parser.add_argument('--land-interaction', choices=('avoid', 'beach'), default='avoid')
+    parser.add_argument('--checkpoint-every', type=int, default=50)
+    args = parser.parse_args()
+
+    run_campaign(load_releases(args.releases), args.output_dir, workers=args.workers,
+                 ocean_cache=args.ocean_cache, wind_cache=args.wind_cache,
+                 ocean_nests=args.ocean_nest,
+                 land_resolution=args.land_resolution, base_seed=args.seed, dt=args.dt,
+                 integrator=args.integrator, land_interaction=args.land_interaction,
+                 checkpoint_every=args.checkpoint_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Spectral, time-evolving eddy fields.
+
+`SpectralEddyField` synthesizes divergence-free velocity fields from a
+random stream function whose spectrum peaks at a prescribed eddy length
+scale. The random forcing evolves as an AR(1) process in spectral space,
+so the eddies decorrelate over `decorrelation_time` days instead of
+staying frozen for the whole run. Only the band of wavenumbers where the
+spectrum is non-negligible is drawn and evolved, so each update costs one
+batched single-precision inverse FFT for u and v. The field is kept as two snapshots
+`interval` days apart and sampled with the shared bilinear `GridSampler`,
+interpolating linearly in time between them.
+"""
+import numpy as np
+from scipy import fft
+
+from field_sampler import GridSampler
+
+
+class SpectralEddyField:
+    """
+    Global eddy velocity field from a stream function with a Gaussian spectrum.
+
+    Velocities are in degrees per day, like the other forcing terms.
+    """
+
+    def __init__(self, resolution=0.25, length_scale=2.0, amplitude=0.1,
+                 decorrelation_time=20.0, interval=1.0, rng=None):
+        """
+        Parameters
+        ----------
+        resolution : float
+            Grid spacing in degrees
+        length_scale : float
+            Typical eddy radius in degrees (peak of the spectrum)
+        amplitude : float
+            RMS of each velocity component in degrees per day
+        decorrelation_time : float or None
+            e-folding time of the AR(1) evolution in days; None freezes the field
+        interval : float
+            Days between regenerated snapshots
+        rng : numpy.random.Generator, int or None
+            Random generator (or seed)
+        """
+        self.resolution = float(resolution)
+        self.length_scale = float(length_scale)
+        self.amplitude = float(amplitude)
+        self.decorrelation_time = decorrelation_time
+        self.interval = float(interval)
+        self.rng = np.random.default_rng(rng)
+
+        self.nx = int(round(360 / self.resolution))
+        self.ny = int(round(180 / self.resolution))
+        size = self.nx * self.ny
+
+        # The Gaussian spectrum is negligible (< 1e-8) beyond |k| = 6 / L, so
+        # only that band of wavenumbers is drawn and evolved
+        ky = 2 * np.pi * np.fft.fftfreq(self.ny, d=self.resolution)
+        kx = 2 * np.pi * np.fft.rfftfreq(self.nx, d=self.resolution)
+        k_max = 6.0 / self.length_scale
+        self._band = np.ix_(np.flatnonzero(np.abs(ky) <= k_max),
+                            np.flatnonzero(kx <= k_max))
+        ky = ky[self._band[0]]
+        kx = kx[self._band[1]]
+
+        # Spectral filters mapping white noise to u = -dpsi/dy and v = dpsi/dx
+        psi = np.exp(-0.5 * (kx ** 2 + ky ** 2) * self.length_scale ** 2)
+        filters = np.stack((-1j * ky * psi, 1j * kx * psi))
+
+        # Normalize so each component has the requested RMS. With complex white
+        # noise of variance `size`, each kx > 0 coefficient and its implied
+        # conjugate contribute twice, and the kx = 0 column only its real part
+        weight = np.where(kx == 0, 0.5, 2.0)
+        variance = np.sum(weight * (ky * psi) ** 2) / size
+        self._filters = (filters * self.amplitude / np.sqrt(variance)).astype(np.complex64)
+
+        if decorrelation_time:
+            self.memory = np.exp(-self.interval / decorrelation_time)
+        else:
+            self.memory = 1.0
+
+        # Spectral state: band of unit white noise, evolved as AR(1)
+        self._state = self._noise()
+        self._spectrum = np.zeros((2, self.ny, self.nx // 2 + 1), dtype=np.complex64)
+
+        # Two snapshots (time, lat, lon + 1, 2) in the layout GridSampler expects
+        self._uv = np.empty((2, self.ny, self.nx + 1, 2), dtype=np.float32)
+        self.time = 0.0
+        self._write_snapshot(0)
+        self._advance()
+        self._write_snapshot(1)
+        self._build_sampler()
+
+    def _noise(self):
+        shape = (len(self._band[0]), self._band[1].size)
+        scale = np.sqrt(self.nx * self.ny / 2)
+        noise = self.rng.standard_normal(shape + (2,), dtype=np.float32)
+        return (noise[..., 0] + 1j * noise[..., 1]) * scale
+
+    def _write_snapshot(self, slot):
+        """Write the velocity of the current spectral state into `slot`."""
+        self._spectrum[(slice(None),) + self._band] = self._filters * self._state
+        u, v = fft.irfft2(self._spectrum, s=(self.ny, self.nx), workers=-1)
+        uv = self._uv[slot]
+        uv[:, :-1, 0] = u
+        uv[:, :-1, 1] = v
+        # Close the periodic grid by repeating the first longitude column
+        uv[:, -1] = uv[:, 0]
+
+    def _advance(self):
+        """Step the AR(1) process by one interval."""
+        if self.memory < 1.0:
+            self._state = (self.memory * self._state
+                           + np.sqrt(1 - self.memory ** 2) * self._noise())
+
+    def _build_sampler(self):
+        self.sampler = GridSampler.from_normalized(
+            self._uv, lon0=0.0, dlon=self.resolution,
+            lat0=-90 + self.resolution / 2, dlat=self.resolution, periodic=True,
+            times=[self.time, self.time + self.interval])
+
+    def advance_to(self, t):
+        """Regenerate snapshots until `t` (days) lies inside the current interval."""
+        if self.memory == 1.0:
+            return
+        while t >= self.time + self.interval:
+            self.time += self.interval
+            self._uv[0] = self._uv[1]
+            self._advance()
+            self._write_snapshot(1)
+            self._build_sampler()
+
+    def sample(self, lon, lat, t=None):
+        """Sample (u, v) at arrays of positions at elapsed time `t` (days)."""
+        if t is not None:
+            self.advance_to(np.max(t))
+        return self.sampler.sample(lon, lat, t)
+
+    def sample_positions(self, positions, t=None):
+        """Sample at (N, 2) positions and return an (N, 2) velocity array."""
+        if t is not None:
+            self.advance_to(np.max(t))
+        return self.sampler.sample_positions(positions, t)
@@ -0,0 +1,447 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter
+from eddies import SpectralEddyField
+from field_sampler import GridSampler
+from instrumentation import make_stats
+from forcing import days_since_epoch
+from integrators import get_integrator
+from land_mask import LandMask
+from trajectory_store import ACTIVE, BEACHED, OUT_OF_DOMAIN, RESUSPENDED, TrajectoryStore
+from ocean_data import OceanCurrentData
+from wind_data import WindData
+
+
+class EnsembleTracker:
+    """
+    Track many plastic particles at once.
+
+    All particle positions live in a single (N, 2) array and every physical
+    term (currents, wind, eddies, diffusion and land handling) is evaluated
+    over the whole array in each `update`, so the cost per step is a handful
+    of NumPy calls rather than a Python loop over particles.
+    """
+
+    # Look-ahead fractions used when checking for approaching land
+    APPROACH_FRACTIONS = (1.0, 0.25, 0.5, 0.75)
+
+    def __init__(self, start_positions, dt=1, use_real_currents=False, rng=None,
+                 land_mask=None, integrator='euler', ocean_data=None, wind_data=None,
+                 start_date=None, trajectory_path=None, record_every=1, density=None,
+                 eddies=None, stats=None, land_interaction='avoid', beaching_probability=1.0,
+                 resuspension_time=None, domain=None, backward=False, precision='float64'):
+        """
+        Initialize the ensemble tracker.
+
+        Parameters
+        ----------
+        start_positions : array_like
+            (N, 2) starting positions (longitude, latitude)
+        dt : float
+            Time step for simulation (in days)
+        use_real_currents : bool
+            Whether to use real NOAA current data
+        rng : numpy.random.Generator, int or None
+            Random generator (or seed) used for eddies and diffusion
+        land_mask : LandMask, optional
+            Precomputed land mask to share between trackers
+        integrator : str or Integrator
+            Time integrator for the deterministic drift: 'euler', 'rk2',
+            'rk4' or 'rk45' (adaptive), or an `Integrator` instance
+        ocean_data : OceanCurrentData, optional
+            Preloaded ocean currents (e.g. time-varying OSCAR series)
+        wind_data : WindData, optional
+            Preloaded wind data (e.g. time-varying ERA5 series)
+        start_date : datetime, optional
+            Release date, used to sample time-varying forcing
+        trajectory_path : str, optional
+            Stream trajectories to this .nc or .parquet file instead of
+            keeping them in memory
+        record_every : int
+            Record positions every `record_every` steps
+        density : DensityAccumulator, optional
+            Concentration grid updated with the positions after every step
+        eddies : SpectralEddyField or 'spectral', optional
+            Time-evolving eddy model; by default a static smoothed random
+            field is used
+        stats : bool or TrackerStats, optional
+            Collect per-stage timings and counters in `self.stats`
+        land_interaction : str
+            'avoid' steers particles away from land (repulsion, look-ahead
+            and safe-velocity search); 'beach' replaces all of that with one
+            raster crossing test per step and strands particles that reach
+            the coast
+        beaching_probability : float
+            Chance that a particle reaching the coast beaches ('beach' mode);
+            otherwise it stops at the last water point and stays active
+        resuspension_time : float, optional
+            Mean time in days before a beached particle is washed off again
+            (None keeps beached particles on the coast)
+        domain : tuple, optional
+            (west, east, south, north) in 0-360° longitudes; particles that
+            leave it are marked out-of-domain and stop moving
+        backward : bool
+            Integrate backwards in time from `start_date` (source
+            attribution); elapsed time then counts down from 0
+        precision : str
+            'float64' or 'float32' storage for particle positions and the
+            default forcing and eddy fields. Each step's position update is
+            still summed in float64 and rounded once into the state.
+        """
+        self.dt = dt
+        self.stats = make_stats(stats)
+        if land_interaction not in ('avoid', 'beach'):
+            raise ValueError(f"Unknown land_interaction '{land_interaction}' (use 'avoid' or 'beach')")
+        self.land_interaction = land_interaction
+        self.beaching_probability = beaching_probability
+        self.resuspension_time = resuspension_time
+        self.domain = domain
+        self.direction = -1 if backward else 1
+        self.elapsed_time = 0  # Track elapsed time in days
+        self.rng = np.random.default_rng(rng)
+        self.dtype = np.dtype(precision)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError(f"Unknown precision '{precision}' (use 'float64' or 'float32')")
+
+        # Particle state: one row per particle
+        self.positions = np.array(start_positions, dtype=self.dtype).reshape(-1, 2)
+        self.num_particles = len(self.positions)
+        self.status = np.full(self.num_particles, ACTIVE, dtype=np.int8)
+
+        # Diffusion coefficient (random motion)
+        self.D = 0.05
+
+        # Fraction of the 10 m wind transferred to the drift (windage)
+        self.windage = 0.02
+
+        # Integrator for currents, wind and eddies (diffusion stays Euler-Maruyama)
+        self.integrator = get_integrator(integrator)
+
+        # Forcing time in days since 1970-01-01 (None for static forcing)
+        self.start_time = days_since_epoch(start_date) if start_date is not None else None
+
+        # Initialize ocean current data
+        if ocean_data is None:
+            ocean_data = OceanCurrentData(use_real_data=use_real_currents, dtype=self.dtype)
+        self.ocean_data = ocean_data
+
+        # Initialize wind data (using known available date)
+        if wind_data is None:
+            wind_data = WindData(dtype=self.dtype)
+            wind_data.download_era5_data(2025, 2, 12)
+        self.wind_data = wind_data
+
+        # Rasterized land mask for land tests and coastal repulsion
+        self.land_mask = land_mask if land_mask is not None else LandMask()
+
+        # Move starting positions away from land if needed (~50km)
+        self.positions[self.is_on_land(self.positions), 0] += 0.5
+
+        # Columnar trajectory buffer (float32, chunked, optionally streamed)
+        self.trajectory = TrajectoryStore(self.num_particles, every=record_every,
+                                          path=trajectory_path)
+        self.trajectory.append(self.elapsed_time, self.positions)
+        self.density = density
+        if density is not None:
+            density.add(self.positions, time=self.elapsed_time)
+
+        # Initialize eddy fields
+        self.setup_eddies(eddies)
+
+    def setup_eddies(self, eddies=None):
+        """Setup eddy current fields."""
+        if eddies == 'spectral':
+            eddies = SpectralEddyField(rng=self.rng)
+        if eddies is not None:
+            self.eddy_sampler = eddies
+            return
+
+        lon = np.linspace(0, 360, 360)
+        lat = np.linspace(-90, 90, 180)
+        self.lon_grid, self.lat_grid = np.meshgrid(lon, lat)
+
+        random_field = self.rng.normal(0, 1, self.lon_grid.shape)
+        self.eddy_field_u = gaussian_filter(random_field, sigma=5) * 0.1
+        random_field = self.rng.normal(0, 1, self.lon_grid.shape)
+        self.eddy_field_v = gaussian_filter(random_field, sigma=5) * 0.1
+        self.eddy_sampler = GridSampler(lon, lat, self.eddy_field_u, self.eddy_field_v,
+                                        dtype=self.dtype)
+
+    @staticmethod
+    def wrap_positions(positions):
+        """Apply periodic longitude and clip latitude, in place."""
+        positions[..., 0] = np.mod(positions[..., 0], 360)
+        positions[..., 1] = np.clip(positions[..., 1], -89.75, 89.75)
+        return positions
+
+    def to_state(self, positions):
+        """Round wrapped positions to the state precision, keeping longitudes below 360."""
+        if positions.dtype == self.dtype:
+            return positions
+        positions = positions.astype(self.dtype)
+        # Longitudes just below 360 can round up to it in float32
+        positions[positions[:, 0] >= 360, 0] = 0
+        return positions
+
+    def forcing_time(self, t):
+        """Absolute forcing time for elapsed simulation time `t` (days)."""
+        return None if self.start_time is None else self.start_time + t
+
+    def get_wind_velocity(self, positions, t=None):
+        """Calculate wind velocities using ERA5 data."""
+        return self.wind_data.get_wind_velocities(positions, t)
+
+    def get_eddy_velocity(self, positions, t=None):
+        """Get eddy velocities using bilinear interpolation."""
+        return self.eddy_sampler.sample_positions(positions, t)
+
+    def drift_velocity(self, t, positions):
+        """Deterministic velocity from currents, wind and eddies."""
+        # Synthetic eddies are statistically time-symmetric, so backward runs
+        # sample them at the elapsed magnitude and keep them evolving
+        eddy = self.get_eddy_velocity(positions, np.abs(t))
+        t = self.forcing_time(t)
+        current = self.ocean_data.get_current_velocities(positions, t)
+        wind = self.get_wind_velocity(positions, t)
+        return current + self.windage * wind + eddy
+
+    def reversed_drift_velocity(self, s, positions):
+        """Drift in reversed time s = -t, so backward runs use the forward integrators."""
+        return -self.drift_velocity(-s, positions)
+
+    def drift_displacement(self, positions, ids=None):
+        """
+        Drift displacement over one step in the tracker's time direction.
+        `ids` are the particle indices of `positions` when only a subset of
+        the ensemble moves, so adaptive integrators keep per-particle state.
+        """
+        if self.direction > 0:
+            return self.integrator.displacement(
+                self.drift_velocity, self.elapsed_time, positions, self.dt, ids=ids)
+        return self.integrator.displacement(
+            self.reversed_drift_velocity, -self.elapsed_time, positions, self.dt, ids=ids)
+
+    def is_on_land(self, positions):
+        """Check which positions are on land, returning a boolean array."""
+        positions = np.asarray(positions)
+        self.stats.count('land_tests', positions[..., 0].size)
+        return self.land_mask.is_on_land(positions[..., 0], positions[..., 1])
+
+    def get_coastal_repulsion(self, positions):
+        """Calculate repulsion vectors away from coastlines for all particles."""
+        return self.land_mask.coastal_repulsion(positions)
+
+    def is_approaching_land(self, positions, velocities, time_steps=10):
+        """
+        Check which particles are heading towards land.
+
+        Look-ahead points are only probed for particles that
+        `LandMask.near_coast` keeps for their look-ahead reach,
+        `|v| * time_steps * dt`.
+
+        Returns
+        -------
+        approaching : numpy.ndarray
+            Boolean array, True where land lies ahead
+        steps : numpy.ndarray
+            First look-ahead step that hits land (0 where not approaching)
+        """
+        positions = np.asarray(positions)
+        approaching = np.zeros(len(positions), dtype=bool)
+        steps = np.zeros(len(positions), dtype=np.int64)
+
+        reach = np.hypot(velocities[:, 0], velocities[:, 1]) * time_steps * self.dt
+        near = np.flatnonzero(self.land_mask.near_coast(positions[:, 0], positions[:, 1], reach))
+        if len(near) == 0:
+            return approaching, steps
+
+        distances = np.arange(1, time_steps + 1) * self.dt
+        scale = distances[:, None] * np.array(self.APPROACH_FRACTIONS)[None, :]
+        test_pos = (positions[near, None, None, :]
+                    + velocities[near, None, None, :] * scale[None, :, :, None])
+        hits = self.is_on_land(self.wrap_positions(test_pos)).any(axis=2)
+
+        approaching[near] = hits.any(axis=1)
+        steps[near] = np.where(approaching[near], hits.argmax(axis=1) + 1, 0)
+        return approaching, steps
+
+    def find_safe_velocity(self, positions, velocities):
+        """Find velocities that don't lead to land, one candidate at a time."""
+        speed = np.linalg.norm(velocities, axis=1)
+        safe = np.zeros_like(velocities)
+        moving = speed > 0
+        safe[~moving] = velocities[~moving]
+
+        # Candidates in the same order as PlasticPathTracker: slower first, then rotated
+        candidates = [velocities * factor for factor in (0.75, 0.5, 0.25, 0.1)]
+        normalized = np.zeros_like(velocities)
+        normalized[moving] = velocities[moving] / speed[moving, None]
+        for angle in np.linspace(0, 2*np.pi, 16):
+            rotation_matrix = np.array([
+                [np.cos(angle), -np.sin(angle)],
+                [np.sin(angle), np.cos(angle)]
+            ])
+            candidates.append(speed[:, None] * 0.1 * (normalized @ rotation_matrix.T))
+
+        # Only particles still without a safe velocity are re-tested;
+        # anything left over falls back to zero velocity
+        pending = np.flatnonzero(moving)
+        for candidate in candidates:
+            if len(pending) == 0:
+                break
+            approaching, _ = self.is_approaching_land(positions[pending], candidate[pending])
+            resolved = pending[~approaching]
+            safe[resolved] = candidate[resolved]
+            pending = pending[approaching]
+
+        self.stats.count('safe_velocity_fallbacks', len(pending))
+        return safe
+
+    def outside_domain(self, positions):
+        """Boolean array, True where positions lie outside `domain`."""
+        if self.domain is None:
+            return np.zeros(len(positions), dtype=bool)
+        west, east, south, north = self.domain
+        outside = (positions[:, 1] < south) | (positions[:, 1] > north)
+        if east - west < 360:
+            outside |= np.mod(positions[:, 0] - west, 360) > east - west
+        return outside
+
+    def expect_next_step(self):
+        """
+        Tell windowed forcing the time at the end of this step (where the
+        next step starts), so its records are read in the background while
+        this step runs.
+        """
+        if self.start_time is None:
+            return
+        t = self.forcing_time(self.elapsed_time + self.direction * self.dt)
+        for data in (self.ocean_data, self.wind_data):
+            expect = getattr(getattr(data, 'sampler', None), 'expect', None)
+            if expect is not None:
+                expect(t)
+
+    def update(self):
+        """Advance all particles by one time step."""
+        self.expect_next_step()
+        if self.land_interaction == 'beach':
+            self.update_beaching()
+        else:
+            self.update_avoiding()
+
+    def update_beaching(self):
+        """
+        One step with explicit particle status instead of land avoidance.
+
+        Only active (and just resuspended) particles are advected. Their
+        proposed moves get a single vectorized raster crossing test:
+        particles reaching the coast stop at the last water point and beach
+        with probability `beaching_probability`.
+        """
+        status = self.status
+        stats = self.stats
+
+        # Particles resuspended last step are ordinary active particles now
+        status[status == RESUSPENDED] = ACTIVE
+        if self.resuspension_time:
+            beached = np.flatnonzero(status == BEACHED)
+            if len(beached):
+                probability = 1 - np.exp(-self.dt / self.resuspension_time)
+                washed = beached[self.rng.random(len(beached)) < probability]
+                status[washed] = RESUSPENDED
+                stats.count('resuspended', len(washed))
+
+        moving = np.flatnonzero((status == ACTIVE) | (status == RESUSPENDED))
+        if len(moving):
+            positions = self.positions[moving]
+            with stats.stage('forcing'):
+                drift = self.drift_displacement(positions, ids=moving)
+            diffusion = self.rng.normal(0, np.sqrt(2 * self.D * self.dt), positions.shape)
+            proposed = positions + drift + diffusion * self.dt
+
+            with stats.stage('land_check'):
+                crossed, fraction, tested = self.land_mask.first_crossing(positions, proposed)
+            stats.count('land_tests', tested)
+            hit = np.flatnonzero(crossed)
+            if len(hit):
+                proposed[hit] = (positions[hit]
+                                 + (proposed[hit] - positions[hit]) * fraction[hit, None])
+                beach = hit[self.rng.random(len(hit)) < self.beaching_probability]
+                status[moving[beach]] = BEACHED
+                stats.count('beached', len(beach))
+
+            proposed = self.wrap_positions(proposed)
+            left = self.outside_domain(proposed)
+            status[moving[left]] = OUT_OF_DOMAIN
+            stats.count('out_of_domain', int(np.count_nonzero(left)))
+            self.positions[moving] = self.to_state(proposed)
+
+        self.elapsed_time += self.direction * self.dt
+        with stats.stage('record'):
+            self.trajectory.append(self.elapsed_time, self.positions, status)
+            if self.density is not None:
+                self.density.add(self.positions, time=self.elapsed_time)
+        stats.end_step(len(moving))
+
+    def update_avoiding(self):
+        """One step of the original land-avoidance scheme for all particles."""
+        positions = self.positions
+        stats = self.stats
+
+        with stats.stage('forcing'):
+            drift = self.drift_displacement(positions) / self.dt
+        with stats.stage('repulsion'):
+            repulsion = self.get_coastal_repulsion(positions)
+        diffusion = self.rng.normal(0, np.sqrt(2 * self.D * self.dt), positions.shape)
+
+        total_velocity = drift + repulsion + diffusion
+
+        # Adjust velocities only for particles heading towards land
+        with stats.stage('approach_check'):
+            approaching, steps = self.is_approaching_land(positions, total_velocity)
+        if approaching.any():
+            idx = np.flatnonzero(approaching)
+            stats.count('safe_velocity_searches', len(idx))
+            with stats.stage('safe_velocity'):
+                safe_velocity = self.find_safe_velocity(positions[idx], total_velocity[idx])
+            boost = 2.0 / steps[idx]
+            total_velocity[idx] = safe_velocity + repulsion[idx] * boost[:, None]
+
+        # Particles whose proposed position is still on land stay put
+        proposed = positions + total_velocity * self.dt
+        with stats.stage('land_check'):
+            blocked = self.is_on_land(proposed)
+        proposed[blocked] = positions[blocked]
+        stats.count('stuck_steps', int(np.count_nonzero(blocked)))
+
+        self.positions = self.to_state(self.wrap_positions(proposed))
+        self.elapsed_time += self.direction * self.dt
+        with stats.stage('record'):
+            self.trajectory.append(self.elapsed_time, self.positions)
+            if self.density is not None:
+                self.density.add(self.positions, time=self.elapsed_time)
+        stats.end_step(self.num_particles)
+
+    @property
+    def path_history(self):
+        """Recorded in-memory positions as a (steps, N, 2) float32 array."""
+        return self.trajectory.trajectories()
+
+    def run(self, num_steps):
+        """
+        Advance the ensemble by `num_steps` steps.
+
+        Returns the recorded trajectories, or None when they are streamed to
+        `trajectory_path` (buffered rows are flushed before returning).
+        """
+        for _ in range(num_steps):
+            self.update()
+        if self.trajectory.sink is not None:
+            self.trajectory.flush()
+            return None
+        return self.path_history
+
+    def close(self):
+        """Flush and close the trajectory output file and the last density frame."""
+        self.trajectory.close()
+        if self.density is not None:
+            self.density.close_frame()
@@ -0,0 +1,327 @@
+"""
+Preprocessed, memory-mapped cache for OSCAR and ERA5 velocity fields.
+
+A cache is a directory holding the decoded fields in the exact layout used
+by `GridSampler` (time, lat, lon, 2), split into `.npy` chunks along time,
+plus a `meta.json` with the grid description, record times, source file
+fingerprints and a SHA-256 hash of the cached data. Velocities are stored
+in degrees per day (converted from the m/s of the source files, see
+`units.py`), ready for the trackers without further scaling. Opening a cache maps the
+chunks with `np.load(mmap_mode='r')`, so there is no NetCDF decoding at
+startup and every process using the same cache shares one page-cached copy.
+
+Build a cache from the command line:
+    python field_cache.py 'oscar/*.nc' cache/oscar
+    python field_cache.py 'era5/*.nc' cache/era5 --u-var u10 --v-var v10 --daily-mean
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from field_sampler import GridSampler
+from forcing import WindowedFieldProvider
+from units import check_units
+
+CACHE_VERSION = 2  # 2: velocities stored in degrees per day
+META_FILE = 'meta.json'
+
+
+def source_fingerprints(paths):
+    """(path, size, mtime) for each source file, used to detect stale caches."""
+    fingerprints = []
+    for path in paths:
+        stat = os.stat(path)
+        fingerprints.append([os.path.abspath(path), stat.st_size, int(stat.st_mtime)])
+    return fingerprints
+
+
+def _resolve_paths(paths):
+    return sorted(glob.glob(paths)) if isinstance(paths, str) else list(paths)
+
+
+def _regrid(sampler, resolution):
+    """Resample a single-slice sampler onto a regular grid of `resolution` degrees."""
+    west, east = sampler.lon_bounds
+    south, north = sampler.lat_bounds
+    if sampler.periodic:
+        lons = np.arange(0, 360, resolution)
+    else:
+        lons = np.arange(west, east + resolution / 2, resolution)
+    lats = np.arange(south, north + resolution / 2, resolution)
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    u, v = sampler.sample(lon_grid, lat_grid)
+    return GridSampler(lons, lats, u, v, fill_value=sampler.fill_value)
+
+
+def build_options(u_var='u', v_var='v', daily_mean=False, resolution=None, max_records=None,
+                  chunk_size=32, dtype=np.float64, units='m/s'):
+    """
+    Build options of `build_field_cache` as stored in `meta.json`, with
+    defaults filled in, so caches built differently never compare equal.
+    """
+    return {
+        'u_var': u_var,
+        'v_var': v_var,
+        'daily_mean': bool(daily_mean),
+        'resolution': None if resolution is None else float(resolution),
+        'max_records': None if max_records is None else int(max_records),
+        'chunk_size': int(chunk_size),
+        'dtype': np.dtype(dtype).name,
+        'source_units': check_units(units),
+    }
+
+
+def build_field_cache(paths, cache_dir, u_var='u', v_var='v', daily_mean=False,
+                      resolution=None, max_records=None, chunk_size=32, dtype=np.float64,
+                      units='m/s'):
+    """
+    Decode NetCDF fields once and write them as a memory-mappable cache.
+
+    Parameters
+    ----------
+    paths : str or list of str
+        Glob pattern or list of source NetCDF files
+    cache_dir : str
+        Output directory
+    u_var, v_var : str
+        Names of the velocity component variables
+    daily_mean : bool
+        Average records falling on the same day (e.g. hourly ERA5)
+    resolution : float, optional
+        Regrid to this resolution in degrees
+    max_records : int, optional
+        Only cache the first `max_records` output records
+    chunk_size : int
+        Records per chunk file
+    dtype : numpy dtype
+        Storage type of the cached arrays
+    units : str
+        Units of the source velocities, 'm/s' or 'deg/day'; the cache
+        always holds degrees per day
+
+    Returns
+    -------
+    dict
+        The cache metadata
+    """
+    paths = _resolve_paths(paths)
+    options = build_options(u_var, v_var, daily_mean, resolution, max_records, chunk_size,
+                            dtype, units)
+    provider = WindowedFieldProvider(paths, u_var=u_var, v_var=v_var, prefetch=False,
+                                     units=units)
+
+    # Group source records into output records
+    if daily_mean:
+        days = np.floor(provider.times)
+        groups = [np.flatnonzero(days == day) for day in np.unique(days)]
+        times = [float(day) for day in np.unique(days)]
+    else:
+        groups = [[k] for k in range(len(provider.times))]
+        times = [float(t) for t in provider.times]
+    if max_records is not None:
+        groups, times = groups[:max_records], times[:max_records]
+    if not groups:
+        raise ValueError(f"No records to cache from {len(paths)} source file(s) "
+                         f"(max_records={max_records})")
+
+    def read_record(group):
+        slices = [provider._read_slice(k) for k in group]
+        u = np.nanmean([u for u, _ in slices], axis=0) if len(slices) > 1 else slices[0][0]
+        v = np.nanmean([v for _, v in slices], axis=0) if len(slices) > 1 else slices[0][1]
+        sampler = GridSampler(provider.lons, provider.lats, u, v)
+        return _regrid(sampler, resolution) if resolution else sampler
+
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # Invalidate while rewriting
+
+    digest = hashlib.sha256()
+    chunks = []
+    grid = None
+    n = len(groups)
+    for start in range(0, max(n - 1, 1), chunk_size):
+        # Chunks overlap by one record so a bracketing pair never spans two files
+        stop = min(start + chunk_size + 1, n)
+        name = f'uv_{len(chunks):05d}.npy'
+        out = None
+        for offset, group in enumerate(groups[start:stop]):
+            sampler = read_record(group)
+            if out is None:
+                grid = sampler.grid
+                out = np.lib.format.open_memmap(
+                    os.path.join(cache_dir, name), mode='w+', dtype=dtype,
+                    shape=(stop - start,) + sampler.uv.shape[1:])
+            out[offset] = sampler.uv[0]
+            if offset > 0 or start == 0:
+                digest.update(np.ascontiguousarray(out[offset]).tobytes())
+        out.flush()
+        del out
+        chunks.append({'file': name, 'start': start, 'stop': stop})
+
+    meta = dict(options, **{
+        'version': CACHE_VERSION,
+        'units': 'deg/day',
+        'grid': grid,
+        'times': times,
+        'chunks': chunks,
+        'sources': source_fingerprints(paths),
+    })
+    digest.update(json.dumps({k: meta[k] for k in ('grid', 'times')}, sort_keys=True).encode())
+    meta['content_hash'] = digest.hexdigest()
+
+    # Metadata is written last so an interrupted build never looks valid
+    tmp_path = meta_path + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def is_cache_current(cache_dir, paths, **build_kwargs):
+    """
+    True if `cache_dir` holds a complete cache built from `paths` as they are
+    now with the given `build_field_cache` options (defaults for the rest).
+    """
+    meta_path = os.path.join(cache_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    options = build_options(**build_kwargs)
+    return (meta.get('version') == CACHE_VERSION
+            and meta.get('sources') == source_fingerprints(_resolve_paths(paths))
+            and all(meta.get(key, 'missing') == value for key, value in options.items()))
+
+
+class FieldCache:
+    """
+    Read-only, memory-mapped view of a field cache.
+
+    Provides the same `sample`/`sample_positions` interface as
+    `GridSampler` and `WindowedFieldProvider`.
+    """
+
+    def __init__(self, cache_dir, fill_value=0.0):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != CACHE_VERSION:
+            raise ValueError(f"Field cache {cache_dir} has version {self.meta.get('version')}, "
+                             f"expected {CACHE_VERSION}; rebuild it with field_cache.py")
+        self.content_hash = self.meta['content_hash']
+        self.times = np.array(self.meta['times'], dtype=np.float64)
+        self.fill_value = fill_value
+        self._samplers = {}  # Chunk index -> sampler over the mapped chunk
+
+    @property
+    def grid(self):
+        return self.meta['grid']
+
+    def _chunk_sampler(self, c):
+        if c not in self._samplers:
+            chunk = self.meta['chunks'][c]
+            uv = np.load(os.path.join(self.cache_dir, chunk['file']), mmap_mode='r')
+            times = self.times[chunk['start']:chunk['stop']] if len(self.times) > 1 else None
+            self._samplers[c] = GridSampler.from_normalized(
+                uv, times=times, fill_value=self.fill_value, **self.grid)
+        return self._samplers[c]
+
+    @property
+    def lons(self):
+        sampler = self._chunk_sampler(0)
+        return sampler.lon0 + sampler.dlon * np.arange(sampler.nlon)
+
+    @property
+    def lats(self):
+        sampler = self._chunk_sampler(0)
+        return sampler.lat0 + sampler.dlat * np.arange(sampler.nlat)
+
+    def record(self, k=0):
+        """Memory-mapped (u, v) views of record `k`, shaped (lat, lon)."""
+        c = min(k // self.meta['chunk_size'], len(self.meta['chunks']) - 1)
+        sampler = self._chunk_sampler(c)
+        offset = k - self.meta['chunks'][c]['start']
+        return sampler.uv[offset, ..., 0], sampler.uv[offset, ..., 1]
+
+    def sample(self, lon, lat, t=None):
+        """Sample the cached field; `t` is in days since 1970-01-01."""
+        if t is None or len(self.times) == 1:
+            return self._chunk_sampler(0).sample(lon, lat)
+        k = int(np.clip(np.searchsorted(self.times, np.min(t), side='right') - 1,
+                        0, len(self.times) - 2))
+        c = min(k // self.meta['chunk_size'], len(self.meta['chunks']) - 1)
+        return self._chunk_sampler(c).sample(lon, lat, t)
+
+    def sample_positions(self, positions, t=None):
+        """Sample at (N, 2) positions and return an (N, 2) velocity array."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        u, v = self.sample(positions[:, 0], positions[:, 1], t)
+        return np.column_stack((u, v))
+
+    def close(self):
+        self._samplers = {}
+
+
+def default_cache_dir(path, dtype=np.float64):
+    """Cache directory next to a NetCDF file, one per storage precision."""
+    dtype = np.dtype(dtype)
+    return f'{path}.fieldcache' if dtype == np.float64 else f'{path}.{dtype.name}.fieldcache'
+
+
+def open_field_cache(paths, cache_dir, **build_kwargs):
+    """Open the cache in `cache_dir`, (re)building it from `paths` if stale."""
+    if not is_cache_current(cache_dir, paths, **build_kwargs):
+        print(f"Building field cache in {cache_dir}...")
+        build_field_cache(paths, cache_dir, **build_kwargs)
+    return FieldCache(cache_dir)
+
+
+def forcing_version(*datasets):
+    """Short hash identifying the loaded forcing of `OceanCurrentData`/`WindData` objects."""
+    parts = []
+    for data in datasets:
+        sampler = getattr(data, 'sampler', None)
+        if sampler is None:
+            parts.append(None)
+        elif hasattr(sampler, 'content_hash'):
+            parts.append(sampler.content_hash)
+        elif hasattr(sampler, 'paths'):
+            parts.append(source_fingerprints(sampler.paths))
+        elif hasattr(sampler, 'domains'):
+            parts.append([[domain.name, domain.bounds] for domain in sampler.domains])
+        elif hasattr(sampler, 'uv'):
+            parts.append(hashlib.sha256(np.ascontiguousarray(sampler.uv).tobytes()).hexdigest())
+        else:
+            parts.append(type(sampler).__name__)
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a memory-mapped velocity field cache.')
+    parser.add_argument('sources', help='Glob pattern of NetCDF files')
+    parser.add_argument('cache_dir', help='Output directory')
+    parser.add_argument('--u-var', default='u')
+    parser.add_argument('--v-var', default='v')
+    parser.add_argument('--daily-mean', action='store_true', help='Average records per day')
+    parser.add_argument('--resolution', type=float, help='Regrid to this resolution (degrees)')
+    parser.add_argument('--chunk-size', type=int, default=32)
+    parser.add_argument('--dtype', choices=('float64', 'float32'), default='float64',
+                        help='Storage precision (float32 halves size and read bandwidth)')
+    parser.add_argument('--units', choices=('m/s', 'deg/day'), default='m/s',
+                        help='Units of the source velocities')
+    args = parser.parse_args()
+
+    meta = build_field_cache(args.sources, args.cache_dir, u_var=args.u_var, v_var=args.v_var,
+                             daily_mean=args.daily_mean, resolution=args.resolution,
+                             chunk_size=args.chunk_size, dtype=args.dtype, units=args.units)
+    print(f"Cached {len(meta['times'])} records in {len(meta['chunks'])} chunks "
+          f"(content hash {meta['content_hash'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import numpy as np
+
+
+class GridSampler:
+    """
+    Vectorized bilinear sampler for a (u, v) velocity field on a regular
+    longitude/latitude grid, optionally stacked along a time axis.
+
+    Ocean currents, wind and eddy fields all go through this class, so
+    every forcing is sampled with the same boundary handling: longitudes
+    wrap periodically on global grids and latitudes are clamped at the
+    grid edge (poles). Points outside a regional (non-periodic) grid get
+    `fill_value`.
+
+    The field may be stored in float32 to halve its memory and bandwidth;
+    grid indices and interpolation weights are always computed in float64
+    and only the final weighted sum uses the field's precision.
+    """
+
+    def __init__(self, lons, lats, u, v, times=None, fill_value=0.0, dtype=np.float64):
+        """
+        Build the sampler.
+
+        Parameters
+        ----------
+        lons, lats : array_like
+            Regularly spaced grid coordinates in degrees. Longitudes may use
+            either the -180..180 or the 0..360 convention and latitudes may
+            be ascending or descending.
+        u, v : array_like
+            Velocity components shaped (lat, lon), or (time, lat, lon) when
+            `times` is given. Masked or NaN values are replaced by
+            `fill_value`.
+        times : array_like, optional
+            Ascending times for the leading axis of `u` and `v`
+        fill_value : float
+            Value used for missing data and points outside the grid
+        dtype : numpy dtype
+            Storage precision of the field (float64 or float32)
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lons = np.where(lons < 0, lons + 360, lons)
+        lats = np.asarray(lats, dtype=np.float64)
+        uv = np.stack((np.ma.filled(np.ma.asarray(u, dtype=dtype), np.nan),
+                       np.ma.filled(np.ma.asarray(v, dtype=dtype), np.nan)), axis=-1)
+        if times is None:
+            uv = uv[None]
+        uv = np.where(np.isfinite(uv), uv, np.asarray(fill_value, dtype=uv.dtype))
+
+        # Sort longitudes (handles -180..180 input) and make latitudes ascending
+        lon_order = np.argsort(lons, kind='stable')
+        lons = lons[lon_order]
+        uv = uv[:, :, lon_order]
+        if lats[0] > lats[-1]:
+            lats = lats[::-1]
+            uv = uv[:, ::-1]
+
+        self.lon0 = lons[0]
+        self.dlon = (lons[-1] - lons[0]) / (len(lons) - 1)
+        self.lat0 = lats[0]
+        self.dlat = (lats[-1] - lats[0]) / (len(lats) - 1)
+        self.fill_value = fill_value
+
+        # A global grid is closed by repeating its first column one period later,
+        # so periodic wrap needs no special case in `sample`
+        span = lons[-1] - lons[0]
+        self.periodic = span + self.dlon >= 360 - 1e-6 * self.dlon
+        if self.periodic and span < 360 - 1e-6 * self.dlon:
+            uv = np.concatenate((uv, uv[:, :, :1]), axis=2)
+
+        self.uv = np.ascontiguousarray(uv)
+        self.nlat, self.nlon = self.uv.shape[1:3]
+        self.times = None if times is None else np.asarray(times, dtype=np.float64)
+
+    @classmethod
+    def from_normalized(cls, uv, lon0, dlon, lat0, dlat, periodic, times=None, fill_value=0.0):
+        """
+        Wrap an already normalized field without copying it.
+
+        `uv` must have the layout built by `__init__`: shape
+        (time, lat, lon, 2) with ascending coordinates, missing values
+        filled and, for periodic grids, the first longitude column repeated
+        at the end. This lets memory-mapped arrays be sampled in place.
+        """
+        sampler = cls.__new__(cls)
+        sampler.uv = uv
+        sampler.lon0 = float(lon0)
+        sampler.dlon = float(dlon)
+        sampler.lat0 = float(lat0)
+        sampler.dlat = float(dlat)
+        sampler.periodic = bool(periodic)
+        sampler.fill_value = fill_value
+        sampler.nlat, sampler.nlon = uv.shape[1:3]
+        sampler.times = None if times is None else np.asarray(times, dtype=np.float64)
+        return sampler
+
+    @property
+    def dtype(self):
+        """Storage precision of the field."""
+        return self.uv.dtype
+
+    @property
+    def grid(self):
+        """Grid description accepted by `from_normalized` (without the data)."""
+        return {'lon0': float(self.lon0), 'dlon': float(self.dlon), 'lat0': float(self.lat0),
+                'dlat': float(self.dlat), 'periodic': bool(self.periodic)}
+
+    @property
+    def lon_bounds(self):
+        """(west, east) longitude range covered by the grid."""
+        return self.lon0, self.lon0 + self.dlon * (self.nlon - 1)
+
+    @property
+    def lat_bounds(self):
+        """(south, north) latitude range covered by the grid."""
+        return self.lat0, self.lat0 + self.dlat * (self.nlat - 1)
+
+    def _time_weights(self, t, n):
+        """Bracketing time indices and weights for a scalar or per-point time."""
+        if self.times is None or len(self.times) == 1 or t is None:
+            return 0, 0, None
+        t = np.asarray(t, dtype=np.float64)
+        if t.ndim:
+            t = np.broadcast_to(t.ravel(), (n,))
+        k = np.clip(np.searchsorted(self.times, t) - 1, 0, len(self.times) - 2)
+        w = np.clip((t - self.times[k]) / (self.times[k + 1] - self.times[k]), 0.0, 1.0)
+        return k, k + 1, w
+
+    def _sample_slice(self, k, x, y, inside):
+        """Bilinear interpolation of one time slice (or one slice per point)."""
+        i = np.clip(np.floor(y).astype(np.int64), 0, self.nlat - 2)
+        j = np.clip(np.floor(x).astype(np.int64), 0, self.nlon - 2)
+        uv = self.uv
+        wy = (y - i).astype(uv.dtype, copy=False)[:, None]
+        wx = (x - j).astype(uv.dtype, copy=False)[:, None]
+
+        result = ((1 - wx) * (1 - wy) * uv[k, i, j]
+                  + wx * (1 - wy) * uv[k, i, j + 1]
+                  + (1 - wx) * wy * uv[k, i + 1, j]
+                  + wx * wy * uv[k, i + 1, j + 1])
+        if inside is not None:
+            result[~inside] = self.fill_value
+        return result
+
+    def sample(self, lon, lat, t=None):
+        """
+        Sample the field at arrays of positions.
+
+        Parameters
+        ----------
+        lon, lat : array_like
+            Positions in degrees (any longitude convention)
+        t : float or array_like, optional
+            Time at which to sample a time-stacked field, either one time
+            for all points or one time per point
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            (u, v) arrays with the broadcast shape of `lon` and `lat`
+        """
+        lon, lat = np.broadcast_arrays(np.asarray(lon, dtype=np.float64),
+                                       np.asarray(lat, dtype=np.float64))
+        shape = lon.shape
+
+        x = np.mod(lon.ravel() - self.lon0, 360) / self.dlon
+        y = (lat.ravel() - self.lat0) / self.dlat
+        inside = None
+        if not self.periodic:
+            inside = (x <= self.nlon - 1) & (y >= 0) & (y <= self.nlat - 1)
+        y = np.clip(y, 0, self.nlat - 1)  # Pole clamping
+
+        k0, k1, w = self._time_weights(t, len(x))
+        uv = self._sample_slice(k0, x, y, inside)
+        if w is not None and np.any(w > 0):
+            w = np.reshape(w, (-1, 1)).astype(uv.dtype, copy=False)
+            uv = (1 - w) * uv + w * self._sample_slice(k1, x, y, inside)
+
+        return uv[:, 0].reshape(shape), uv[:, 1].reshape(shape)
+
+    def sample_positions(self, positions, t=None):
+        """Sample at (N, 2) positions and return an (N, 2) velocity array."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        u, v = self.sample(positions[:, 0], positions[:, 1], t)
+        return np.column_stack((u, v))
@@ -0,0 +1,240 @@
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from netCDF4 import Dataset, num2date
+
+from field_sampler import GridSampler
+from units import check_units, metric_factors, to_degrees_per_day
+
+EPOCH = datetime(1970, 1, 1)
+
+# The netCDF/HDF5 libraries are not thread-safe, so prefetch reads overlap
+# with computation but never with another read
+NETCDF_LOCK = threading.Lock()
+
+
+def days_since_epoch(date):
+    """Convert a datetime to fractional days since 1970-01-01."""
+    return (date.replace(tzinfo=None) - EPOCH).total_seconds() / 86400.0
+
+
+class WindowedFieldProvider:
+    """
+    Time-varying (u, v) forcing read lazily from a series of NetCDF files.
+
+    All files are indexed up front (time coordinate only). While sampling,
+    only the two time slices bracketing the requested time are kept in
+    memory and interpolated linearly in time; the window bracketing the
+    next expected time is read on a background thread so that moving to it
+    rarely waits on disk. The next time is given by `expect` (the trackers
+    call it with `t + dt`) or, failing that, extrapolated from the spacing
+    of the last two sampled times, so a daily step over hourly records
+    prefetches the records a day ahead rather than the next hour. Memory
+    use therefore does not depend on the record length.
+
+    Works for OSCAR 5-day fields (`u`/`v`) and ERA5 hourly or daily fields
+    (`u10`/`v10`) spread over any number of files. Times are expressed in
+    days since 1970-01-01 (see `days_since_epoch`). Velocities given in m/s
+    are converted to degrees per day as each slice is read, with metric
+    factors computed once per latitude row (see `units.py`), so the
+    conversion runs on the prefetch thread rather than per sample.
+    """
+
+    LON_NAMES = ('lon', 'longitude')
+    LAT_NAMES = ('lat', 'latitude')
+    TIME_NAMES = ('time', 'valid_time')
+
+    def __init__(self, paths, u_var='u', v_var='v', fill_value=0.0, prefetch=True,
+                 dtype=np.float64, units='m/s'):
+        """
+        Index the files and prepare the sampling window.
+
+        Parameters
+        ----------
+        paths : str or list of str
+            Glob pattern or list of NetCDF files
+        u_var, v_var : str
+            Names of the velocity component variables
+        fill_value : float
+            Value used for masked cells and points outside the grid
+        prefetch : bool
+            Read the next time slice on a background thread
+        dtype : numpy dtype
+            Precision in which slices are held and sampled (float64 or float32)
+        units : str
+            Units of the velocity variables in the files, 'm/s' or 'deg/day'.
+            Sampled velocities are always in degrees per day.
+        """
+        self.paths = sorted(glob.glob(paths)) if isinstance(paths, str) else list(paths)
+        if not self.paths:
+            raise FileNotFoundError(f"No forcing files match {paths!r}")
+        self.u_var = u_var
+        self.v_var = v_var
+        self.fill_value = fill_value
+        self.dtype = np.dtype(dtype)
+        self.units = check_units(units)
+        self.lon_name = None
+
+        self._records = []  # (time, path, index within file)
+        for path in self.paths:
+            with NETCDF_LOCK, Dataset(path, 'r') as nc:
+                if self.lon_name is None:
+                    self._read_coordinates(nc)
+                time_var = nc.variables[self.time_name]
+                dates = num2date(time_var[:], time_var.units,
+                                 getattr(time_var, 'calendar', 'standard'),
+                                 only_use_cftime_datetimes=False,
+                                 only_use_python_datetimes=True)
+                for index, date in enumerate(np.atleast_1d(dates)):
+                    self._records.append((days_since_epoch(date), path, index))
+        self._records.sort(key=lambda record: record[0])
+        self._factors = metric_factors(self.lats) if self.units == 'm/s' else None
+        self.times = np.array([record[0] for record in self._records])
+
+        self._slices = {}  # Record index -> (u, v) arrays currently in memory
+        self._pending = {}  # Record index -> future for a prefetched slice
+        self._executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        self._window = None  # Index of the first bracketing record
+        self._sampler = None
+        self._last_time = None  # Earliest time of the previous `sample` call
+        self._step = None  # Last nonzero spacing between sampled times
+        self._hinted = False  # `expect` drives prefetching once it has been called
+
+    def _read_coordinates(self, nc):
+        """Find coordinate variables and read the grid from the first file."""
+        def find(names):
+            for name in names:
+                if name in nc.variables:
+                    return name
+            raise KeyError(f"None of {names} found in {nc.filepath()}")
+
+        self.lon_name = find(self.LON_NAMES)
+        self.lat_name = find(self.LAT_NAMES)
+        self.time_name = find(self.TIME_NAMES)
+        self.lons = np.asarray(nc.variables[self.lon_name][:], dtype=np.float64)
+        self.lats = np.asarray(nc.variables[self.lat_name][:], dtype=np.float64)
+
+    def _read_variable(self, nc, name, index):
+        """Read one time slice of a variable as a (lat, lon) array."""
+        var = nc.variables[name]
+        dims = var.dimensions
+        selection = tuple(
+            index if dim == self.time_name
+            else slice(None) if dim in (self.lat_name, self.lon_name)
+            else 0  # Singleton depth/level axes
+            for dim in dims
+        )
+        data = var[selection]
+        spatial = [dim for dim in dims if dim in (self.lat_name, self.lon_name)]
+        if spatial[0] == self.lon_name:
+            data = data.T
+        return np.ma.filled(np.ma.asarray(data, dtype=self.dtype), np.nan)
+
+    def _read_slice(self, k):
+        """Read the (u, v) fields of record `k` from disk."""
+        _, path, index = self._records[k]
+        with NETCDF_LOCK, Dataset(path, 'r') as nc:
+            u = self._read_variable(nc, self.u_var, index)
+            v = self._read_variable(nc, self.v_var, index)
+        if self._factors is not None:
+            u, v = to_degrees_per_day(u, v, self._factors)
+        return u, v
+
+    def _get_slice(self, k):
+        if k in self._slices:
+            return self._slices[k]
+        future = self._pending.pop(k, None)
+        return future.result() if future is not None else self._read_slice(k)
+
+    def _prefetch(self, k):
+        if (self._executor is not None and k < len(self._records)
+                and k not in self._slices and k not in self._pending):
+            self._pending[k] = self._executor.submit(self._read_slice, k)
+
+    def _prefetch_window(self, k):
+        """
+        Start reading the records of window `k`. Queued reads between the
+        active window and `k` are kept, since they may still be sampled on
+        the way there; reads beyond either end are cancelled.
+        """
+        last = min(k + 1, len(self._records) - 1)
+        if self._window is not None:
+            low, high = min(self._window, k), max(self._window + 1, last)
+            for j in [j for j in self._pending if not low <= j <= high]:
+                self._pending.pop(j).cancel()
+        for j in (k, last):
+            self._prefetch(j)
+
+    def _set_window(self, k):
+        """Make records k and k + 1 the active window."""
+        last = min(k + 1, len(self._records) - 1)
+        slices = {j: self._get_slice(j) for j in (k, last)}
+        self._slices = slices  # Drop everything outside the window
+
+        u = np.stack([slices[k][0], slices[last][0]])
+        v = np.stack([slices[k][1], slices[last][1]])
+        times = [self.times[k], self.times[last] if last > k else self.times[k] + 1]
+        self._sampler = GridSampler(self.lons, self.lats, u, v, times=times,
+                                    fill_value=self.fill_value, dtype=self.dtype)
+        self._window = k
+
+    def expect(self, t):
+        """Announce the next sampling time so its window is read in the background."""
+        self._hinted = True
+        k = self.window_index(t)
+        if k != self._window:
+            self._prefetch_window(k)
+
+    def window_index(self, t):
+        """Index of the first record of the window bracketing time `t`."""
+        if len(self.times) == 1:
+            return 0
+        return int(np.clip(np.searchsorted(self.times, t, side='right') - 1,
+                           0, len(self.times) - 2))
+
+    def sample(self, lon, lat, t=None):
+        """
+        Sample the forcing at arrays of positions and time `t`.
+
+        `t` may be one time or one time per point; the window is chosen from
+        the earliest requested time, and later times within the same call
+        are clamped to the end of that window.
+        """
+        if t is None:
+            t = self.times[0]
+        t0 = float(np.min(t))
+        k = self.window_index(t0)
+        if k != self._window:
+            self._set_window(k)
+
+        # Without announced times, extrapolate from the sampling cadence
+        if not self._hinted:
+            if self._last_time is not None and t0 != self._last_time:
+                self._step = t0 - self._last_time
+            self._last_time = t0
+            if self._step is not None:
+                k_next = self.window_index(t0 + self._step)
+            else:
+                k_next = min(k + 1, max(len(self.times) - 2, 0))
+            if k_next != k:
+                self._prefetch_window(k_next)
+        return self._sampler.sample(lon, lat, t)
+
+    def sample_positions(self, positions, t=None):
+        """Sample at (N, 2) positions and return an (N, 2) velocity array."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        u, v = self.sample(positions[:, 0], positions[:, 1], t)
+        return np.column_stack((u, v))
+
+    def close(self):
+        """Stop the prefetch thread and release cached slices."""
+        for future in self._pending.values():
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._slices = {}
+        self._pending = {}
@@ -0,0 +1,181 @@
+"""
+Low-overhead instrumentation for tracker updates.
+
+Trackers always call `stats.stage(name)`, `stats.count(name)` and
+`stats.end_step(n)`. When instrumentation is off they get `NULL_STATS`,
+whose methods do nothing and whose `stage` returns one shared no-op
+context manager, so a disabled run performs no timing and no allocation.
+Passing `stats=True` (or a `TrackerStats`) records:
+
+- wall time and call count per update stage
+- counters such as land-tested points, safe-velocity fallbacks and stuck steps
+- steps, particle-steps and particles per second
+
+The collected numbers are available as `summary()`, as JSON log records
+written every `log_every` steps, and as Prometheus text via `to_prometheus()`.
+"""
+import json
+import logging
+import time
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullStats:
+    """Disabled instrumentation: every hook is a no-op."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        pass
+
+    def end_step(self, particles=1):
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+class _Stage:
+    """Reusable timer for one named stage."""
+
+    __slots__ = ('seconds', 'calls', '_start')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._start
+        self.calls += 1
+        return False
+
+
+class TrackerStats:
+    """Per-stage timers and counters for a tracker run."""
+
+    enabled = True
+
+    def __init__(self, log_every=0, logger=None):
+        """
+        Parameters
+        ----------
+        log_every : int
+            Emit a JSON log record every `log_every` steps (0 disables logging)
+        logger : logging.Logger, optional
+            Logger for the records (defaults to the `ocean_map.stats` logger)
+        """
+        self.stages = {}
+        self.counters = {}
+        self.steps = 0
+        self.particle_steps = 0
+        self.log_every = int(log_every)
+        self.logger = logger or logging.getLogger('ocean_map.stats')
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager timing one occurrence of stage `name`."""
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages[name] = _Stage()
+        return timer
+
+    def count(self, name, n=1):
+        """Increase counter `name` by `n`."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_step(self, particles=1):
+        """Record one completed update of `particles` particles."""
+        self.steps += 1
+        self.particle_steps += particles
+        if self.log_every and self.steps % self.log_every == 0:
+            self.logger.info(json.dumps(self.summary(), separators=(',', ':')))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def particles_per_second(self):
+        """Particle-steps per second of wall time since the stats were created."""
+        elapsed = self.elapsed
+        return self.particle_steps / elapsed if elapsed > 0 else 0.0
+
+    def reset(self):
+        self.__init__(self.log_every, self.logger)
+
+    def summary(self):
+        """Plain dict of all timers and counters."""
+        return {
+            'steps': self.steps,
+            'particle_steps': self.particle_steps,
+            'elapsed_seconds': self.elapsed,
+            'particles_per_second': self.particles_per_second,
+            'stages': {name: {'seconds': timer.seconds, 'calls': timer.calls}
+                       for name, timer in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        """Human-readable table of stage times and counters."""
+        total = sum(timer.seconds for timer in self.stages.values()) or 1.0
+        lines = [f"{self.steps} steps, {self.particles_per_second:,.0f} particles/s"]
+        for name, timer in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"  {name:<16} {timer.seconds:>9.3f} s {100 * timer.seconds / total:>5.1f}% "
+                         f"{timer.calls:>9d} calls")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<16} {value:>9d}")
+        return '\n'.join(lines)
+
+    def to_prometheus(self, prefix='plastic_tracker', labels=None):
+        """Prometheus text exposition of the current stats."""
+        label_text = ','.join(f'{key}="{value}"' for key, value in (labels or {}).items())
+
+        def sample(name, value, extra=None):
+            parts = [part for part in (label_text, extra) if part]
+            return f"{name}{{{','.join(parts)}}} {value}" if parts else f"{name} {value}"
+
+        lines = [
+            f"# TYPE {prefix}_steps_total counter",
+            sample(f"{prefix}_steps_total", self.steps),
+            f"# TYPE {prefix}_particle_steps_total counter",
+            sample(f"{prefix}_particle_steps_total", self.particle_steps),
+            f"# TYPE {prefix}_particles_per_second gauge",
+            sample(f"{prefix}_particles_per_second", self.particles_per_second),
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [sample(f"{prefix}_stage_seconds_total", timer.seconds, f'stage="{name}"')
+                  for name, timer in self.stages.items()]
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        lines += [sample(f"{prefix}_stage_calls_total", timer.calls, f'stage="{name}"')
+                  for name, timer in self.stages.items()]
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(sample(f"{prefix}_{name}_total", value))
+        return '\n'.join(lines) + '\n'
+
+
+def make_stats(stats):
+    """Normalize a tracker's `stats` argument (None/False, True or a TrackerStats)."""
+    if stats is None or stats is False:
+        return NULL_STATS
+    if stats is True:
+        return TrackerStats()
+    return stats
@@ -0,0 +1,191 @@
+import numpy as np
+
+
+class Integrator:
+    """
+    Base class for time integrators that advance a batch of positions.
+
+    Subclasses implement `displacement`, which returns how far each particle
+    moves over one tracker step of length `dt` under a velocity function
+    `velocity(t, positions) -> (N, 2)`. `ids` optionally gives each row's
+    index in the whole ensemble, for integrators that keep per-particle
+    state between calls; rows are taken as particles 0..N-1 otherwise.
+
+    `nfev` counts batched velocity calls and `nevals` the particle
+    positions evaluated over all of them, so integrators can be compared
+    by field-sampling cost even when they evaluate subsets of particles.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.nfev = 0
+        self.nevals = 0
+
+    def _evaluate(self, velocity, t, positions):
+        self.nfev += 1
+        self.nevals += len(positions)
+        return velocity(t, positions)
+
+    def displacement(self, velocity, t, positions, dt, ids=None):
+        raise NotImplementedError
+
+
+class EulerIntegrator(Integrator):
+    """Forward Euler (first order, one evaluation per step)."""
+
+    name = 'euler'
+
+    def displacement(self, velocity, t, positions, dt, ids=None):
+        return dt * self._evaluate(velocity, t, positions)
+
+
+class RK2Integrator(Integrator):
+    """Explicit midpoint method (second order, two evaluations per step)."""
+
+    name = 'rk2'
+
+    def displacement(self, velocity, t, positions, dt, ids=None):
+        k1 = self._evaluate(velocity, t, positions)
+        k2 = self._evaluate(velocity, t + dt / 2, positions + dt / 2 * k1)
+        return dt * k2
+
+
+class RK4Integrator(Integrator):
+    """Classical Runge-Kutta (fourth order, four evaluations per step)."""
+
+    name = 'rk4'
+
+    def displacement(self, velocity, t, positions, dt, ids=None):
+        k1 = self._evaluate(velocity, t, positions)
+        k2 = self._evaluate(velocity, t + dt / 2, positions + dt / 2 * k1)
+        k3 = self._evaluate(velocity, t + dt / 2, positions + dt / 2 * k2)
+        k4 = self._evaluate(velocity, t + dt, positions + dt * k3)
+        return dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+class RK45Integrator(Integrator):
+    """
+    Adaptive Dormand-Prince 5(4) with per-particle step size control.
+
+    Each particle takes as many internal sub-steps as its local error
+    requires to cover the tracker step. Sub-steps only re-evaluate the
+    particles that have not yet reached the end of the step. The step size
+    the controller proposes after each particle's last accepted sub-step is
+    remembered by particle (see `ids`) and used to start its next call.
+    Velocity functions receive an array of per-particle times.
+    """
+
+    name = 'rk45'
+
+    # Dormand-Prince tableau
+    C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+    A = [
+        [],
+        [1/5],
+        [3/40, 9/40],
+        [44/45, -56/15, 32/9],
+        [19372/6561, -25360/2187, 64448/6561, -212/729],
+        [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+        [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+    ]
+    B5 = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+    B4 = np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+    def __init__(self, atol=1e-3, max_substeps=64):
+        """
+        Parameters
+        ----------
+        atol : float
+            Absolute position error tolerance per sub-step (degrees)
+        max_substeps : int
+            Upper bound on sub-step attempts per tracker step
+        """
+        super().__init__()
+        self.atol = atol
+        self.max_substeps = max_substeps
+        self._h = np.empty(0)  # Proposed next sub-step size by particle id, NaN if unknown
+
+    def _step_sizes(self, ids, dt):
+        """Starting sub-step sizes for particles `ids`, growing the store as needed."""
+        if len(ids) and ids.max() >= len(self._h):
+            grown = np.full(int(ids.max()) + 1, np.nan)
+            grown[:len(self._h)] = self._h
+            self._h = grown
+        h = self._h[ids]
+        return np.where(np.isnan(h), dt, np.minimum(h, dt))
+
+    def displacement(self, velocity, t, positions, dt, ids=None):
+        n = len(positions)
+        ids = np.arange(n) if ids is None else np.asarray(ids)
+
+        # Sub-steps accumulate in float64 even for float32 particle state, so
+        # the returned displacement is not limited by the position precision
+        start = np.array(positions, dtype=np.float64)
+        current = start.copy()
+        elapsed = np.zeros(n)
+        h = self._step_sizes(ids, dt)
+
+        active = np.arange(n)
+        for _ in range(self.max_substeps):
+            if len(active) == 0:
+                break
+            y = current[active]
+            h_a = np.minimum(h[active], dt - elapsed[active])
+            t_a = t + elapsed[active]
+
+            k = []
+            for stage in range(7):
+                y_stage = y.copy()
+                for coefficient, k_j in zip(self.A[stage], k):
+                    if coefficient:
+                        y_stage += (h_a * coefficient)[:, None] * k_j
+                k.append(self._evaluate(velocity, t_a + self.C[stage] * h_a, y_stage))
+            k = np.stack(k)
+
+            y5 = y + h_a[:, None] * np.tensordot(self.B5, k, axes=1)
+            error = np.abs(h_a[:, None] * np.tensordot(self.B5 - self.B4, k, axes=1)).max(axis=1)
+            ratio = error / self.atol
+
+            accepted = ratio <= 1
+            acc = active[accepted]
+            current[acc] = y5[accepted]
+            elapsed[acc] += h_a[accepted]
+
+            # Standard step-size controller for fifth-order error estimates.
+            # A sub-step shortened to end on the tracker step says nothing
+            # against the longer size, so that size is kept if larger
+            factor = np.clip(0.9 * np.power(np.maximum(ratio, 1e-10), -0.2), 0.2, 5.0)
+            proposed = h_a * factor
+            truncated = accepted & (h_a < h[active])
+            proposed[truncated] = np.maximum(proposed[truncated], h[active][truncated])
+            h[active] = proposed
+            self._h[ids[acc]] = proposed[accepted]
+
+            active = active[elapsed[active] < dt * (1 - 1e-9)]
+
+        # Particles that ran out of attempts finish with a single Euler step
+        if len(active):
+            remaining = (dt - elapsed[active])[:, None]
+            current[active] += remaining * self._evaluate(velocity, t + elapsed[active], current[active])
+
+        return current - start
+
+
+INTEGRATORS = {
+    'euler': EulerIntegrator,
+    'rk2': RK2Integrator,
+    'rk4': RK4Integrator,
+    'rk45': RK45Integrator,
+}
+
+
+def get_integrator(integrator):
+    """Return an integrator instance from a name or pass an instance through."""
+    if isinstance(integrator, Integrator):
+        return integrator
+    try:
+        return INTEGRATORS[integrator]()
+    except KeyError:
+        raise ValueError(f"Unknown integrator '{integrator}', "
+                         f"expected one of {sorted(INTEGRATORS)}")
@@ -0,0 +1,205 @@
+import os
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+
+class LandMask:
+    """
+    Rasterized land mask with a signed distance-to-coast grid.
+
+    The Natural Earth land polygons are rasterized once onto a regular
+    0-360° longitude grid and cached to disk, after which land tests and
+    coastal repulsion are plain array lookups that work on any number of
+    positions at once.
+    """
+
+    # Probe rings used for coastal repulsion (same layout as PlasticPathTracker)
+    REPULSION_RADII = (0.5, 1.0, 2.0, 4.0)
+    REPULSION_ANGLES = 32
+
+    def __init__(self, resolution=0.1, scale='50m', cache_dir='.', geometry=None):
+        """
+        Load the land mask from the cache, building it if needed.
+
+        Parameters
+        ----------
+        resolution : float
+            Grid spacing in degrees
+        scale : str
+            Natural Earth scale used when building the mask
+        cache_dir : str
+            Directory holding the cached raster
+        geometry : shapely geometry, optional
+            Land geometry to rasterize instead of Natural Earth (not cached)
+        """
+        self.resolution = float(resolution)
+        self.nx = int(round(360 / self.resolution))
+        self.ny = int(round(180 / self.resolution))
+        self.lons = (np.arange(self.nx) + 0.5) * self.resolution
+        self.lats = -90 + (np.arange(self.ny) + 0.5) * self.resolution
+
+        if geometry is not None:
+            self.mask = self.rasterize(geometry)
+            self.distance = self.compute_distance(self.mask)
+        else:
+            self.cache_path = os.path.join(
+                cache_dir, f'land_mask_{scale}_{self.resolution:g}.npz')
+            if os.path.exists(self.cache_path):
+                with np.load(self.cache_path) as cached:
+                    self.mask = cached['mask']
+                    self.distance = cached['distance']
+            else:
+                print(f"Building {self.resolution:g}° land mask (one-time)...")
+                self.mask = self.rasterize(self.load_natural_earth(scale))
+                self.distance = self.compute_distance(self.mask)
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez_compressed(self.cache_path, mask=self.mask, distance=self.distance)
+                print(f"Land mask cached to {self.cache_path}")
+
+        # Precompute probe offsets for coastal repulsion, shape (R * A, 2)
+        angles = np.linspace(0, 2*np.pi, self.REPULSION_ANGLES)
+        directions = np.column_stack((np.cos(angles), np.sin(angles)))
+        radii = np.repeat(self.REPULSION_RADII, self.REPULSION_ANGLES)
+        self._probe_directions = np.tile(directions, (len(self.REPULSION_RADII), 1))
+        self._probe_offsets = radii[:, None] * self._probe_directions
+        self._probe_weights = (2.0 / radii) * radii  # Strength times radius
+        self._probe_reach = max(self.REPULSION_RADII)
+        # `distance` runs between cell centres, while a position and the land
+        # it approaches may each sit in a cell corner: half a diagonal apiece
+        self._coast_slack = np.sqrt(2) * self.resolution
+
+    @staticmethod
+    def load_natural_earth(scale='50m'):
+        """Return the union of all Natural Earth land polygons."""
+        import shapely
+        import cartopy.feature as cfeature
+
+        land = cfeature.NaturalEarthFeature('physical', 'land', scale)
+        return shapely.union_all(list(land.geometries()))
+
+    def rasterize(self, geometry):
+        """Rasterize a land geometry by testing every cell centre."""
+        import shapely
+
+        shapely.prepare(geometry)
+        # Natural Earth uses -180..180 longitudes
+        lons = np.where(self.lons > 180, self.lons - 360, self.lons)
+        mask = np.empty((self.ny, self.nx), dtype=bool)
+        for i, lat in enumerate(self.lats):
+            mask[i] = shapely.contains_xy(geometry, lons, lat)
+        return mask
+
+    def compute_distance(self, mask):
+        """
+        Signed distance to the coast in degrees: positive over the ocean,
+        negative over land. Longitude is treated as periodic.
+        """
+        pad = self.nx // 2
+        wrapped = np.pad(mask, ((0, 0), (pad, pad)), mode='wrap')
+        to_land = distance_transform_edt(~wrapped)[:, pad:pad + self.nx]
+        to_ocean = distance_transform_edt(wrapped)[:, pad:pad + self.nx]
+        return ((to_land - to_ocean) * self.resolution).astype(np.float32)
+
+    def _indices(self, lon, lat):
+        """Grid indices for arrays of longitudes and latitudes."""
+        i = np.clip(((np.asarray(lat) + 90) / self.resolution).astype(np.int64), 0, self.ny - 1)
+        j = (np.mod(lon, 360) / self.resolution).astype(np.int64) % self.nx
+        return i, j
+
+    def is_on_land(self, lon, lat):
+        """Boolean land test for arrays of longitudes and latitudes."""
+        i, j = self._indices(lon, lat)
+        return self.mask[i, j]
+
+    def distance_to_coast(self, lon, lat):
+        """Signed distance to the coast in degrees (negative on land)."""
+        i, j = self._indices(lon, lat)
+        return self.distance[i, j]
+
+    def near_coast(self, lon, lat, reach):
+        """
+        Boolean array, True where land may lie within `reach` degrees.
+
+        Conservative prefilter for the vectorized land checks: positions are
+        kept up to one cell diagonal beyond `reach`, since the distance grid
+        is measured between cell centres.
+        """
+        return self.distance_to_coast(lon, lat) <= reach + self._coast_slack
+
+    def first_crossing(self, start, end, batch_samples=64):
+        """
+        Vectorized crossing test for straight segments against the raster.
+
+        Each (N, 2) segment from `start` to `end` (unwrapped longitudes) is
+        sampled at the raster resolution along its own length. Only segments
+        that may reach land (see `near_coast`) are sampled at all, and
+        long segments are tested `batch_samples` samples at a time so memory
+        stays bounded without coarsening the sampling.
+
+        Returns
+        -------
+        crossed : numpy.ndarray
+            Boolean array, True where the segment enters land
+        fraction : numpy.ndarray
+            Fraction of the segment at the last water sample before land
+            (1 where the segment stays in water)
+        tested : int
+            Number of points looked up in the raster, for instrumentation
+        """
+        start = np.asarray(start, dtype=np.float64).reshape(-1, 2)
+        delta = np.asarray(end, dtype=np.float64).reshape(-1, 2) - start
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        crossed = np.zeros(len(start), dtype=bool)
+        fraction = np.ones(len(start))
+
+        tested = 0
+        near = np.flatnonzero(self.near_coast(start[:, 0], start[:, 1], length))
+        if len(near) == 0:
+            return crossed, fraction, tested
+
+        # Samples k = 1..n at fractions k / n, spaced at most one cell apart
+        samples = np.ceil(length[near] / self.resolution).astype(np.int64) + 1
+        offset = 0
+        while len(near):
+            k = offset + np.arange(1, batch_samples + 1)
+            steps = k[None, :] / samples[:, None]
+            valid = k[None, :] <= samples[:, None]
+            points = start[near, None, :] + delta[near, None, :] * np.minimum(steps, 1)[..., None]
+            hits = valid & self.is_on_land(points[..., 0], np.clip(points[..., 1], -89.75, 89.75))
+            tested += int(np.count_nonzero(valid))
+
+            hit = hits.any(axis=1)
+            first = k[hits.argmax(axis=1)]
+            crossed[near[hit]] = True
+            fraction[near[hit]] = (first[hit] - 1) / samples[hit]
+
+            # Segments with samples left and no land yet continue in the next batch
+            offset += batch_samples
+            remaining = ~hit & (samples > offset)
+            near, samples = near[remaining], samples[remaining]
+        return crossed, fraction, tested
+
+    def coastal_repulsion(self, positions):
+        """
+        Unit repulsion vectors away from nearby land for (N, 2) positions.
+
+        Probes the multi-radius rings used by the trackers, but only for
+        particles that may have land within the probe reach (`near_coast`).
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        repulsion = np.zeros_like(positions)
+
+        near = np.flatnonzero(self.near_coast(positions[:, 0], positions[:, 1],
+                                              self._probe_reach))
+        if len(near) == 0:
+            return repulsion
+
+        probes = positions[near, None, :] + self._probe_offsets[None, :, :]
+        hits = self.is_on_land(probes[..., 0], np.clip(probes[..., 1], -89.75, 89.75))
+        vectors = -(hits * self._probe_weights) @ self._probe_directions
+
+        norm = np.linalg.norm(vectors, axis=1)
+        nonzero = norm > 0
+        vectors[nonzero] /= norm[nonzero, None]
+        repulsion[near] = vectors
+        return repulsion
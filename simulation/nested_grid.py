@@ -0,0 +1,276 @@
+"""
+Nested, multi-resolution forcing grids.
+
+`NestedFieldProvider` stacks velocity grids from fine regional domains down
+to a coarse global one and samples every particle from the finest domain
+whose bounds contain it. Domain lookup is a vectorized bounding-box test per
+level, applied finest first and only to the particles not yet assigned, so
+its cost is a few comparisons per particle.
+
+Each level is a `NestedDomain` that knows its bounds and resolution up front
+(from the field cache metadata or the NetCDF coordinates) but opens its data
+only the first time a particle falls inside it. With `release_after`, a
+regional grid that has been empty for that many sampling calls is closed
+again, so a run only ever holds the fine grids its particles actually visit.
+
+A domain can be built from a field cache directory, a NetCDF glob or any
+object with the `sample(lon, lat, t)` interface:
+    provider = NestedFieldProvider([
+        NestedDomain.from_cache('cache/oscar_hawaii'),
+        NestedDomain.from_files('hycom_gulf_honduras/*.nc'),
+        NestedDomain.from_cache('cache/oscar'),  # Global fallback
+    ])
+"""
+import glob
+import json
+import os
+
+import numpy as np
+from netCDF4 import Dataset
+
+from field_cache import META_FILE, FieldCache
+from forcing import NETCDF_LOCK, WindowedFieldProvider
+
+
+def grid_extent(lons, lats):
+    """
+    Bounds and resolution of a regular grid.
+
+    Returns
+    -------
+    tuple
+        ((west, east, south, north) in 0-360 longitudes, or None for a
+        global periodic grid; resolution in degrees)
+    """
+    lons = np.sort(np.mod(np.asarray(lons, dtype=np.float64), 360))
+    lats = np.asarray(lats, dtype=np.float64)
+    gaps = np.diff(lons)
+    dlon = np.median(gaps)
+    resolution = min(dlon, abs(lats[-1] - lats[0]) / (len(lats) - 1))
+    # A regional grid crossing the prime meridian shows up as one large gap
+    gap = np.argmax(gaps)
+    if gaps[gap] > 1.5 * dlon:
+        return (lons[gap + 1], lons[gap], lats.min(), lats.max()), resolution
+    if lons[-1] - lons[0] + dlon >= 360 - 1e-6 * dlon:
+        return None, resolution
+    return (lons[0], lons[-1], lats.min(), lats.max()), resolution
+
+
+class NestedDomain:
+    """One level of a nested stack: known bounds plus a lazily opened sampler."""
+
+    def __init__(self, bounds, open_sampler, resolution, name=None):
+        """
+        Parameters
+        ----------
+        bounds : tuple or None
+            (west, east, south, north) in degrees, or None for a global grid.
+            `west > east` describes a domain crossing the prime meridian.
+        open_sampler : callable
+            Returns the sampler for this domain when first needed
+        resolution : float
+            Grid spacing in degrees, used to order the levels
+        name : str, optional
+            Label used in progress messages and `NestedFieldProvider.counts`
+        """
+        if bounds is not None:
+            west, east, south, north = bounds
+            bounds = (west % 360, east % 360, south, north)
+        self.bounds = bounds
+        self.resolution = float(resolution)
+        self.name = name or f'{resolution:g} deg'
+        self._open_sampler = open_sampler
+        self._sampler = None
+
+    @classmethod
+    def from_sampler(cls, sampler, name=None):
+        """Wrap an already opened `GridSampler`-like object."""
+        if hasattr(sampler, 'lon_bounds'):
+            west, east = sampler.lon_bounds
+            south, north = sampler.lat_bounds
+            bounds = None if sampler.periodic else (west, east, south, north)
+            resolution = min(sampler.dlon, sampler.dlat)
+        else:
+            bounds, resolution = grid_extent(sampler.lons, sampler.lats)
+        domain = cls(bounds, lambda: sampler, resolution, name)
+        domain._sampler = sampler
+        return domain
+
+    @classmethod
+    def from_cache(cls, cache_dir, name=None):
+        """Domain backed by a field cache; only `meta.json` and one array header are read."""
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            meta = json.load(f)
+        grid = meta['grid']
+        shape = np.load(os.path.join(cache_dir, meta['chunks'][0]['file']), mmap_mode='r').shape
+        nlat, nlon = shape[1:3]
+        bounds = None if grid['periodic'] else (
+            grid['lon0'], grid['lon0'] + grid['dlon'] * (nlon - 1),
+            grid['lat0'], grid['lat0'] + grid['dlat'] * (nlat - 1))
+        return cls(bounds, lambda: FieldCache(cache_dir), min(grid['dlon'], grid['dlat']),
+                   name or os.path.basename(os.path.normpath(cache_dir)))
+
+    @classmethod
+    def from_files(cls, paths, u_var='u', v_var='v', name=None, dtype=np.float64):
+        """Domain backed by NetCDF files; only the coordinates of the first file are read."""
+        files = sorted(glob.glob(paths)) if isinstance(paths, str) else list(paths)
+        if not files:
+            raise FileNotFoundError(f"No forcing files match {paths!r}")
+        with NETCDF_LOCK, Dataset(files[0], 'r') as nc:
+            lon_name = next(n for n in WindowedFieldProvider.LON_NAMES if n in nc.variables)
+            lat_name = next(n for n in WindowedFieldProvider.LAT_NAMES if n in nc.variables)
+            lons = nc.variables[lon_name][:]
+            lats = nc.variables[lat_name][:]
+        bounds, resolution = grid_extent(lons, lats)
+        return cls(bounds, lambda: WindowedFieldProvider(files, u_var=u_var, v_var=v_var,
+                                                         dtype=dtype),
+                   resolution, name or os.path.basename(os.path.dirname(os.path.abspath(files[0]))))
+
+    @classmethod
+    def from_spec(cls, spec, u_var='u', v_var='v', dtype=np.float64):
+        """Domain from a `NestedDomain`, a sampler, a field cache directory or a NetCDF glob."""
+        if isinstance(spec, NestedDomain):
+            return spec
+        if not isinstance(spec, str):
+            return cls.from_sampler(spec)
+        if os.path.exists(os.path.join(spec, META_FILE)):
+            return cls.from_cache(spec)
+        return cls.from_files(spec, u_var=u_var, v_var=v_var, dtype=dtype)
+
+    @property
+    def loaded(self):
+        return self._sampler is not None
+
+    @property
+    def sampler(self):
+        if self._sampler is None:
+            print(f"Loading nested forcing domain {self.name}...")
+            self._sampler = self._open_sampler()
+        return self._sampler
+
+    def contains(self, lon, lat):
+        """Boolean mask of the positions inside the domain bounds."""
+        if self.bounds is None:
+            return np.ones(np.shape(lon), dtype=bool)
+        west, east, south, north = self.bounds
+        return ((np.mod(lon - west, 360) <= (east - west) % 360)
+                & (lat >= south) & (lat <= north))
+
+    def close(self):
+        """Release the sampler; it is reopened on the next access."""
+        if self._sampler is not None and hasattr(self._sampler, 'close'):
+            self._sampler.close()
+        self._sampler = None
+
+
+class NestedFieldProvider:
+    """
+    Velocity forcing sampled from the finest of several nested grids.
+
+    Provides the same `sample`/`sample_positions` interface as
+    `GridSampler`, `FieldCache` and `WindowedFieldProvider`.
+    """
+
+    def __init__(self, domains, fill_value=0.0, release_after=None, u_var='u', v_var='v',
+                 dtype=np.float64):
+        """
+        Parameters
+        ----------
+        domains : list
+            `NestedDomain` objects or specs accepted by `NestedDomain.from_spec`.
+            They are ordered from finest to coarsest resolution.
+        fill_value : float
+            Velocity for points outside every domain
+        release_after : int, optional
+            Close a regional domain after this many consecutive `sample`
+            calls without particles inside it
+        u_var, v_var : str
+            Velocity variable names for domains given as NetCDF globs
+        dtype : numpy dtype
+            Precision of domains given as NetCDF globs and of the sampled
+            velocities (cached domains keep their stored precision)
+        """
+        domains = [NestedDomain.from_spec(spec, u_var, v_var, dtype) for spec in domains]
+        if not domains:
+            raise ValueError("NestedFieldProvider needs at least one domain")
+        self.domains = sorted(domains, key=lambda domain: domain.resolution)
+        self.fill_value = fill_value
+        self.dtype = np.dtype(dtype)
+        self.release_after = release_after
+        self._idle = [0] * len(self.domains)
+        self.counts = {}  # Domain name -> points sampled from it in the last call
+
+    @property
+    def lons(self):
+        return getattr(self.domains[-1].sampler, 'lons', None)
+
+    @property
+    def lats(self):
+        return getattr(self.domains[-1].sampler, 'lats', None)
+
+    def domain_index(self, lon, lat):
+        """Index of the finest domain containing each point (-1 if none does)."""
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        index = np.full(len(lon), -1, dtype=np.int64)
+        remaining = np.arange(len(lon))
+        for d, domain in enumerate(self.domains):
+            if not remaining.size:
+                break
+            inside = domain.contains(lon[remaining], lat[remaining])
+            index[remaining[inside]] = d
+            remaining = remaining[~inside]
+        return index
+
+    def sample(self, lon, lat, t=None):
+        """
+        Sample every point from the finest domain covering it.
+
+        Parameters
+        ----------
+        lon, lat : array_like
+            Positions in degrees (any longitude convention)
+        t : float or array_like, optional
+            One time for all points or one time per point, passed on to the
+            domain samplers
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            (u, v) arrays with the broadcast shape of `lon` and `lat`
+        """
+        lon, lat = np.broadcast_arrays(np.asarray(lon, dtype=np.float64),
+                                       np.asarray(lat, dtype=np.float64))
+        shape = lon.shape
+        lon, lat = lon.ravel(), lat.ravel()
+        per_point = t is not None and np.ndim(t) > 0
+        if per_point:
+            t = np.broadcast_to(np.ravel(t), lon.shape)
+
+        index = self.domain_index(lon, lat)
+        u = np.full(len(lon), self.fill_value, dtype=self.dtype)
+        v = np.full(len(lon), self.fill_value, dtype=self.dtype)
+        self.counts = {}
+        for d, domain in enumerate(self.domains):
+            selected = np.flatnonzero(index == d)
+            if not selected.size:
+                self._idle[d] += 1
+                if (self.release_after is not None and domain.bounds is not None
+                        and domain.loaded and self._idle[d] >= self.release_after):
+                    domain.close()
+                continue
+            self._idle[d] = 0
+            self.counts[domain.name] = selected.size
+            u[selected], v[selected] = domain.sampler.sample(
+                lon[selected], lat[selected], t[selected] if per_point else t)
+        return u.reshape(shape), v.reshape(shape)
+
+    def sample_positions(self, positions, t=None):
+        """Sample at (N, 2) positions and return an (N, 2) velocity array."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        u, v = self.sample(positions[:, 0], positions[:, 1], t)
+        return np.column_stack((u, v))
+
+    def close(self):
+        for domain in self.domains:
+            domain.close()
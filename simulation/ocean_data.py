@@ -1,22 +1,25 @@
 import os
 import numpy as np
-from netCDF4 import Dataset
-from scipy.interpolate import RegularGridInterpolator
+from field_cache import FieldCache, default_cache_dir, open_field_cache
+from forcing import WindowedFieldProvider
+from nested_grid import NestedFieldProvider
+from units import MAX_LATITUDE
 
 class OceanCurrentData:
     """Class to handle ocean current data from NOAA's OSCAR dataset."""
     
-    def __init__(self, use_real_data=False):
-        self.u_currents = None  # Zonal velocity (East-West)
-        self.v_currents = None  # Meridional velocity (North-South)
+    def __init__(self, use_real_data=False, files=None, dtype=np.float64):
+        self.u_currents = None  # Zonal velocity (East-West), degrees per day
+        self.v_currents = None  # Meridional velocity (North-South), degrees per day
         self.lat = None
         self.lon = None
-        self.u_interpolator = None
-        self.v_interpolator = None
-        self.dt = None  # Time step in hours
-        self.use_real_data = use_real_data
+        self.sampler = None  # Batched bilinear sampler over (u, v)
+        self.dtype = np.dtype(dtype)  # Storage precision of the current fields
+        self.use_real_data = use_real_data or files is not None
         
-        if use_real_data:
+        if files is not None:
+            self.load_oscar_series(files)
+        elif use_real_data:
             self.load_oscar_data('oscar_currents_interim_20200101.nc')
             
     def load_oscar_data(self, file_path):
@@ -31,30 +34,9 @@ class OceanCurrentData:
         try:
             print("Loading ocean current data...")
             
-            # Read the NetCDF file
-            with Dataset(file_path, 'r') as nc:
-                # Extract the data for the first (and only) time step
-                self.u_currents = nc.variables['u'][0]  # Shape: (longitude, latitude)
-                self.v_currents = nc.variables['v'][0]
-                self.lat = nc.variables['lat'][:]
-                self.lon = nc.variables['lon'][:]
-                
-                # Create interpolators for u and v velocities
-                self.u_interpolator = RegularGridInterpolator(
-                    (self.lat, self.lon),  # Note: lat first, then lon
-                    self.u_currents.T,  # Transpose to match coordinate order
-                    method='linear',
-                    bounds_error=False,
-                    fill_value=0.0
-                )
-                
-                self.v_interpolator = RegularGridInterpolator(
-                    (self.lat, self.lon),  # Note: lat first, then lon
-                    self.v_currents.T,
-                    method='linear',
-                    bounds_error=False,
-                    fill_value=0.0
-                )
+            # Decode the first (and only) time step once into a memory-mapped
+            # cache next to the NetCDF file; later startups skip decoding
+            self.load_cache(default_cache_dir(file_path, self.dtype), source=file_path)
             
             print("Ocean current data loaded successfully!")
             return True
@@ -63,6 +45,72 @@ class OceanCurrentData:
             print(f"Error loading ocean current data: {str(e)}")
             return False
     
+    def load_cache(self, cache_dir, source=None):
+        """
+        Use ocean currents from a preprocessed field cache.
+        
+        Parameters:
+        -----------
+        cache_dir : str
+            Cache directory written by `field_cache.build_field_cache`
+        source : str, optional
+            NetCDF file(s) to (re)build the cache from when it is missing
+            or out of date
+        """
+        if source is not None:
+            self.sampler = open_field_cache(source, cache_dir, u_var='u', v_var='v',
+                                            max_records=1, dtype=self.dtype)
+        else:
+            self.sampler = FieldCache(cache_dir)
+        self.u_currents, self.v_currents = self.sampler.record(0)  # Shape: (latitude, longitude)
+        self.lat = self.sampler.lats
+        self.lon = self.sampler.lons
+        return True
+    
+    def load_oscar_series(self, files):
+        """
+        Use time-varying OSCAR currents from a series of NetCDF files.
+        
+        Only the two time slices bracketing the sampled time are held in
+        memory (see `forcing.WindowedFieldProvider`).
+        
+        Parameters:
+        -----------
+        files : str or list of str
+            Glob pattern or list of OSCAR NetCDF files
+        """
+        print("Indexing ocean current files...")
+        self.sampler = WindowedFieldProvider(files, u_var='u', v_var='v', dtype=self.dtype)
+        self.lat = self.sampler.lats
+        self.lon = self.sampler.lons
+        print(f"Indexed {len(self.sampler.times)} current fields "
+              f"from {len(self.sampler.paths)} files")
+        return True
+    
+    def load_nested(self, domains, release_after=None):
+        """
+        Use ocean currents from nested grids, finest regional domain first.
+        
+        Each position is sampled from the finest grid covering it, and
+        regional grids are opened only once a particle enters them (see
+        `nested_grid.NestedFieldProvider`).
+        
+        Parameters:
+        -----------
+        domains : list
+            `nested_grid.NestedDomain` objects, field cache directories or
+            NetCDF globs, with the global grid last
+        release_after : int, optional
+            Close a regional grid after this many sampling calls without
+            particles inside it
+        """
+        self.sampler = NestedFieldProvider(domains, release_after=release_after,
+                                           u_var='u', v_var='v', dtype=self.dtype)
+        self.lat = self.sampler.lats
+        self.lon = self.sampler.lons
+        print(f"Nested current domains: {', '.join(d.name for d in self.sampler.domains)}")
+        return True
+    
     def get_current_velocity(self, position, domain_size):
         """
         Get interpolated current velocity at a given position.
@@ -77,35 +125,34 @@ class OceanCurrentData:
         Returns:
         --------
         numpy.ndarray
-            [u, v] current velocities as a numpy array in m/s
+            [u, v] current velocities in degrees per day
         """
-        if self.u_interpolator is None or self.v_interpolator is None:
-            return np.zeros(2)
-        
-        lon, lat = position
-        
-        # Handle periodic boundary conditions for longitude
-        lon = np.mod(lon, 360)
-        
-        # Clip latitude to valid range
-        lat = np.clip(lat, -89.75, 89.75)
+        return self.get_current_velocities(np.asarray(position)[None, :])[0]
+    
+    def get_current_velocities(self, positions, t=None):
+        """
+        Get interpolated current velocities for many positions at once.
         
-        # Get interpolated velocities
-        try:
-            u = float(self.u_interpolator((lat, lon)))  # Note: lat first, then lon
-            v = float(self.v_interpolator((lat, lon)))  # Note: lat first, then lon
-            
-            # Scale factor to convert m/s to degrees/timestep
-            # At the equator, 1 degree longitude ≈ 111 km
-            # So 1 m/s ≈ 0.0324 degrees/hour
-            scale_factor = 0.0324 * self.dt * 3600  # Convert to degrees per timestep
-            
-            # Adjust latitude scaling for meridional velocity
-            # As we move away from the equator, longitude degrees get smaller
-            lat_factor = np.cos(np.radians(lat))
-            u = u * scale_factor / lat_factor  # Adjust zonal velocity for latitude
-            v = v * scale_factor  # Meridional velocity doesn't need adjustment
+        Parameters:
+        -----------
+        positions : numpy.ndarray
+            (N, 2) array of (longitude, latitude) positions
+        t : float or numpy.ndarray, optional
+            Time in days since 1970-01-01 for time-varying currents
             
-            return np.array([u, v])
-        except:
-            return np.zeros(2)  # Return zero velocity if interpolation fails
+        Returns:
+        --------
+        numpy.ndarray
+            (N, 2) array of [u, v] current velocities in degrees per day.
+            Fields are converted from m/s when they are read or cached, with
+            one metric factor per latitude row (see `units.py`), so no
+            conversion happens here.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if self.sampler is None:
+            return np.zeros_like(positions)
+        
+        # Clip latitude to valid range (longitude wraps inside the sampler)
+        lat = np.clip(positions[:, 1], -MAX_LATITUDE, MAX_LATITUDE)
+        u, v = self.sampler.sample(positions[:, 0], lat, t)
+        return np.column_stack((u, v))
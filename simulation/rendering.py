@@ -0,0 +1,158 @@
+"""
+Map rendering for tracker results.
+
+This is the only module that imports matplotlib and cartopy. Trackers
+import it lazily from their plotting methods, so headless runs never pay
+the plotting import cost or need a display.
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+
+
+def _title(tracker):
+    title = "Single Plastic Particle Path Tracker\n"
+    title += "Using real NOAA current data" if tracker.ocean_data.use_real_data else "Using simplified currents"
+    lon, lat = tracker.trajectory.track(0)
+    title += f"\nStarting Position: {lon[0]:.1f}°E, {lat[0]:.1f}°N"
+    return title
+
+
+def _simulation_axes():
+    """Figure and map axes used by `animate_simulation` and `plot_simulation`."""
+    fig = plt.figure(figsize=(15, 10))
+
+    # Create map with Natural Earth features
+    ax = plt.axes(projection=ccrs.PlateCarree(central_longitude=180))
+    ax.add_feature(cfeature.LAND, facecolor='lightgray', edgecolor='black')
+    ax.add_feature(cfeature.COASTLINE)
+    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
+
+    # Set map extent to show Pacific Ocean
+    ax.set_extent([120, 300, -10, 60], crs=ccrs.PlateCarree())
+
+    # Add gridlines
+    gl = ax.gridlines(draw_labels=True)
+    gl.top_labels = False
+    gl.right_labels = False
+    return fig, ax
+
+
+def plot_path(tracker):
+    """Plot the path of a PlasticPathTracker particle."""
+    # Set up the figure with a map projection
+    fig = plt.figure(figsize=(15, 10))
+
+    # Use PlateCarree projection centered on the Pacific
+    proj = ccrs.PlateCarree(central_longitude=180)
+    ax = fig.add_subplot(1, 1, 1, projection=proj)
+
+    # Set map extent to focus on the Pacific Ocean
+    ax.set_extent([100, 260, -60, 60], crs=ccrs.PlateCarree())
+
+    # Add map features
+    ax.add_feature(cfeature.LAND, facecolor='lightgray', edgecolor='black')
+    ax.add_feature(cfeature.OCEAN, facecolor='lightblue', alpha=0.5)
+    ax.add_feature(cfeature.COASTLINE, edgecolor='black', linewidth=0.5)
+    ax.add_feature(cfeature.BORDERS, linestyle=':', edgecolor='black', linewidth=0.5)
+
+    # Add gridlines
+    gl = ax.gridlines(draw_labels=True, linewidth=0.5, color='gray', alpha=0.5, linestyle='--')
+    gl.top_labels = False
+    gl.right_labels = False
+
+    # Plot path
+    path = tracker.path_history
+    ax.plot(path[:, 0], path[:, 1], 'b-', alpha=0.5, linewidth=1, transform=ccrs.PlateCarree())
+
+    ax.set_title(_title(tracker))
+    plt.show()
+
+
+def animate_simulation(tracker, num_steps):
+    """Step a PlasticPathTracker while animating its path."""
+    fig, ax = _simulation_axes()
+
+    # Initialize path line and current position marker
+    path_line, = ax.plot([], [], 'b-', alpha=0.5, linewidth=1, transform=ccrs.PlateCarree(),
+                         label='Particle Path')
+    current_pos_marker, = ax.plot([], [], 'ro', markersize=8, transform=ccrs.PlateCarree(),
+                                  label='Current Position')
+
+    # Add legend
+    ax.legend(loc='upper right')
+
+    # Add time counter text
+    time_text = ax.text(0.02, 0.98, '', transform=ax.transAxes,
+                        fontsize=10, color='black',
+                        bbox=dict(facecolor='white', alpha=0.7, edgecolor='none'),
+                        verticalalignment='top')
+
+    ax.set_title(_title(tracker))
+
+    step_count = 0
+
+    def update_frame(frame):
+        nonlocal step_count
+        if step_count < num_steps:
+            tracker.update()
+            step_count += 1
+
+        # Views into the columnar path history (no per-frame copies)
+        lon, lat = tracker.trajectory.track(0)
+
+        # Update path line and current position marker
+        path_line.set_data(lon, lat)
+        current_pos_marker.set_data([tracker.current_pos[0]], [tracker.current_pos[1]])
+
+        # Update time counter
+        time_text.set_text(f'Day: {step_count} of {num_steps}\n'
+                           f'Current Position: {tracker.current_pos[0]:.1f}°E, {tracker.current_pos[1]:.1f}°N')
+
+        return [path_line, current_pos_marker, time_text]
+
+    anim = FuncAnimation(fig, update_frame, frames=num_steps,
+                         interval=50, blit=True, repeat=False)
+    plt.show()
+    return anim
+
+
+def plot_simulation(tracker):
+    """Plot the final path of an already simulated PlasticPathTracker."""
+    fig, ax = _simulation_axes()
+
+    # Plot final path
+    path = tracker.path_history
+    ax.plot(path[:, 0], path[:, 1], 'b-', alpha=0.5, linewidth=1, transform=ccrs.PlateCarree(),
+            label='Particle Path')
+    ax.plot([tracker.current_pos[0]], [tracker.current_pos[1]], 'ro', markersize=8,
+            transform=ccrs.PlateCarree(), label='Final Position')
+
+    # Add legend
+    ax.legend(loc='upper right')
+
+    ax.set_title(_title(tracker))
+    plt.show()
+
+
+def plot_ensemble(trajectories, title="Plastic Particle Ensemble", max_tracks=500):
+    """
+    Plot ensemble trajectories shaped (steps + 1, N, 2).
+
+    Only the first `max_tracks` tracks are drawn as lines; all final
+    positions are shown as points.
+    """
+    fig, ax = _simulation_axes()
+    trajectories = np.asarray(trajectories)
+
+    for k in range(min(max_tracks, trajectories.shape[1])):
+        ax.plot(trajectories[:, k, 0], trajectories[:, k, 1], 'b-', alpha=0.2, linewidth=0.5,
+                transform=ccrs.PlateCarree())
+    ax.plot(trajectories[-1, :, 0], trajectories[-1, :, 1], 'r.', markersize=2,
+            transform=ccrs.PlateCarree(), label='Final Positions')
+
+    ax.legend(loc='upper right')
+    ax.set_title(title)
+    plt.show()
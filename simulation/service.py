@@ -0,0 +1,497 @@
+"""
+Asynchronous simulation service for the map front end.
+
+Release jobs are posted as JSON, run on a bounded pool of tracker threads
+that share one land mask and one set of (memory-mapped) forcing caches, and
+stream their progress as frames while steps complete:
+
+    POST   /jobs                 submit a release, returns the job description
+    GET    /jobs/{id}            status and progress
+    GET    /jobs/{id}/stream     newline-delimited JSON frames (chunked HTTP)
+    GET    /jobs/{id}/ws         the same frames over a WebSocket
+    DELETE /jobs/{id}            cancel a queued or running job
+    GET    /health               forcing version and pool usage
+
+A job is identified by the SHA-256 of its normalized parameters, the seed
+and the version of the loaded forcing, so identical requests share one run:
+a second client joins the running job or replays the finished frames.
+Frames of a running job are held as float32 arrays; as frames are produced
+they are spooled to disk as `<id>.ndjson`, and finished jobs are replayed
+from that file rather than from memory. With `--cache-dir` the spool files
+survive restarts (otherwise a temporary directory is used). Every frame carries particle positions (`frame:
+'positions'`) or a GeoJSON concentration layer (`frame: 'density'`) in the
+-180..180 longitudes used by the map.
+
+Requires `aiohttp`:
+    python service.py --port 8085 --ocean-cache cache/oscar --wind-cache cache/era5
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from campaign import load_forcing
+from density import DensityAccumulator
+from ensemble_tracker import EnsembleTracker
+from field_cache import forcing_version
+from integrators import INTEGRATORS
+from land_mask import LandMask
+from trajectory_store import STATUS_NAMES
+
+SERVICE_VERSION = 1
+
+# Accepted job parameters and their defaults
+JOB_DEFAULTS = {
+    'lon': 204.0,
+    'lat': 22.0,
+    'particles': 100,
+    'steps': 500,
+    'dt': 1.0,
+    'spread': 0.1,
+    'seed': 0,
+    'integrator': 'euler',
+    'land_interaction': 'avoid',
+    'start_date': None,
+    'frame_every': 10,
+    'frame': 'positions',
+    'resolution': 1.0,
+}
+
+
+class QueueFull(Exception):
+    """Raised when the service already holds its maximum number of unfinished jobs."""
+
+
+def normalize_params(params, max_particles=20000, max_steps=3650, max_frame_points=4000000,
+                     max_frames=1000):
+    """
+    Validate job parameters and fill in defaults; raises ValueError.
+
+    `max_frame_points` bounds particles times frames for position frames and
+    `max_frames` the number of frames of any job, which bounds the memory
+    and disk a single job can use.
+    """
+    unknown = set(params) - set(JOB_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown job parameters: {', '.join(sorted(unknown))}")
+    job = dict(JOB_DEFAULTS, **params)
+    for name in ('lon', 'lat', 'dt', 'spread', 'resolution'):
+        job[name] = float(job[name])
+    for name in ('particles', 'steps', 'seed', 'frame_every'):
+        job[name] = int(job[name])
+    job['lon'] %= 360
+    if not -90 <= job['lat'] <= 90:
+        raise ValueError("lat must lie in -90..90")
+    if not 1 <= job['particles'] <= max_particles:
+        raise ValueError(f"particles must lie in 1..{max_particles}")
+    if not 1 <= job['steps'] <= max_steps:
+        raise ValueError(f"steps must lie in 1..{max_steps}")
+    if job['dt'] <= 0 or job['frame_every'] < 1 or job['resolution'] <= 0:
+        raise ValueError("dt, frame_every and resolution must be positive")
+    if job['frame'] not in ('positions', 'density'):
+        raise ValueError("frame must be 'positions' or 'density'")
+    frames = job['steps'] // job['frame_every'] + 2  # Initial and final frames included
+    if frames > max_frames:
+        raise ValueError(f"steps / frame_every must stay below {max_frames - 1}")
+    if job['frame'] == 'positions' and job['particles'] * frames > max_frame_points:
+        raise ValueError(f"particles * steps / frame_every must stay below {max_frame_points} "
+                         f"(increase frame_every)")
+    if job['integrator'] not in INTEGRATORS:
+        raise ValueError(f"integrator must be one of {', '.join(INTEGRATORS)}")
+    if job['land_interaction'] not in ('avoid', 'beach'):
+        raise ValueError("land_interaction must be 'avoid' or 'beach'")
+    if job['start_date'] is not None:
+        job['start_date'] = datetime.fromisoformat(str(job['start_date'])).isoformat()
+    return job
+
+
+def encode_frame(frame):
+    """One NDJSON line for a frame, with positions rounded to 4 decimals."""
+    if 'positions' in frame:
+        positions = np.round(frame['positions'].astype(np.float64), 4)
+        frame = dict(frame, positions=positions.tolist())
+    return json.dumps(frame, separators=(',', ':'))
+
+
+class Job:
+    """
+    One release run and the frames it has produced so far.
+
+    Frames live in memory only while the job runs; a finished job replays
+    them from its spool file `path`.
+    """
+
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = 'queued'
+        self.step = 0
+        self.frames = []
+        self.num_frames = 0
+        self.path = None
+        self.error = None
+        self.cancelled = False
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'step': self.step,
+            'steps': self.params['steps'],
+            'frames': self.num_frames,
+            'params': self.params,
+            'error': self.error,
+        }
+
+    def _notify(self):
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    # The methods below run on the event loop (via call_soon_threadsafe)
+
+    def publish(self, frame):
+        self.status = 'running'
+        self.step = frame['step']
+        self.frames.append(frame)
+        self.num_frames += 1
+        self._notify()
+
+    def finish(self, status, error=None, path=None):
+        self.status = status
+        self.error = error
+        if path is not None:
+            # Replay from disk from now on and release the in-memory frames
+            self.path = path
+            self.frames = []
+        self._notify()
+
+    async def stream(self):
+        """Yield every frame as an NDJSON line (produced ones first) until the job ends."""
+        k = 0
+        while True:
+            if self.path is not None:
+                with open(self.path) as f:
+                    for index, line in enumerate(f):
+                        if index >= k:
+                            yield line.rstrip('\n')
+                return
+            while k < len(self.frames):
+                yield encode_frame(self.frames[k])
+                k += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class SimulationService:
+    """Job registry, result cache and bounded tracker pool."""
+
+    def __init__(self, ocean_data, wind_data, land_mask, workers=2, max_pending=16,
+                 cache_dir=None, cache_size=64, max_particles=20000, max_steps=3650,
+                 max_frame_points=4000000, max_frames=1000):
+        """
+        Parameters
+        ----------
+        ocean_data, wind_data : OceanCurrentData, WindData
+            Forcing shared by all jobs (field caches are safe to share)
+        land_mask : LandMask
+            Land mask shared by all jobs
+        workers : int
+            Jobs run concurrently
+        max_pending : int
+            Unfinished jobs accepted beyond `workers` before refusing new ones
+        cache_dir : str, optional
+            Spool frames to `<id>.ndjson` here and reuse them across
+            restarts (defaults to a temporary directory removed on close)
+        cache_size : int
+            Finished jobs kept in the registry
+        max_particles, max_steps, max_frame_points, max_frames : int
+            Per-job limits (see `normalize_params`)
+        """
+        self.ocean_data = ocean_data
+        self.wind_data = wind_data
+        self.land_mask = land_mask
+        self.workers = workers
+        self.max_pending = max_pending
+        self._temporary = cache_dir is None
+        self.cache_dir = tempfile.mkdtemp(prefix='plastic_jobs_') if cache_dir is None else cache_dir
+        self.cache_size = cache_size
+        self.limits = {'max_particles': max_particles, 'max_steps': max_steps,
+                       'max_frame_points': max_frame_points, 'max_frames': max_frames}
+        self.forcing_version = forcing_version(ocean_data, wind_data)
+        self.jobs = OrderedDict()  # Job id -> Job, least recently used first
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def job_id(self, params):
+        """Cache key of normalized parameters (which include the seed) and forcing."""
+        key = {'params': params, 'forcing': self.forcing_version, 'version': SERVICE_VERSION}
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+
+    @property
+    def active(self):
+        return sum(not job.done for job in self.jobs.values())
+
+    def _cache_path(self, job_id):
+        return os.path.join(self.cache_dir, f'{job_id}.ndjson')
+
+    def submit(self, params):
+        """
+        Register a job, or return the existing one for identical parameters.
+
+        Must be called from the event loop. Returns `(job, reused)`.
+        """
+        params = normalize_params(params, **self.limits)
+        job_id = self.job_id(params)
+        job = self.jobs.get(job_id)
+        if job is not None and job.status not in ('failed', 'cancelled'):
+            self.jobs.move_to_end(job_id)
+            return job, True
+
+        job = Job(job_id, params)
+        if os.path.exists(self._cache_path(job_id)):
+            with open(self._cache_path(job_id)) as f:
+                job.num_frames = sum(1 for _ in f)
+            job.path = self._cache_path(job_id)
+            job.step = params['steps']  # Only completed runs are spooled under their id
+            job.status = 'done'
+            self._remember(job)
+            return job, True
+
+        if self.active >= self.workers + self.max_pending:
+            raise QueueFull(f"{self.active} jobs are already queued or running")
+        self._remember(job)
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(self._executor, self._run, job, loop)
+        return job, False
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        # Forget the oldest finished jobs beyond the in-memory cache size
+        finished = [job_id for job_id, old in self.jobs.items() if old.done]
+        for job_id in finished[:max(len(finished) - self.cache_size, 0)]:
+            del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and not job.done:
+            job.cancelled = True
+        return job
+
+    def make_frame(self, tracker, step, params):
+        """JSON-ready snapshot of a tracker after `step` steps."""
+        frame = {
+            'step': step,
+            'day': float(tracker.elapsed_time),
+            'status': {STATUS_NAMES[code]: int(count)
+                       for code, count in enumerate(np.bincount(tracker.status,
+                                                                minlength=len(STATUS_NAMES)))},
+        }
+        if params['frame'] == 'density':
+            density = DensityAccumulator(resolution=params['resolution'])
+            density.add(tracker.positions)
+            density.close_frame()
+            frame['density'] = density.to_geojson()
+        else:
+            lon = (tracker.positions[:, 0] + 180) % 360 - 180
+            frame['positions'] = np.column_stack((lon, tracker.positions[:, 1])).astype(np.float32)
+        return frame
+
+    def _run(self, job, loop):
+        """Run one job on a pool thread, publishing frames to the event loop."""
+        params = job.params
+        tmp_path = self._cache_path(job.id) + f'.{id(job)}.tmp'
+        try:
+            if job.cancelled:
+                loop.call_soon_threadsafe(job.finish, 'cancelled')
+                return
+            rng = np.random.default_rng(params['seed'])
+            starts = np.column_stack((
+                params['lon'] + rng.normal(0, params['spread'], params['particles']),
+                params['lat'] + rng.normal(0, params['spread'], params['particles']),
+            ))
+            start_date = None
+            if params['start_date'] is not None:
+                start_date = datetime.fromisoformat(params['start_date'])
+            tracker = EnsembleTracker(
+                starts, dt=params['dt'], rng=rng, integrator=params['integrator'],
+                land_mask=self.land_mask, ocean_data=self.ocean_data, wind_data=self.wind_data,
+                start_date=start_date, land_interaction=params['land_interaction'],
+                record_every=params['steps'])
+            with open(tmp_path, 'w') as spool:
+                def publish(step):
+                    frame = self.make_frame(tracker, step, params)
+                    spool.write(encode_frame(frame) + '\n')
+                    loop.call_soon_threadsafe(job.publish, frame)
+
+                publish(0)
+                for step in range(1, params['steps'] + 1):
+                    if job.cancelled:
+                        break
+                    tracker.update()
+                    if step % params['frame_every'] == 0 or step == params['steps']:
+                        publish(step)
+
+            if job.cancelled:
+                os.remove(tmp_path)
+                loop.call_soon_threadsafe(job.finish, 'cancelled')
+                return
+            os.replace(tmp_path, self._cache_path(job.id))
+            loop.call_soon_threadsafe(job.finish, 'done', None, self._cache_path(job.id))
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            loop.call_soon_threadsafe(job.finish, 'failed', str(e))
+
+    def health(self):
+        return {
+            'forcing_version': self.forcing_version,
+            'workers': self.workers,
+            'active': self.active,
+            'max_pending': self.max_pending,
+            'jobs': len(self.jobs),
+        }
+
+    def close(self):
+        for job in self.jobs.values():
+            job.cancelled = True
+        self._executor.shutdown(wait=True)
+        if self._temporary:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def create_app(service, cors_origin='*'):
+    """aiohttp application exposing `service` over HTTP and WebSockets."""
+    from aiohttp import WSMsgType, web
+
+    def get_job(request):
+        job = service.jobs.get(request.match_info['job_id'])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({'error': 'unknown job'}),
+                                   content_type='application/json')
+        return job
+
+    @web.middleware
+    async def cors(request, handler):
+        if request.method == 'OPTIONS':
+            response = web.Response()
+        else:
+            response = await handler(request)
+        response.headers['Access-Control-Allow-Origin'] = cors_origin
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        return response
+
+    async def submit(request):
+        try:
+            params = await request.json()
+            job, reused = service.submit(params)
+        except (ValueError, TypeError) as e:
+            return web.json_response({'error': str(e)}, status=400)
+        except QueueFull as e:
+            return web.json_response({'error': str(e)}, status=503)
+        return web.json_response(dict(job.describe(), reused=reused), status=200 if reused else 202)
+
+    async def status(request):
+        return web.json_response(get_job(request).describe())
+
+    async def cancel(request):
+        job = service.cancel(request.match_info['job_id']) or get_job(request)
+        return web.json_response(job.describe())
+
+    async def stream(request):
+        job = get_job(request)
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        # Flush every frame through proxies instead of buffering the response
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Access-Control-Allow-Origin'] = cors_origin
+        await response.prepare(request)
+        async for line in job.stream():
+            await response.write((line + '\n').encode())
+        await response.write((json.dumps({'end': job.describe()}) + '\n').encode())
+        await response.write_eof()
+        return response
+
+    async def websocket(request):
+        job = get_job(request)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def client_messages():
+            async for message in ws:
+                if message.type == WSMsgType.TEXT and message.data == 'cancel':
+                    service.cancel(job.id)
+
+        listener = asyncio.ensure_future(client_messages())
+        try:
+            async for line in job.stream():
+                if ws.closed:
+                    break
+                await ws.send_str(line)
+            if not ws.closed:
+                await ws.send_str(json.dumps({'end': job.describe()}))
+        finally:
+            listener.cancel()
+            await ws.close()
+        return ws
+
+    async def health(request):
+        return web.json_response(service.health())
+
+    async def on_cleanup(app):
+        service.close()
+
+    app = web.Application(middlewares=[cors])
+    app.add_routes([
+        web.post('/jobs', submit),
+        web.get('/jobs/{job_id}', status),
+        web.delete('/jobs/{job_id}', cancel),
+        web.get('/jobs/{job_id}/stream', stream),
+        web.get('/jobs/{job_id}/ws', websocket),
+        web.get('/health', health),
+    ])
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve plastic dispersion runs over HTTP.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--workers', type=int, default=2, help='Concurrent jobs')
+    parser.add_argument('--max-pending', type=int, default=16,
+                        help='Queued jobs accepted beyond the running ones')
+    parser.add_argument('--ocean-cache')
+    parser.add_argument('--wind-cache')
+    parser.add_argument('--ocean-nest', action='append', default=[],
+                        help='Regional current cache nested in --ocean-cache (repeatable)')
+    parser.add_argument('--land-resolution', type=float, default=0.1)
+    parser.add_argument('--cache-dir', help='Spool job frames here and keep them across restarts')
+    parser.add_argument('--cors-origin', default='*')
+    args = parser.parse_args()
+
+    from aiohttp import web
+
+    ocean_data, wind_data = load_forcing(args.ocean_cache, args.wind_cache, args.ocean_nest)
+    service = SimulationService(ocean_data, wind_data, LandMask(resolution=args.land_resolution),
+                                workers=args.workers, max_pending=args.max_pending,
+                                cache_dir=args.cache_dir)
+    print(f"Forcing version {service.forcing_version}")
+    web.run_app(create_app(service, args.cors_origin), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Columnar trajectory storage for trackers.
+
+Instead of appending one small position array per step, trackers write rows
+of (time, lon, lat, status, particle_id) into preallocated float32/int
+column buffers. Without an output file the buffers grow geometrically and
+stay in memory; with one, each full chunk is flushed to NetCDF or Parquet
+and the buffer is reused, so memory stays bounded for long, many-particle
+runs.
+"""
+import os
+
+import numpy as np
+
+COLUMNS = (
+    ('time', np.float32),
+    ('lon', np.float32),
+    ('lat', np.float32),
+    ('status', np.int8),
+    ('particle_id', np.int32),
+)
+
+# Particle status codes stored in the `status` column
+ACTIVE = 0
+BEACHED = 1
+RESUSPENDED = 2  # Left the coast again during this step
+OUT_OF_DOMAIN = 3
+STATUS_NAMES = ('active', 'beached', 'resuspended', 'out_of_domain')
+
+
+class NetCDFSink:
+    """Append trajectory rows to a NetCDF file with an unlimited `obs` dimension."""
+
+    def __init__(self, path):
+        from netCDF4 import Dataset
+
+        self.nc = Dataset(path, 'w')
+        self.nc.createDimension('obs', None)
+        self.variables = {name: self.nc.createVariable(name, dtype, ('obs',), zlib=True)
+                          for name, dtype in COLUMNS}
+        self.variables['time'].units = 'days since release'
+        self.variables['lon'].units = 'degrees_east'
+        self.variables['lat'].units = 'degrees_north'
+        self.variables['status'].flag_values = np.arange(len(STATUS_NAMES), dtype=np.int8)
+        self.variables['status'].flag_meanings = ' '.join(STATUS_NAMES)
+        self.size = 0
+
+    def write(self, columns):
+        n = len(columns['time'])
+        for name, values in columns.items():
+            self.variables[name][self.size:self.size + n] = values
+        self.size += n
+
+    def close(self):
+        self.nc.close()
+
+
+class ParquetSink:
+    """Append trajectory rows to a Parquet file, one row group per chunk."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, columns):
+        table = self.pa.Table.from_arrays([self.pa.array(columns[name]) for name, _ in COLUMNS],
+                                          schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_sink(path):
+    """Choose a sink from the file extension (.nc or .parquet)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.nc', '.nc4'):
+        return NetCDFSink(path)
+    if extension in ('.parquet', '.pq'):
+        return ParquetSink(path)
+    raise ValueError(f"Unsupported trajectory file type '{extension}' (use .nc or .parquet)")
+
+
+class TrajectoryStore:
+    """
+    Preallocated, chunked trajectory buffer for N particles.
+
+    Each recorded step adds N rows. `every` keeps only every k-th step
+    (the first step is always kept). Positions are stored as float32.
+    """
+
+    def __init__(self, num_particles, chunk_steps=64, every=1, path=None):
+        """
+        Parameters
+        ----------
+        num_particles : int
+            Number of particles per recorded step
+        chunk_steps : int
+            Steps per buffer chunk (initial capacity in memory mode)
+        every : int
+            Record every `every`-th appended step
+        path : str, optional
+            Stream chunks to this .nc or .parquet file instead of keeping them
+        """
+        self.num_particles = int(num_particles)
+        self.chunk_steps = int(chunk_steps)
+        self.every = max(int(every), 1)
+        self.sink = open_sink(path) if path is not None else None
+        self.path = path
+
+        self._columns = {name: np.empty(self.chunk_steps * self.num_particles, dtype=dtype)
+                         for name, dtype in COLUMNS}
+        self._ids = np.arange(self.num_particles, dtype=np.int32)
+        self._steps = 0  # Steps held in the buffer
+        self._appended = 0  # Steps offered to `append`, recorded or not
+        self.flushed_steps = 0
+
+    @property
+    def capacity(self):
+        return len(self._columns['time']) // self.num_particles
+
+    @property
+    def num_steps(self):
+        """Steps recorded in memory (excluding flushed ones)."""
+        return self._steps
+
+    def append(self, time, positions, status=None):
+        """Record one step of (N, 2) positions at `time` (days)."""
+        appended = self._appended
+        self._appended += 1
+        if appended % self.every:
+            return
+
+        if self._steps == self.capacity:
+            if self.sink is not None:
+                self.flush()
+            else:
+                for name, column in self._columns.items():
+                    grown = np.empty(2 * len(column), dtype=column.dtype)
+                    grown[:len(column)] = column
+                    self._columns[name] = grown
+
+        n = self.num_particles
+        rows = slice(self._steps * n, (self._steps + 1) * n)
+        columns = self._columns
+        columns['time'][rows] = time
+        columns['lon'][rows] = positions[:, 0]
+        columns['lat'][rows] = positions[:, 1]
+        columns['status'][rows] = 0 if status is None else status
+        columns['particle_id'][rows] = self._ids
+        self._steps += 1
+
+    def columns(self):
+        """Views of the in-memory columns (no copies)."""
+        size = self._steps * self.num_particles
+        return {name: column[:size] for name, column in self._columns.items()}
+
+    def track(self, particle=0):
+        """(lon, lat) views of one particle's in-memory track."""
+        size = self._steps * self.num_particles
+        return (self._columns['lon'][particle:size:self.num_particles],
+                self._columns['lat'][particle:size:self.num_particles])
+
+    def trajectories(self):
+        """In-memory positions as a (steps, N, 2) float32 array."""
+        columns = self.columns()
+        shape = (self._steps, self.num_particles)
+        return np.stack((columns['lon'].reshape(shape), columns['lat'].reshape(shape)), axis=-1)
+
+    def flush(self):
+        """Write buffered rows to the sink and reuse the buffer."""
+        if self.sink is None or self._steps == 0:
+            return
+        self.sink.write(self.columns())
+        self.flushed_steps += self._steps
+        self._steps = 0
+
+    def close(self):
+        """Flush remaining rows and close the output file."""
+        if self.sink is not None:
+            self.flush()
+            self.sink.close()
+            self.sink = None
@@ -0,0 +1,339 @@
+"""
+Sparse Markov transport matrices for long-horizon, climatological runs.
+
+Instead of stepping particles day by day for years, the ocean is divided
+into grid cells and the tracker dynamics are summarized once as a
+transition matrix: `per_cell` particles are seeded uniformly in every ocean
+cell, advected for one forcing `period` with the normal `EnsembleTracker`
+(currents, wind, eddies, diffusion and beaching), and the fraction ending
+in each cell becomes one row. Two absorbing states collect particles that
+beach or leave the grid.
+
+A distribution over cells is then advanced one period per sparse
+matrix-vector product, so a decade of accumulation (e.g. garbage-patch
+formation) is a few hundred products:
+
+    transport = open_transport_matrix('cache/transport', resolution=1.0, period=5,
+                                      ocean_data=ocean_data, wind_data=wind_data)
+    final = transport.evolve(transport.uniform(), periods=730)
+    grid = transport.to_grid(final)
+
+Matrices are saved with `scipy.sparse.save_npz` under a key hashing the
+grid, the dynamics settings and the loaded forcing version, so they are
+built once per configuration.
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+from scipy.ndimage import distance_transform_edt
+
+from density import DensityAccumulator
+from ensemble_tracker import EnsembleTracker
+from field_cache import forcing_version
+from land_mask import LandMask
+from trajectory_store import BEACHED, OUT_OF_DOMAIN
+
+TRANSPORT_VERSION = 2  # 2: water particles in land-centred cells map to the nearest ocean cell
+
+
+class TransportMatrix:
+    """
+    Row-stochastic transition matrix over ocean cells for one period.
+
+    States are the ocean cells of `grid` (in `cells` order) followed by the
+    absorbing 'beached' and 'lost' states.
+    """
+
+    def __init__(self, matrix, cells, grid, period):
+        """
+        Parameters
+        ----------
+        matrix : scipy.sparse matrix
+            (states, states) transition probabilities, rows summing to 1
+        cells : numpy.ndarray
+            Flat (lat, lon) index in `grid` of every ocean state
+        grid : DensityAccumulator
+            Cell layout (resolution and bounds)
+        period : float
+            Days covered by one transition
+        """
+        self.matrix = sparse.csr_matrix(matrix)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.grid = grid
+        self.period = period
+        self.beached = len(self.cells)
+        self.lost = len(self.cells) + 1
+        self._transposed = self.matrix.T.tocsr()  # Distributions are advanced as P^T v
+
+        # Grid cell -> state index. Cells whose centre is on land map to the
+        # nearest ocean cell, since particles in them are still in the water
+        # (beaching is decided by the tracker status, not by the cell).
+        self.state_of_cell = np.full(grid.nx * grid.ny, -1, dtype=np.int64)
+        self.state_of_cell[self.cells] = np.arange(len(self.cells))
+        if 0 < len(self.cells) < grid.nx * grid.ny:
+            self.state_of_cell = self.state_of_cell[self._nearest_ocean_cell()]
+
+    def _nearest_ocean_cell(self):
+        """Flat index of the nearest ocean cell for every grid cell."""
+        grid = self.grid
+        land = np.ones(grid.nx * grid.ny, dtype=bool)
+        land[self.cells] = False
+        land = land.reshape(grid.ny, grid.nx)
+        pad = grid.nx // 2 if grid.periodic else 0
+        if pad:
+            land = np.pad(land, ((0, 0), (pad, pad)), mode='wrap')
+        i, j = distance_transform_edt(land, return_distances=False, return_indices=True)
+        i = i[:, pad:pad + grid.nx]
+        j = np.mod(j[:, pad:pad + grid.nx] - pad, grid.nx)
+        return (i * grid.nx + j).ravel()
+
+    @property
+    def num_states(self):
+        return self.matrix.shape[0]
+
+    def states(self, positions):
+        """
+        State index of each position. Positions in land-centred cells map to
+        the nearest ocean cell and off-grid positions to the lost state.
+        """
+        cells = self.grid.cell_indices(positions)
+        states = np.where(cells >= 0, self.state_of_cell[np.maximum(cells, 0)], self.lost)
+        return np.where(states >= 0, states, self.beached)
+
+    def distribution(self, positions, weights=None):
+        """Normalized state distribution of particle positions."""
+        vector = np.bincount(self.states(positions), weights=weights,
+                             minlength=self.num_states).astype(np.float64)
+        return vector / vector.sum()
+
+    def uniform(self):
+        """Equal probability in every ocean cell (e.g. uniformly released debris)."""
+        vector = np.zeros(self.num_states)
+        vector[:len(self.cells)] = 1.0 / len(self.cells)
+        return vector
+
+    def step(self, vector):
+        """Advance a distribution by one period."""
+        return self._transposed @ vector
+
+    def evolve(self, vector, periods, average=False):
+        """
+        Advance a distribution by `periods` periods.
+
+        With `average=True` the mean over all visited periods is returned
+        instead of the final distribution (time-integrated accumulation).
+        """
+        vector = np.asarray(vector, dtype=np.float64)
+        total = np.zeros_like(vector)
+        for _ in range(periods):
+            vector = self._transposed @ vector
+            total += vector
+        return total / max(periods, 1) if average else vector
+
+    def snapshots(self, vector, periods, every=1):
+        """Yield `(days, distribution)` every `every` periods."""
+        vector = np.asarray(vector, dtype=np.float64)
+        for k in range(1, periods + 1):
+            vector = self._transposed @ vector
+            if k % every == 0:
+                yield k * self.period, vector
+
+    def to_grid(self, vector):
+        """Ocean part of a distribution as a (lat, lon) grid (NaN on land)."""
+        grid = np.full(self.grid.nx * self.grid.ny, np.nan)
+        grid[self.cells] = vector[:len(self.cells)]
+        return grid.reshape(self.grid.ny, self.grid.nx)
+
+    def save(self, path):
+        """Write `<path>.npz` (sparse matrix) and `<path>.json` (grid and cells)."""
+        sparse.save_npz(path + '.npz', self.matrix)
+        meta = {
+            'version': TRANSPORT_VERSION,
+            'resolution': self.grid.resolution,
+            'bounds': [self.grid.west, self.grid.east, self.grid.south, self.grid.north],
+            'period': self.period,
+            'cells': self.cells.tolist(),
+        }
+        # Metadata is written last so an interrupted save never looks valid
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump(meta, f, separators=(',', ':'))
+        os.replace(path + '.json.tmp', path + '.json')
+
+    @classmethod
+    def load(cls, path):
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        grid = DensityAccumulator(resolution=meta['resolution'], bounds=meta['bounds'])
+        return cls(sparse.load_npz(path + '.npz'), meta['cells'], grid, meta['period'])
+
+
+def ocean_cells(grid, land_mask):
+    """Flat indices of the grid cells whose centre is in the water."""
+    lon, lat = np.meshgrid(grid.lons, grid.lats)
+    water = ~land_mask.is_on_land(lon.ravel(), lat.ravel())
+    return np.flatnonzero(water)
+
+
+def build_transport_matrix(resolution=1.0, bounds=(0, 360, -80, 80), period=5, dt=1,
+                           per_cell=16, land_mask=None, chunk_cells=20000, rng=None,
+                           **tracker_kwargs):
+    """
+    Estimate the transition matrix from short tracker runs.
+
+    Parameters
+    ----------
+    resolution : float
+        Cell size in degrees
+    bounds : tuple
+        (west, east, south, north) of the grid in 0-360° longitudes
+    period : float
+        Days per transition
+    dt : float
+        Tracker time step in days
+    per_cell : int
+        Particles seeded per ocean cell
+    land_mask : LandMask, optional
+        Shared land mask
+    chunk_cells : int
+        Cells advected per tracker, bounding memory use
+    rng : numpy.random.Generator, int or None
+        Random generator (or seed) for seeding and the tracker dynamics
+    **tracker_kwargs
+        Extra arguments for `EnsembleTracker` (forcing, start date, ...)
+
+    Returns
+    -------
+    TransportMatrix
+    """
+    rng = np.random.default_rng(rng)
+    land_mask = land_mask if land_mask is not None else LandMask()
+    grid = DensityAccumulator(resolution=resolution, bounds=bounds)
+    cells = ocean_cells(grid, land_mask)
+    transport = TransportMatrix(sparse.identity(len(cells) + 2), cells, grid, period)
+    num_steps = int(np.ceil(period / dt))
+    domain = None if grid.periodic else bounds
+
+    rows, columns, counts = [], [], []
+    for start in range(0, len(cells), chunk_cells):
+        chunk = np.arange(start, min(start + chunk_cells, len(cells)))
+        source = np.repeat(chunk, per_cell)
+        i, j = np.divmod(cells[source], grid.nx)
+
+        # Uniform seeds in each cell; seeds on land fall back to the cell centre
+        seeds = np.column_stack((
+            grid.west + (j + rng.random(len(source))) * resolution,
+            grid.south + (i + rng.random(len(source))) * resolution,
+        ))
+        on_land = land_mask.is_on_land(seeds[:, 0], seeds[:, 1])
+        seeds[on_land, 0] = grid.lons[j[on_land]]
+        seeds[on_land, 1] = grid.lats[i[on_land]]
+
+        tracker = EnsembleTracker(seeds, dt=dt, rng=rng, land_mask=land_mask,
+                                  land_interaction='beach', domain=domain,
+                                  record_every=num_steps, **tracker_kwargs)
+        tracker.run(num_steps)
+        tracker.close()
+
+        target = transport.states(tracker.positions)
+        target[tracker.status == BEACHED] = transport.beached
+        target[tracker.status == OUT_OF_DOMAIN] = transport.lost
+        pairs, pair_counts = np.unique(source * transport.num_states + target,
+                                       return_counts=True)
+        rows.append(pairs // transport.num_states)
+        columns.append(pairs % transport.num_states)
+        counts.append(pair_counts)
+        print(f"Transport matrix: {chunk[-1] + 1} of {len(cells)} cells")
+
+    # Absorbing states keep their mass
+    rows.append([transport.beached, transport.lost])
+    columns.append([transport.beached, transport.lost])
+    counts.append([per_cell, per_cell])
+
+    matrix = sparse.coo_matrix(
+        (np.concatenate(counts).astype(np.float64) / per_cell,
+         (np.concatenate(rows), np.concatenate(columns))),
+        shape=(transport.num_states, transport.num_states))
+    return TransportMatrix(matrix, cells, grid, period)
+
+
+def land_mask_version(land_mask):
+    """Short hash identifying a land mask raster (resolution and content)."""
+    digest = hashlib.sha256(np.packbits(land_mask.mask).tobytes())
+    return f'{land_mask.resolution:g}:{digest.hexdigest()[:16]}'
+
+
+def transport_key(ocean_data=None, wind_data=None, land_mask=None, **settings):
+    """Cache key of the grid and dynamics settings plus the loaded forcing and land mask."""
+    settings = dict(settings, forcing=forcing_version(ocean_data, wind_data),
+                    land=None if land_mask is None else land_mask_version(land_mask),
+                    version=TRANSPORT_VERSION)
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+
+def open_transport_matrix(cache_dir, resolution=1.0, bounds=(0, 360, -80, 80), period=5, dt=1,
+                          per_cell=16, seed=0, ocean_data=None, wind_data=None, **build_kwargs):
+    """Load the matching cached matrix from `cache_dir`, building and saving it if missing."""
+    if build_kwargs.get('land_mask') is None:
+        build_kwargs['land_mask'] = LandMask()
+    key = transport_key(ocean_data, wind_data, build_kwargs['land_mask'],
+                        resolution=resolution, bounds=list(bounds),
+                        period=period, dt=dt, per_cell=per_cell, seed=seed,
+                        **{name: value for name, value in build_kwargs.items()
+                           if name not in ('land_mask', 'chunk_cells')})
+    path = os.path.join(cache_dir, f'transport_{key}')
+    if os.path.exists(path + '.json'):
+        return TransportMatrix.load(path)
+
+    print(f"Building transport matrix in {cache_dir}...")
+    os.makedirs(cache_dir, exist_ok=True)
+    transport = build_transport_matrix(resolution, bounds, period, dt, per_cell, rng=seed,
+                                       ocean_data=ocean_data, wind_data=wind_data,
+                                       **build_kwargs)
+    transport.save(path)
+    return transport
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-horizon accumulation from a transport matrix.')
+    parser.add_argument('--cache-dir', default='transport_cache')
+    parser.add_argument('--resolution', type=float, default=1.0)
+    parser.add_argument('--period', type=float, default=5, help='Days per transition')
+    parser.add_argument('--per-cell', type=int, default=16, help='Particles seeded per cell')
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--ocean-cache')
+    parser.add_argument('--wind-cache')
+    parser.add_argument('--land-resolution', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='accumulation.npz')
+    parser.add_argument('--geojson', help='Final distribution as a GeoJSON map layer')
+    args = parser.parse_args()
+
+    from campaign import load_forcing
+
+    ocean_data, wind_data = load_forcing(args.ocean_cache, args.wind_cache)
+    transport = open_transport_matrix(
+        args.cache_dir, resolution=args.resolution, period=args.period, per_cell=args.per_cell,
+        seed=args.seed, ocean_data=ocean_data, wind_data=wind_data,
+        land_mask=LandMask(resolution=args.land_resolution))
+
+    periods = int(round(args.years * 365.25 / args.period))
+    final = transport.evolve(transport.uniform(), periods)
+    np.savez_compressed(args.output, concentration=transport.to_grid(final).astype(np.float32),
+                        lons=transport.grid.lons, lats=transport.grid.lats,
+                        beached=final[transport.beached], lost=final[transport.lost],
+                        days=periods * args.period)
+    print(f"{args.years:g} years ({periods} periods): {final[transport.beached]:.1%} beached, "
+          f"{final[transport.lost]:.1%} left the grid; saved to {args.output}")
+    if args.geojson:
+        grid = transport.grid
+        grid.frames = [(0, periods * args.period, np.nan_to_num(transport.to_grid(final)), 1)]
+        grid.save_geojson(args.geojson)
+        print(f"Saved map layer to {args.geojson}")
+
+
+if __name__ == "__main__":
+    main()
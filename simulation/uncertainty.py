@@ -0,0 +1,316 @@
+"""
+Monte Carlo uncertainty estimates with variance reduction and early stopping.
+
+A single tracker is one eddy realization and one diffusion path, so on its
+own it says little about where a release is likely to end up.
+`UncertaintyEstimator` runs ensemble members, each with its own
+`np.random.Generator` stream spawned from one `SeedSequence` (eddy field,
+diffusion and beaching draws), and estimates the probability of the final
+particle position per grid cell, plus optionally the probability of ending
+inside a region.
+
+Variance reduction:
+
+- antithetic pairs: the second member of a pair replays the first one's
+  random stream with every normal draw mirrored (negated eddy field and
+  diffusion increments) and its release cloud reflected about the release
+  point. The pair average is the independent sample
+- quasi-random sampling: uncertain physical parameters (windage and
+  diffusion by default) follow a scrambled Sobol sequence across members,
+  and each member's release cloud is a scrambled Sobol set mapped to a
+  Gaussian instead of plain pseudo-random draws
+
+Members run in batches. After every batch the standard error of the
+estimate is computed from the independent samples, and the run stops as
+soon as it falls below `tolerance`, so only as many members are paid for
+as the answer needs.
+
+Usage:
+    python uncertainty.py --start 204 22 --steps 180 --tolerance 0.005 \\
+        --region 200 215 15 25 --output uncertainty.npz
+"""
+import argparse
+
+import numpy as np
+from scipy.stats import norm, qmc
+
+from density import DensityAccumulator
+from ensemble_tracker import EnsembleTracker
+from land_mask import LandMask
+from wind_data import WindData
+
+# Default uncertain tracker attributes and their (low, high) ranges
+DEFAULT_PARAMETERS = {
+    'windage': (0.01, 0.03),
+    'D': (0.025, 0.1),
+}
+
+
+class MirroredGenerator(np.random.Generator):
+    """
+    Generator returning the antithetic counterpart of another stream.
+
+    Built on a bit generator with the same state as the original, it
+    reflects every normal draw about its mean and every uniform draw `u` to
+    `1 - u`, so a tracker using it sees the mirror image of the original
+    member's eddies, diffusion and beaching decisions.
+    """
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        return 2 * np.asarray(loc) - super().normal(loc, scale, size)
+
+    def standard_normal(self, size=None, dtype=np.float64, out=None):
+        return -super().standard_normal(size, dtype=dtype, out=out)
+
+    def random(self, size=None, dtype=np.float64, out=None):
+        return 1 - super().random(size, dtype=dtype, out=out)
+
+
+def member_generators(seed_sequence, antithetic):
+    """Generators for one independent sample: a member, or an antithetic pair."""
+    generators = [np.random.Generator(np.random.PCG64(seed_sequence))]
+    if antithetic:
+        generators.append(MirroredGenerator(np.random.PCG64(seed_sequence)))
+    return generators
+
+
+class UncertaintyResult:
+    """Converged (or budget-limited) Monte Carlo estimate."""
+
+    def __init__(self, density, mean, stderr, members, samples, converged, history,
+                 region_probability=None, region_stderr=None, parameters=None):
+        self.density = density  # Grid description (DensityAccumulator)
+        self.mean = mean  # Probability per cell, shaped (lat, lon)
+        self.stderr = stderr  # Standard error per cell
+        self.members = members
+        self.samples = samples  # Independent samples (antithetic pairs count once)
+        self.converged = converged
+        self.history = history  # (members, error) after every batch
+        self.region_probability = region_probability
+        self.region_stderr = region_stderr
+        self.parameters = parameters  # Parameter values used by each member
+
+    def save(self, path):
+        """Write the estimate as a compressed `.npz` file."""
+        extra = {}
+        if self.region_probability is not None:
+            extra = {'region_probability': self.region_probability,
+                     'region_stderr': self.region_stderr}
+        np.savez_compressed(
+            path, mean=self.mean.astype(np.float32), stderr=self.stderr.astype(np.float32),
+            lons=self.density.lons, lats=self.density.lats, members=self.members,
+            samples=self.samples, converged=self.converged,
+            history=np.array(self.history, dtype=np.float64), **extra)
+
+
+class UncertaintyEstimator:
+    """Run ensemble members of one release until the estimate converges."""
+
+    def __init__(self, lon, lat, spread=0.1, particles=100, num_steps=100, dt=1,
+                 parameters=None, antithetic=True, quasi_random=True, resolution=1.0,
+                 bounds=(0, 360, -90, 90), region=None, tolerance=0.01, min_members=8,
+                 max_members=512, batch=8, seed=0, land_mask=None, wind_data=None,
+                 **tracker_kwargs):
+        """
+        Parameters
+        ----------
+        lon, lat : float
+            Release point (0-360° longitude)
+        spread : float
+            Standard deviation of the release cloud in degrees
+        particles : int
+            Particles per member
+        num_steps : int
+            Steps per member; the estimate is for the final positions
+        dt : float
+            Time step in days
+        parameters : dict, optional
+            Tracker attributes to vary, as name -> (low, high); defaults to
+            `DEFAULT_PARAMETERS`, and {} keeps the tracker defaults
+        antithetic : bool
+            Run members as antithetic pairs
+        quasi_random : bool
+            Use scrambled Sobol points for parameters and release clouds
+        resolution, bounds
+            Probability grid (see `DensityAccumulator`)
+        region : tuple, optional
+            (west, east, south, north); also estimate the probability of
+            ending inside it and use that for the stopping rule
+        tolerance : float
+            Stop once the standard error (largest over cells, or of the
+            region probability) is below this
+        min_members, max_members : int
+            Bounds on the number of members run
+        batch : int
+            Members per convergence check (rounded up to whole pairs)
+        seed : int or numpy.random.SeedSequence
+            Root of all member streams
+        land_mask, wind_data
+            Shared across members (loaded once when not given)
+        **tracker_kwargs
+            Extra arguments for `EnsembleTracker` (ocean data, integrator, ...)
+        """
+        self.center = np.array([lon % 360, lat], dtype=np.float64)
+        self.spread = spread
+        self.particles = particles
+        self.num_steps = num_steps
+        self.dt = dt
+        self.parameters = DEFAULT_PARAMETERS if parameters is None else dict(parameters)
+        self.antithetic = antithetic
+        self.quasi_random = quasi_random
+        self.density = DensityAccumulator(resolution=resolution, bounds=bounds)
+        self.region = region
+        self.tolerance = tolerance
+        self.group = 2 if antithetic else 1
+        self.min_members = min_members
+        self.max_members = max_members
+        self.batch = max(self.group, batch + batch % self.group)
+        self.seed_sequence = (seed if isinstance(seed, np.random.SeedSequence)
+                              else np.random.SeedSequence(seed))
+
+        if land_mask is None:
+            land_mask = LandMask()
+        if wind_data is None:
+            wind_data = WindData()
+            wind_data.download_era5_data(2025, 2, 12)
+        self.tracker_kwargs = dict(tracker_kwargs, land_mask=land_mask, wind_data=wind_data)
+
+        # Parameter points for every independent sample, drawn up front
+        samples = -(-max_members // self.group)
+        names = list(self.parameters)
+        rng = np.random.default_rng(self.seed_sequence.spawn(1)[0])
+        if not names:
+            unit = np.zeros((samples, 0))
+        elif quasi_random:
+            sobol = qmc.Sobol(len(names), scramble=True, seed=rng)
+            unit = sobol.random_base2(int(np.ceil(np.log2(samples))))[:samples]
+        else:
+            unit = rng.random((samples, len(names)))
+        low = np.array([self.parameters[name][0] for name in names])
+        high = np.array([self.parameters[name][1] for name in names])
+        self._parameter_values = low + unit * (high - low)
+        self._parameter_names = names
+
+    def release_cloud(self, rng):
+        """(particles, 2) standard-normal offsets for one release cloud."""
+        if not self.quasi_random:
+            return rng.standard_normal((self.particles, 2))
+        sobol = qmc.Sobol(2, scramble=True, seed=rng)
+        unit = sobol.random_base2(int(np.ceil(np.log2(self.particles))))[:self.particles]
+        return norm.ppf(np.clip(unit, 1e-12, 1 - 1e-12))
+
+    def in_region(self, positions):
+        west, east, south, north = self.region
+        return ((np.mod(positions[:, 0] - west, 360) <= (east - west) % 360)
+                & (positions[:, 1] >= south) & (positions[:, 1] <= north))
+
+    def run_sample(self, k, seed_sequence):
+        """
+        Run independent sample `k` (one member or one antithetic pair).
+
+        Returns the per-cell probability and region probability, averaged
+        over the members of the sample.
+        """
+        generators = member_generators(seed_sequence, self.antithetic)
+        cells = np.zeros(self.density.nx * self.density.ny)
+        region = 0.0
+        offsets = None
+        for m, rng in enumerate(generators):
+            if offsets is None:
+                # Draw the cloud from a separate stream so both pair members
+                # see identical eddy and diffusion draws (mirrored)
+                offsets = self.release_cloud(np.random.default_rng(seed_sequence.spawn(1)[0]))
+            sign = -1 if m else 1
+            starts = self.center + sign * self.spread * offsets
+            tracker = EnsembleTracker(starts, dt=self.dt, rng=rng, record_every=self.num_steps,
+                                      **self.tracker_kwargs)
+            for name, value in zip(self._parameter_names, self._parameter_values[k]):
+                setattr(tracker, name, value)
+            tracker.run(self.num_steps)
+            tracker.close()
+
+            index = self.density.cell_indices(tracker.positions)
+            cells += np.bincount(index[index >= 0], minlength=cells.size) / self.particles
+            if self.region is not None:
+                region += np.count_nonzero(self.in_region(tracker.positions)) / self.particles
+        return cells / len(generators), region / len(generators)
+
+    def run(self):
+        """Run members until the estimate converges or `max_members` is reached."""
+        n = 0
+        total = np.zeros(self.density.nx * self.density.ny)
+        total_sq = np.zeros_like(total)
+        region_total = region_sq = 0.0
+        history = []
+        converged = False
+        error = np.inf
+        max_samples = len(self._parameter_values)
+        min_samples = max(2, -(-self.min_members // self.group))
+
+        while n < max_samples:
+            count = min(self.batch // self.group, max_samples - n)
+            for k, seed_sequence in zip(range(n, n + count), self.seed_sequence.spawn(count)):
+                cells, region = self.run_sample(k, seed_sequence)
+                total += cells
+                total_sq += cells ** 2
+                region_total += region
+                region_sq += region ** 2
+            n += count
+
+            # Standard error of the mean from the independent samples
+            variance = np.maximum(total_sq - total ** 2 / n, 0) / max(n - 1, 1)
+            stderr = np.sqrt(variance / n)
+            if self.region is not None:
+                region_variance = max(region_sq - region_total ** 2 / n, 0) / max(n - 1, 1)
+                error = np.sqrt(region_variance / n)
+            else:
+                error = stderr.max()
+            history.append((n * self.group, float(error)))
+            print(f"{n * self.group} members: standard error {error:.4f} "
+                  f"(tolerance {self.tolerance})")
+            if n >= min_samples and error <= self.tolerance:
+                converged = True
+                break
+
+        shape = (self.density.ny, self.density.nx)
+        region_probability = region_error = None
+        if self.region is not None:
+            region_probability, region_error = region_total / n, float(error)
+        return UncertaintyResult(
+            self.density, (total / n).reshape(shape), stderr.reshape(shape), n * self.group, n,
+            converged, history, region_probability, region_error,
+            dict(zip(self._parameter_names, self._parameter_values[:n].T)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo end-position probabilities for a release.')
+    parser.add_argument('--start', type=float, nargs=2, default=(204, 22), metavar=('LON', 'LAT'))
+    parser.add_argument('--particles', type=int, default=100, help='Particles per member')
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--dt', type=float, default=1)
+    parser.add_argument('--resolution', type=float, default=1.0)
+    parser.add_argument('--region', type=float, nargs=4, metavar=('WEST', 'EAST', 'SOUTH', 'NORTH'))
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    parser.add_argument('--max-members', type=int, default=512)
+    parser.add_argument('--no-antithetic', action='store_true')
+    parser.add_argument('--no-sobol', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='uncertainty.npz')
+    args = parser.parse_args()
+
+    estimator = UncertaintyEstimator(
+        *args.start, particles=args.particles, num_steps=args.steps, dt=args.dt,
+        resolution=args.resolution, region=args.region, tolerance=args.tolerance,
+        max_members=args.max_members, antithetic=not args.no_antithetic,
+        quasi_random=not args.no_sobol, seed=args.seed)
+    result = estimator.run()
+    result.save(args.output)
+    state = 'converged' if result.converged else 'stopped at max members'
+    print(f"{state} after {result.members} members; saved to {args.output}")
+    if result.region_probability is not None:
+        print(f"Probability of ending in region: {result.region_probability:.4f} "
+              f"+/- {result.region_stderr:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Conversion of physical velocities to the trackers' degrees per day.
+
+The trackers move particles by `velocity * dt` with `dt` in days, so every
+forcing term must be in degrees per day. Currents and wind come from
+OSCAR and ERA5 in m/s. They are converted once, when a field is read or
+cached, by scaling each latitude row with a precomputed metric factor:
+    u [deg/day] = u [m/s] * 86400 / (METERS_PER_DEGREE * cos(lat))
+    v [deg/day] = v [m/s] * 86400 / METERS_PER_DEGREE
+Sampling then returns degrees per day directly, without trigonometry per
+call.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180  # Along a meridian
+SECONDS_PER_DAY = 86400.0
+
+# Trackers clip latitudes here; rows closer to the poles reuse its factor
+MAX_LATITUDE = 89.75
+
+UNITS = ('m/s', 'deg/day')
+
+
+def check_units(units):
+    if units not in UNITS:
+        raise ValueError(f"Unknown velocity units '{units}' (use 'm/s' or 'deg/day')")
+    return units
+
+
+def metric_factors(lats):
+    """
+    Degrees per day per m/s for each latitude row.
+
+    Parameters
+    ----------
+    lats : array_like
+        Row latitudes in degrees
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (zonal, meridional) factors, one per row
+    """
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    meridional = SECONDS_PER_DAY / METERS_PER_DEGREE
+    return meridional / np.cos(np.radians(lats)), np.full(lats.shape, meridional)
+
+
+def to_degrees_per_day(u, v, factors):
+    """
+    Convert (lat, lon) velocity fields from m/s to degrees per day.
+
+    `factors` is the `metric_factors` tuple for the field's latitude rows,
+    computed once per grid. `u` and `v` may carry extra leading axes (e.g.
+    time) as long as latitude is the second-to-last axis. The result keeps
+    the input dtype.
+    """
+    zonal, meridional = factors
+    u = np.asarray(u)
+    v = np.asarray(v)
+    return u * zonal.astype(u.dtype)[:, None], v * meridional.astype(v.dtype)[:, None]
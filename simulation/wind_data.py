@@ -1,74 +1,141 @@
-import cdsapi
-import xarray as xr
 import numpy as np
-from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from field_cache import FieldCache, default_cache_dir, open_field_cache
+from field_sampler import GridSampler
+from forcing import WindowedFieldProvider, days_since_epoch
+from nested_grid import NestedFieldProvider
+from wind_provider import WindProvider, as_date
+
+FALLBACK_DATE = date(2025, 2, 12)  # Known available ERA5 date
 
 class WindData:
-    def __init__(self):
-        self.client = None
-        self.wind_u = None  # Zonal wind component (West-East)
-        self.wind_v = None  # Meridional wind component (South-North)
+    def __init__(self, dtype=np.float64):
+        self.wind_u = None  # Zonal wind component (West-East), degrees per day
+        self.wind_v = None  # Meridional wind component (South-North), degrees per day
         self.lons = None
         self.lats = None
+        self.sampler = None  # Batched bilinear sampler over (u, v)
+        self.cache_dir = None  # Field cache the wind was loaded from
+        self.dtype = np.dtype(dtype)  # Storage precision of the wind fields
 
-    def download_era5_data(self, year=None, month=None, day=None):
+    def download_era5_data(self, year=None, month=None, day=None, provider=None, strict=False):
         """
-        Download ERA5 wind data for a specific date.
+        Load ERA5 wind data for a specific date through the local wind cache.
         If no date provided or if requested date is unavailable, use a fallback date.
+        Args:
+            provider: WindProvider to fetch through (defaults to the shared
+                `WindProvider.shared()`, i.e. CDS unless ERA5_BACKEND is set)
+            strict: raise instead of falling back to a zero wind field
         """
         if year is None or month is None or day is None:
             # Use a known good date as fallback
             year, month, day = 2025, 2, 12
-        
-        try:
-            self.client = cdsapi.Client()
-            
-            output_file = f'wind_data_{year}{month:02d}{day:02d}.nc'
-            if not Path(output_file).exists():
-                print(f"Downloading wind data for {year}-{month:02d}-{day:02d}...")
-                self.client.retrieve(
-                    'reanalysis-era5-single-levels',
-                    {
-                        'product_type': 'reanalysis',
-                        'variable': [
-                            '10m_u_component_of_wind',
-                            '10m_v_component_of_wind',
-                        ],
-                        'year': str(year),
-                        'month': f"{month:02d}",
-                        'day': f"{day:02d}",
-                        'time': [f"{hour:02d}:00" for hour in range(24)],
-                        'format': 'netcdf',
-                    },
-                    output_file
-                )
-            
-            # Load the NetCDF file
-            ds = xr.open_dataset(output_file)
-            
-            # Store wind components (daily mean)
-            self.wind_u = ds['u10'].mean(dim='time').values
-            self.wind_v = ds['v10'].mean(dim='time').values
-            self.lons = ds['longitude'].values
-            self.lats = ds['latitude'].values
-            
-            ds.close()
-            print(f"Successfully loaded wind data for {year}-{month:02d}-{day:02d}")
-            
-        except Exception as e:
-            print(f"Error loading wind data: {str(e)}")
-            print("Using fallback date: 2025-02-12")
-            # Try again with fallback date if we haven't already
-            if (year, month, day) != (2025, 2, 12):
-                self.download_era5_data(2025, 2, 12)
-            else:
-                # If even fallback fails, initialize with zeros
-                print("Warning: Using zero wind field as fallback")
-                self.wind_u = np.zeros((181, 360))  # -90 to 90 lat, 0 to 359 lon
-                self.wind_v = np.zeros((181, 360))
-                self.lons = np.arange(0, 360)
-                self.lats = np.linspace(-90, 90, 181)
+
+        provider = provider or WindProvider.shared()
+        candidates = [date(year, month, day)]
+        if candidates[0] != FALLBACK_DATE:
+            candidates.append(FALLBACK_DATE)
+
+        for requested in candidates:
+            try:
+                path = provider.files(requested)[0]
+                # Daily means are computed once and cached next to the NetCDF file
+                self.load_cache(default_cache_dir(path, self.dtype), source=path, day=requested)
+                print(f"Successfully loaded wind data for {requested}")
+                return
+            except Exception as e:
+                print(f"Error loading wind data for {requested}: {str(e)}")
+                if requested != FALLBACK_DATE:
+                    print(f"Using fallback date: {FALLBACK_DATE}")
+
+        if strict:
+            raise RuntimeError(f"No ERA5 wind available for {candidates[0]}")
+        # If even fallback fails, initialize with zeros
+        print("Warning: Using zero wind field as fallback")
+        self.wind_u = np.zeros((181, 360))  # -90 to 90 lat, 0 to 359 lon
+        self.wind_v = np.zeros((181, 360))
+        self.lons = np.arange(0, 360)
+        self.lats = np.linspace(-90, 90, 181)
+        self.sampler = GridSampler(self.lons, self.lats, self.wind_u, self.wind_v,
+                                   dtype=self.dtype)
+
+    def load_era5_range(self, start, end, provider=None, prefetch_days=0):
+        """
+        Use time-varying ERA5 wind for a date range, fetching missing days
+        through the local wind cache.
+        Args:
+            start, end: first and last date (inclusive)
+            provider: WindProvider to fetch through
+            prefetch_days: days after `end` to start fetching in the background
+        """
+        provider = provider or WindProvider.shared()
+        self.load_era5_series(provider.files(start, end))
+        if prefetch_days:
+            provider.prefetch(as_date(end) + timedelta(days=1), prefetch_days)
+
+    def _select_day(self, day):
+        """Restrict a multi-day daily-mean cache to a single day."""
+        times = self.sampler.times
+        if len(times) == 1:
+            return
+        t = days_since_epoch(datetime.combine(day, datetime.min.time()))
+        k = int(np.clip(np.searchsorted(times, t), 0, len(times) - 1))
+        self.wind_u, self.wind_v = self.sampler.record(k)
+        self.sampler = GridSampler(self.lons, self.lats, self.wind_u, self.wind_v,
+                                   dtype=self.dtype)
+
+    def load_cache(self, cache_dir, source=None, day=None):
+        """
+        Use wind from a preprocessed field cache (memory-mapped, no decoding).
+        Args:
+            cache_dir: cache directory written by `field_cache.build_field_cache`
+            source: ERA5 NetCDF file(s) to build a daily-mean cache from when
+                the cache is missing or out of date
+            day: restrict a multi-day cache to this date
+        """
+        if source is not None:
+            self.sampler = open_field_cache(source, cache_dir, u_var='u10', v_var='v10',
+                                            daily_mean=True, dtype=self.dtype)
+        else:
+            self.sampler = FieldCache(cache_dir)
+        self.cache_dir = cache_dir
+        self.wind_u, self.wind_v = self.sampler.record(0)
+        self.lons = self.sampler.lons
+        self.lats = self.sampler.lats
+        if day is not None:
+            self._select_day(day)
+
+    def load_era5_series(self, files):
+        """
+        Use time-varying ERA5 wind from a series of NetCDF files.
+        Hourly and daily files are both supported; fields are interpolated
+        linearly between records instead of being averaged to one day.
+        Args:
+            files: glob pattern or list of ERA5 NetCDF files
+        """
+        print("Indexing wind files...")
+        self.sampler = WindowedFieldProvider(files, u_var='u10', v_var='v10', dtype=self.dtype)
+        self.lons = self.sampler.lons
+        self.lats = self.sampler.lats
+        print(f"Indexed {len(self.sampler.times)} wind fields "
+              f"from {len(self.sampler.paths)} files")
+
+    def load_nested(self, domains, release_after=None):
+        """
+        Use wind from nested grids, finest regional domain first.
+        Each position is sampled from the finest grid covering it; regional
+        grids are opened only once a particle enters them.
+        Args:
+            domains: `nested_grid.NestedDomain` objects, field cache
+                directories or ERA5 NetCDF globs, global grid last
+            release_after: close a regional grid after this many sampling
+                calls without particles inside it
+        """
+        self.sampler = NestedFieldProvider(domains, release_after=release_after,
+                                           u_var='u10', v_var='v10', dtype=self.dtype)
+        self.lons = self.sampler.lons
+        self.lats = self.sampler.lats
+        print(f"Nested wind domains: {', '.join(d.name for d in self.sampler.domains)}")
 
     def get_wind_velocity(self, position):
         """
@@ -76,50 +143,22 @@ class WindData:
         Args:
             position: tuple (longitude, latitude)
         Returns:
-            tuple (u_wind, v_wind) in m/s
+            (u_wind, v_wind) in degrees per day
+        """
+        return self.get_wind_velocities(np.asarray(position)[None, :])[0]
+
+    def get_wind_velocities(self, positions, t=None):
+        """
+        Get interpolated wind velocities for many positions at once.
+        Args:
+            positions: (N, 2) array of (longitude, latitude)
+            t: time in days since 1970-01-01 for time-varying wind
+        Returns:
+            (N, 2) array of (u_wind, v_wind) in degrees per day; ERA5 fields
+            are converted from m/s once when read or cached (see `units.py`)
         """
-        if self.wind_u is None or self.wind_v is None:
-            return np.array([0., 0.])
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if self.sampler is None:
+            return np.zeros_like(positions)
 
-        lon, lat = position
-        
-        # Convert longitude to 0-360 range if needed
-        lon = lon % 360
-        
-        # Find indices for interpolation
-        lon_idx = np.searchsorted(self.lons, lon)
-        lat_idx = np.searchsorted(self.lats, lat)
-        
-        # Bilinear interpolation
-        lon_prev = self.lons[lon_idx - 1]
-        lon_next = self.lons[lon_idx]
-        lat_prev = self.lats[lat_idx - 1]
-        lat_next = self.lats[lat_idx]
-        
-        # Calculate weights
-        w_lon = (lon - lon_prev) / (lon_next - lon_prev)
-        w_lat = (lat - lat_prev) / (lat_next - lat_prev)
-        
-        # Get wind components at surrounding points
-        u00 = self.wind_u[lat_idx-1, lon_idx-1]
-        u01 = self.wind_u[lat_idx-1, lon_idx]
-        u10 = self.wind_u[lat_idx, lon_idx-1]
-        u11 = self.wind_u[lat_idx, lon_idx]
-        
-        v00 = self.wind_v[lat_idx-1, lon_idx-1]
-        v01 = self.wind_v[lat_idx-1, lon_idx]
-        v10 = self.wind_v[lat_idx, lon_idx-1]
-        v11 = self.wind_v[lat_idx, lon_idx]
-        
-        # Interpolate
-        u_wind = (1 - w_lon) * (1 - w_lat) * u00 + \
-                 w_lon * (1 - w_lat) * u01 + \
-                 (1 - w_lon) * w_lat * u10 + \
-                 w_lon * w_lat * u11
-        
-        v_wind = (1 - w_lon) * (1 - w_lat) * v00 + \
-                 w_lon * (1 - w_lat) * v01 + \
-                 (1 - w_lon) * w_lat * v10 + \
-                 w_lon * w_lat * v11
-        
-        return np.array([u_wind, v_wind])
+        return self.sampler.sample_positions(positions, t)
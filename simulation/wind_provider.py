@@ -0,0 +1,334 @@
+"""
+Offline-first ERA5 wind provider with a content-addressed local cache.
+
+Wind files are fetched through a pluggable backend and stored under
+
+    <cache_dir>/objects/<hash[:2]>/<hash>.nc
+    <cache_dir>/index.json      date -> object hash
+
+where the hash is the SHA-256 of the canonical request (backend, dataset,
+variables and dates). Requests only go to the backend for dates missing
+from the index, so a populated cache works fully offline. Missing dates are
+fetched in batches (one CDS request per month by default) and upcoming days
+can be prefetched on background threads.
+
+Backends:
+
+- `CDSBackend`: Copernicus Climate Data Store via `cdsapi` (imported lazily)
+- `DirectoryBackend`: daily files from a local directory (air-gapped runs)
+- `MockBackend`: synthetic ERA5-layout fields, no I/O beyond the cache
+
+`get_backend('cds' | 'mock' | 'dir:/path')` builds one from a string, and
+`WindProvider.from_env()` reads `ERA5_BACKEND` and `ERA5_CACHE_DIR`.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from forcing import NETCDF_LOCK
+
+VARIABLES = ('10m_u_component_of_wind', '10m_v_component_of_wind')
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def date_range(start, end):
+    """Inclusive list of dates from `start` to `end`."""
+    start, end = as_date(start), as_date(end)
+    return [start + timedelta(days=k) for k in range((end - start).days + 1)]
+
+
+class CDSBackend:
+    """Retrieve hourly 10 m wind from the Copernicus Climate Data Store."""
+
+    name = 'cds'
+    dataset = 'reanalysis-era5-single-levels'
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import cdsapi
+
+            self._client = cdsapi.Client()
+        return self._client
+
+    def batches(self, dates):
+        """One request per (year, month)."""
+        groups = {}
+        for day in dates:
+            groups.setdefault((day.year, day.month), []).append(day)
+        return list(groups.values())
+
+    def fetch(self, dates, target):
+        year, month = dates[0].year, dates[0].month
+        self.client.retrieve(
+            self.dataset,
+            {
+                'product_type': 'reanalysis',
+                'variable': list(VARIABLES),
+                'year': str(year),
+                'month': f"{month:02d}",
+                'day': [f"{day.day:02d}" for day in dates],
+                'time': [f"{hour:02d}:00" for hour in range(24)],
+                'format': 'netcdf',
+            },
+            target
+        )
+
+
+class DirectoryBackend:
+    """Copy daily ERA5 files (e.g. `wind_data_20250212.nc`) from a local directory."""
+
+    def __init__(self, directory, pattern='wind_data_{:%Y%m%d}.nc'):
+        self.directory = os.path.abspath(directory)
+        self.pattern = pattern
+        self.name = f'dir:{self.directory}'
+        self.dataset = 'local'
+
+    def batches(self, dates):
+        return [[day] for day in dates]
+
+    def fetch(self, dates, target):
+        source = os.path.join(self.directory, self.pattern.format(dates[0]))
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"No wind file for {dates[0]} in {self.directory}")
+        shutil.copyfile(source, target)
+
+
+class MockBackend:
+    """Synthetic hourly ERA5-layout wind (steady westerlies plus a daily cycle)."""
+
+    name = 'mock'
+    dataset = 'mock'
+
+    def __init__(self, resolution=1.0, speed=5.0):
+        self.resolution = resolution
+        self.speed = speed
+        self.requests = []  # Dates of each fetch, for tests
+
+    def batches(self, dates):
+        return [dates] if dates else []
+
+    def fetch(self, dates, target):
+        from netCDF4 import Dataset
+
+        self.requests.append(list(dates))
+        lons = np.arange(0, 360, self.resolution)
+        lats = np.arange(90, -90 - self.resolution / 2, -self.resolution)
+        hours = len(dates) * 24
+        lat_profile = np.cos(np.radians(lats))[:, None] * np.ones(len(lons))
+        with NETCDF_LOCK, Dataset(target, 'w') as nc:
+            nc.createDimension('valid_time', hours)
+            nc.createDimension('latitude', len(lats))
+            nc.createDimension('longitude', len(lons))
+            time_var = nc.createVariable('valid_time', 'i8', ('valid_time',))
+            time_var.units = f'hours since {dates[0]:%Y-%m-%d}'
+            time_var[:] = [(day - dates[0]).days * 24 + hour for day in dates for hour in range(24)]
+            nc.createVariable('latitude', 'f8', ('latitude',))[:] = lats
+            nc.createVariable('longitude', 'f8', ('longitude',))[:] = lons
+            u10 = nc.createVariable('u10', 'f4', ('valid_time', 'latitude', 'longitude'))
+            v10 = nc.createVariable('v10', 'f4', ('valid_time', 'latitude', 'longitude'))
+            for k in range(hours):
+                cycle = np.sin(2 * np.pi * k / 24)
+                u10[k] = self.speed * lat_profile
+                v10[k] = 0.2 * self.speed * cycle * lat_profile
+
+
+def get_backend(spec):
+    """Build a backend from 'cds', 'mock' or 'dir:/path/to/files'."""
+    if not isinstance(spec, str):
+        return spec
+    if spec == 'cds':
+        return CDSBackend()
+    if spec == 'mock':
+        return MockBackend()
+    if spec.startswith('dir:'):
+        return DirectoryBackend(spec[4:])
+    raise ValueError(f"Unknown ERA5 backend '{spec}' (use 'cds', 'mock' or 'dir:PATH')")
+
+
+# Providers returned by `WindProvider.shared`, keyed by process and environment
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+
+class WindProvider:
+    """
+    Content-addressed ERA5 cache in front of a backend.
+
+    `files(start, end)` returns local NetCDF files covering the dates,
+    fetching only what is missing; `prefetch(start, days)` starts fetching
+    upcoming dates in the background.
+    """
+
+    def __init__(self, backend='cds', cache_dir='era5_cache', retries=3, backoff=5.0,
+                 workers=2):
+        """
+        Parameters
+        ----------
+        backend : str or backend object
+            Data source (see `get_backend`)
+        cache_dir : str
+            Local cache directory
+        retries : int
+            Attempts per batch before giving up
+        backoff : float
+            Seconds to wait before the first retry (doubled each time)
+        workers : int
+            Background threads used by `prefetch`
+        """
+        self.backend = get_backend(backend)
+        self.cache_dir = cache_dir
+        self.retries = max(int(retries), 1)
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._inflight = {}  # Request hash -> future of a running fetch
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self.index = self._load_index()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Provider configured by `ERA5_BACKEND` and `ERA5_CACHE_DIR`."""
+        return cls(backend=os.environ.get('ERA5_BACKEND', 'cds'),
+                   cache_dir=os.environ.get('ERA5_CACHE_DIR', 'era5_cache'), **kwargs)
+
+    @classmethod
+    def shared(cls):
+        """
+        Process-wide `from_env` provider, reused by every caller that does
+        not pass its own (one fetch thread pool per process).
+        """
+        key = (os.getpid(), os.environ.get('ERA5_BACKEND', 'cds'),
+               os.environ.get('ERA5_CACHE_DIR', 'era5_cache'))
+        with _SHARED_LOCK:
+            if key not in _SHARED:
+                _SHARED[key] = cls.from_env()
+            return _SHARED[key]
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def request_key(self, dates):
+        """SHA-256 of the canonical request for `dates`."""
+        request = {
+            'backend': self.backend.name,
+            'dataset': self.backend.dataset,
+            'variables': list(VARIABLES),
+            'dates': [day.isoformat() for day in dates],
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def object_path(self, key):
+        return os.path.join(self.cache_dir, 'objects', key[:2], f'{key}.nc')
+
+    def cached_path(self, day):
+        """Cached file containing `day`, or None."""
+        key = self.index.get(as_date(day).isoformat())
+        if key is not None and os.path.exists(self.object_path(key)):
+            return self.object_path(key)
+        return None
+
+    def _fetch_batch(self, dates, key):
+        """Fetch one batch with bounded retries and record it in the index."""
+        path = self.object_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + f'.{os.getpid()}.{threading.get_ident()}.part'
+            delay = self.backoff
+            for attempt in range(1, self.retries + 1):
+                try:
+                    print(f"Fetching ERA5 wind for {dates[0]}..{dates[-1]} "
+                          f"from {self.backend.name} (attempt {attempt})...")
+                    self.backend.fetch(dates, tmp_path)
+                    os.replace(tmp_path, path)
+                    break
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(delay)
+                    delay *= 2
+
+        with self._lock:
+            for day in dates:
+                self.index[day.isoformat()] = key
+            self._save_index()
+        return path
+
+    def _submit_missing(self, dates):
+        """Futures fetching every missing date, reusing fetches already in flight."""
+        missing = [day for day in dates if self.cached_path(day) is None]
+        futures = []
+        started = []
+        with self._lock:
+            for batch in self.backend.batches(missing):
+                key = self.request_key(batch)
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._executor.submit(self._fetch_batch, batch, key)
+                    self._inflight[key] = future
+                    started.append((key, future))
+                futures.append(future)
+        # Callbacks of already finished futures run inline, and `_forget`
+        # takes the lock, so they are attached only after releasing it
+        for key, future in started:
+            future.add_done_callback(lambda _, key=key: self._forget(key))
+        return futures
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def files(self, start, end=None):
+        """Local files covering `start`..`end` (inclusive), fetching missing dates."""
+        dates = date_range(start, end if end is not None else start)
+        for future in self._submit_missing(dates):
+            future.result()
+        paths = []
+        for day in dates:
+            path = self.cached_path(day)
+            if path is None:
+                raise FileNotFoundError(f"ERA5 wind for {day} is not available")
+            if path not in paths:
+                paths.append(path)
+        return paths
+
+    def prefetch(self, start, days=3):
+        """Start fetching `days` dates from `start` in the background."""
+        dates = date_range(start, as_date(start) + timedelta(days=days - 1))
+        return self._submit_missing(dates)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,236 @@
+"""
+Spatial index over a combined debris FeatureCollection.
+
+The index is stored next to the combined output as `<output>.index.npz`.
+It holds the feature geometries as WKB, each feature's properties as a JSON
+string, and the size/mtime of the source file. Loading it only needs a
+WKB decode and an STRtree bulk load; the GeoJSON is not parsed again.
+
+Queries use GeoJSON longitudes (-180..180). `nearest` also accepts the
+simulation's 0-360° particle positions, so trajectories from
+`PlasticPathTracker` or `EnsembleTracker` can be matched against observed
+debris directly:
+
+    index = open_feature_index('combined_nasa_data.json')
+    ids, km = index.nearest(tracker.path_history, max_distance_km=50)
+"""
+import json
+import os
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+LAT_BAND = 10.0  # Degrees of |latitude| sharing one nearest-search radius
+
+
+def index_path(geojson_path):
+    return geojson_path + '.index.npz'
+
+
+def _source_state(path):
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _to_geojson_lon(lon):
+    return (np.asarray(lon, dtype=np.float64) + 180) % 360 - 180
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance in kilometres."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def build_feature_index(geojson_path, output_path=None):
+    """Index the features of `geojson_path` and save the index; returns the index."""
+    import shapely
+    from shapely.geometry import shape
+
+    with open(geojson_path) as f:
+        features = json.load(f)['features']
+    geometries = np.array([shape(feature['geometry']) for feature in features], dtype=object)
+    properties = np.array([json.dumps(feature.get('properties'), separators=(',', ':'))
+                           for feature in features], dtype=object)
+
+    output_path = output_path or index_path(geojson_path)
+    with open(output_path + '.tmp', 'wb') as f:
+        np.savez(f, wkb=shapely.to_wkb(geometries).astype(object), properties=properties,
+                 source=_source_state(geojson_path))
+    os.replace(output_path + '.tmp', output_path)
+    print(f"Indexed {len(features)} features -> {output_path}")
+    return FeatureIndex(geometries, properties)
+
+
+def open_feature_index(geojson_path):
+    """Load the index stored next to `geojson_path`, rebuilding it if stale."""
+    path = index_path(geojson_path)
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=True) as data:
+            if np.array_equal(data['source'], _source_state(geojson_path)):
+                return FeatureIndex.from_arrays(data['wkb'], data['properties'])
+    return build_feature_index(geojson_path, path)
+
+
+class FeatureIndex:
+    """
+    STRtree over debris feature geometries with bbox, radius and nearest queries.
+
+    Queries return feature indices; `features(indices)` turns them back
+    into GeoJSON Feature dicts.
+    """
+
+    def __init__(self, geometries, properties):
+        from shapely import STRtree
+
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.properties = properties
+        self.tree = STRtree(self.geometries)
+
+    @classmethod
+    def from_arrays(cls, wkb, properties):
+        import shapely
+
+        return cls(shapely.from_wkb(wkb), properties)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def feature(self, i):
+        """GeoJSON Feature dict for feature `i`."""
+        from shapely.geometry import mapping
+
+        return {
+            'type': 'Feature',
+            'properties': json.loads(self.properties[i]),
+            'geometry': mapping(self.geometries[i]),
+        }
+
+    def features(self, indices):
+        """FeatureCollection of the given features (e.g. a viewport subset)."""
+        return {'type': 'FeatureCollection', 'features': [self.feature(i) for i in indices]}
+
+    def query_bbox(self, west, south, east, north):
+        """Sorted indices of features intersecting the box (handles the antimeridian)."""
+        from shapely import box
+
+        west, east = _to_geojson_lon([west, east]) if east - west < 360 else (-180, 180)
+        boxes = ([box(west, south, east, north)] if west <= east
+                 else [box(west, south, 180, north), box(-180, south, east, north)])
+        hits = [self.tree.query(b, predicate='intersects') for b in boxes]
+        return np.unique(np.concatenate(hits)) if hits else np.array([], dtype=np.int64)
+
+    def query_radius(self, lon, lat, radius_km):
+        """
+        Features within `radius_km` of a point.
+
+        Returns
+        -------
+        tuple
+            (indices, distances in km), sorted by distance
+        """
+        import shapely
+
+        lon = float(_to_geojson_lon(lon))
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        candidates = self.query_bbox(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+        if len(candidates) == 0:
+            return candidates, np.array([])
+
+        # Exact distance between the point and the nearest point of each candidate
+        lines = shapely.shortest_line(shapely.points(lon, lat), self.geometries[candidates])
+        ends = shapely.get_coordinates(lines).reshape(-1, 2, 2)[:, 1]
+        distances = haversine_km(lon, lat, ends[:, 0], ends[:, 1])
+        keep = distances <= radius_km
+        order = np.argsort(distances[keep])
+        return candidates[keep][order], distances[keep][order]
+
+    def _query_nearest(self, points, radius=None):
+        """
+        STRtree nearest feature for each point, optionally within per-point
+        search radii in degrees; returns (point indices, feature indices).
+        """
+        if radius is None:
+            return self.tree.query_nearest(points, all_matches=False)
+        hits, tree_ids = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+        for r in np.unique(radius):
+            group = np.flatnonzero(radius == r)
+            hit, ids = self.tree.query_nearest(points[group], max_distance=r, all_matches=False)
+            hits.append(group[hit])
+            tree_ids.append(ids)
+        return np.concatenate(hits), np.concatenate(tree_ids)
+
+    def nearest(self, positions, max_distance_km=None):
+        """
+        Nearest feature to each particle position.
+
+        The nearest feature is chosen in lon/lat degrees by the STRtree; the
+        reported distance is the great-circle distance to that feature.
+        With `max_distance_km`, the degree search radius widens with each
+        point's latitude band. Points near the antimeridian are also matched
+        against features across it, and the closer of the two is kept.
+
+        Parameters
+        ----------
+        positions : array_like
+            (N, 2) or (..., 2) positions; 0-360° longitudes are accepted
+        max_distance_km : float, optional
+            Ignore features farther than this
+
+        Returns
+        -------
+        tuple
+            (indices, distances in km) shaped like `positions[..., 0]`;
+            -1 and inf where no feature is within range
+        """
+        import shapely
+
+        positions = np.asarray(positions, dtype=np.float64)
+        shape = positions.shape[:-1]
+        positions = positions.reshape(-1, 2)
+        lon = _to_geojson_lon(positions[:, 0])
+        lat = positions[:, 1]
+        points = shapely.points(lon, lat)
+
+        # Search in degrees with a margin that covers the longitude stretch at
+        # the poleward edge of each point's latitude band
+        radius = None
+        if max_distance_km is not None:
+            edge = np.minimum((np.floor(np.abs(lat) / LAT_BAND) + 1) * LAT_BAND, 90)
+            radius = max_distance_km / KM_PER_DEGREE / np.maximum(np.cos(np.radians(edge)), 1e-6)
+
+        indices = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), np.inf)
+        reach = np.full(len(points), np.inf) if radius is None else radius.copy()
+
+        def match(points, candidates):
+            hit, tree_ids = self._query_nearest(
+                points[candidates], None if radius is None else radius[candidates])
+            if len(hit) == 0:
+                return
+            hit_points = points[candidates][hit]
+            geometries = self.geometries[tree_ids]
+            hit = candidates[hit]
+            lines = shapely.shortest_line(hit_points, geometries)
+            ends = shapely.get_coordinates(lines).reshape(-1, 2, 2)[:, 1]
+            km = haversine_km(lon[hit], lat[hit], ends[:, 0], ends[:, 1])
+            better = km < distances[hit]
+            if max_distance_km is not None:
+                better &= km <= max_distance_km
+            indices[hit[better]] = tree_ids[better]
+            distances[hit[better]] = km[better]
+            reach[hit] = np.minimum(reach[hit], shapely.distance(hit_points, geometries))
+
+        match(points, np.arange(len(points)))
+
+        # Features across the antimeridian are 360° away in degrees; retry the
+        # points within reach of it with their longitude shifted by 360°
+        seam = np.flatnonzero(180 - np.abs(lon) < reach)
+        if len(seam):
+            shifted = shapely.points(np.where(lon > 0, lon - 360, lon + 360), lat)
+            match(shifted, seam)
+        return indices.reshape(shape), distances.reshape(shape)
@@ -0,0 +1,233 @@
+"""
+Streaming GeoJSON combiner shared by the NASA and NTUA label pipelines.
+
+Source files are parsed in a process pool, and each worker hands back its
+features already serialized as one JSON text fragment. The main process
+writes these fragments to the output in file order as they arrive, so the
+combined FeatureCollection is never built in memory. At most two files per
+worker are submitted ahead of the writer, so finished fragments cannot pile
+up in the main process when parsing outpaces writing.
+
+With `incremental=True`, each file's fragment is also cached on disk next
+to the output, along with a manifest that records the file's size, mtime
+and SHA-256. On the next run, files whose size and mtime (or, failing
+that, content hash) have not changed reuse their cached fragment and are
+not parsed again.
+"""
+import glob
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_fragment(path):
+    """
+    Parse one GeoJSON file and serialize its features.
+
+    Returns
+    -------
+    tuple
+        (path, fragment, feature count, crs or None, error message or None),
+        where fragment is the comma-joined minified features
+    """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except Exception as e:
+        return path, '', 0, None, str(e)
+
+    features = data.get('features')
+    if features is None:
+        return path, '', 0, data.get('crs'), 'no features'
+    fragment = ','.join(json.dumps(feature, separators=(',', ':')) for feature in features)
+    return path, fragment, len(features), data.get('crs'), None
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def _load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+def _fragment_name(path):
+    return hashlib.sha1(os.path.abspath(path).encode()).hexdigest() + '.json'
+
+
+def combine_geojson(pattern, output_path, keep_crs=False, incremental=False, workers=None,
+                    cache_dir=None):
+    """
+    Combine the features of all files matching `pattern` into one FeatureCollection.
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern of input GeoJSON files
+    output_path : str
+        Combined output file (written minified)
+    keep_crs : bool
+        Copy the `crs` member of the first file that has one
+    incremental : bool
+        Only re-read files changed since the last incremental run
+    workers : int, optional
+        Number of parser processes (defaults to the CPU count)
+    cache_dir : str, optional
+        Fragment cache for incremental mode (defaults to `<output>.cache`)
+
+    Returns
+    -------
+    tuple
+        (number of files, number of features)
+    """
+    geojson_files = sorted(glob.glob(pattern))
+    cache_dir = cache_dir or output_path + '.cache'
+
+    manifest = {}
+    if incremental:
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest = _load_manifest(cache_dir)
+
+    # Decide which files must be parsed again
+    entries = {}
+    stale = []
+    for path in geojson_files:
+        entry = manifest.get(path)
+        state = _file_state(path)
+        if entry is not None and os.path.exists(os.path.join(cache_dir, entry['fragment'])):
+            if entry['size'] == state['size'] and entry['mtime'] == state['mtime']:
+                entries[path] = entry
+                continue
+            # Touched but maybe not modified: compare contents
+            if entry['size'] == state['size'] and entry['sha256'] == file_sha256(path):
+                entries[path] = dict(entry, **state)
+                continue
+        stale.append(path)
+
+    if incremental:
+        print(f"Reusing {len(entries)} cached files, reading {len(stale)}")
+
+    tmp_path = output_path + '.tmp'
+    total_features = 0
+    crs = None
+    with open(tmp_path, 'w') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        # Futures for the next stale files, in the order of `stale` (file order)
+        queued = iter(stale)
+        pending = deque()
+        window = 2 * (workers or os.cpu_count() or 1)
+
+        def submit_ahead():
+            while len(pending) < window:
+                path = next(queued, None)
+                if path is None:
+                    break
+                pending.append(pool.submit(read_fragment, path))
+
+        submit_ahead()
+
+        out.write('{"type":"FeatureCollection","features":[')
+        first = True
+        for path in geojson_files:
+            if path in entries:
+                entry = entries[path]
+                with open(os.path.join(cache_dir, entry['fragment'])) as f:
+                    fragment = f.read()
+                count, file_crs, error = entry['features'], entry.get('crs'), None
+            else:
+                # The oldest pending future is always the file being written
+                _, fragment, count, file_crs, error = pending.popleft().result()
+                submit_ahead()
+                if error is None and incremental:
+                    name = _fragment_name(path)
+                    with open(os.path.join(cache_dir, name), 'w') as f:
+                        f.write(fragment)
+                    entries[path] = dict(_file_state(path), sha256=file_sha256(path),
+                                         fragment=name, features=count, crs=file_crs)
+
+            if error == 'no features':
+                print(f"Warning: No features found in {path}")
+            elif error is not None:
+                print(f"Error processing {path}: {error}")
+            if crs is None and file_crs is not None:
+                crs = file_crs
+
+            if count:
+                if not first:
+                    out.write(',')
+                out.write(fragment)
+                first = False
+                total_features += count
+
+        out.write(']')
+        if keep_crs and crs:
+            out.write(',"crs":' + json.dumps(crs, separators=(',', ':')))
+        out.write('}')
+    os.replace(tmp_path, output_path)
+
+    if incremental:
+        # Drop fragments of files that no longer exist
+        live = {entry['fragment'] for entry in entries.values()}
+        for entry in manifest.values():
+            if entry['fragment'] not in live:
+                try:
+                    os.remove(os.path.join(cache_dir, entry['fragment']))
+                except OSError:
+                    pass
+        _save_manifest(cache_dir, entries)
+
+    print(f"Combined {len(geojson_files)} files with {total_features} total features")
+    print(f"Output saved to {output_path}")
+    return len(geojson_files), total_features
+
+
+def main(pattern, output_path, keep_crs=False):
+    """Command-line entry point used by the per-dataset scripts."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f'Combine {pattern} into {output_path}.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-read files changed since the last incremental run')
+    parser.add_argument('--workers', type=int, help='Number of parser processes')
+    parser.add_argument('--output', default=output_path)
+    parser.add_argument('--no-index', action='store_true',
+                        help='Skip building the spatial index (see feature_index.py)')
+    parser.add_argument('--tiles', metavar='DIR',
+                        help='Also build simplified per-zoom tiles into DIR (see geojson_tiles.py)')
+    parser.add_argument('--max-zoom', type=int, default=12)
+    args = parser.parse_args()
+    combine_geojson(pattern, args.output, keep_crs=keep_crs, incremental=args.incremental,
+                    workers=args.workers)
+
+    if not args.no_index:
+        from feature_index import build_feature_index
+
+        build_feature_index(args.output)
+
+    if args.tiles:
+        from geojson_tiles import build_tiles
+
+        build_tiles(args.output, args.tiles, max_zoom=args.max_zoom)
@@ -0,0 +1,240 @@
+"""
+Build stage that turns a combined label FeatureCollection into compact map tiles.
+
+For every zoom level the features are simplified to about one screen pixel
+(256 px tiles), coordinates are rounded to the matching number of decimals,
+and each feature is written to every slippy-map tile (z/x/y, Web Mercator
+scheme) that its bounding box touches. Polygon parts and holes that
+collapse below a pixel are dropped, and features with nothing left are
+written as their representative point, the same way the map already
+shows labels as points when zoomed out. Near-duplicate labels (overlapping
+polygons with a high intersection-over-union) are dropped once, before
+tiling.
+
+Output layout:
+
+    <out>/<z>/<x>/<y>.json      minified FeatureCollection per tile
+    <out>/<z>/<x>/<y>.json.gz   precompressed copy for static hosting
+    <out>/full.min.json(.gz)    all features at full tile precision
+    <out>/index.json            zoom range, tile list and byte sizes
+
+Usage:
+    python geojson_tiles.py combined_nasa_data.json tiles/nasa --max-zoom 12
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+
+MAX_LATITUDE = 85.0511287798  # Web Mercator limit
+TILE_SIZE = 256
+
+
+def pixel_size(zoom):
+    """Approximate size of one tile pixel in degrees at `zoom`."""
+    return 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+def zoom_decimals(zoom):
+    """Coordinate decimals that keep rounding error below one pixel."""
+    return max(0, math.ceil(-math.log10(pixel_size(zoom))))
+
+
+def tile_xy(lon, lat, zoom):
+    """Slippy-map tile containing (lon, lat)."""
+    n = 2 ** zoom
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def round_coordinates(coordinates, decimals):
+    """Round nested GeoJSON coordinates, dropping repeated vertices."""
+    if isinstance(coordinates[0], (int, float)):
+        return [round(float(c), decimals) for c in coordinates]
+    rounded = [round_coordinates(c, decimals) for c in coordinates]
+    if isinstance(rounded[0][0], float):
+        rounded = [p for k, p in enumerate(rounded) if k == 0 or p != rounded[k - 1]]
+    return rounded
+
+
+def drop_collapsed_rings(geometry_type, coordinates):
+    """
+    Drop polygon rings that rounding collapsed below four vertices.
+
+    Holes are dropped on their own; a polygon whose exterior ring collapsed
+    is dropped whole, per part for MultiPolygons. Returns the geometry type
+    and coordinates that remain, or (None, None) when nothing does.
+    """
+    if geometry_type == 'Polygon':
+        polygons = [coordinates]
+    elif geometry_type == 'MultiPolygon':
+        polygons = coordinates
+    else:
+        return geometry_type, coordinates
+
+    kept = [[ring for ring in polygon if len(ring) >= 4]
+            for polygon in polygons if len(polygon[0]) >= 4]
+    if not kept:
+        return None, None
+    if len(kept) == 1:
+        return 'Polygon', kept[0]
+    return 'MultiPolygon', kept
+
+
+def deduplicate(geometries, min_overlap=0.9):
+    """
+    Drop features whose polygon overlaps an earlier kept one with
+    intersection-over-union of at least `min_overlap`.
+
+    Returns the indices of the kept features.
+    """
+    from shapely import STRtree
+
+    tree = STRtree(geometries)
+    dropped = set()
+    kept = []
+    for i, geometry in enumerate(geometries):
+        if i in dropped:
+            continue
+        kept.append(i)
+        for j in tree.query(geometry, predicate='intersects'):
+            j = int(j)
+            if j <= i or j in dropped:
+                continue
+            other = geometries[j]
+            union = geometry.union(other).area
+            if union > 0 and geometry.intersection(other).area / union >= min_overlap:
+                dropped.add(j)
+    return kept
+
+
+def _dump(data, path, compress=True):
+    """Write minified JSON (and a gzip copy); returns the byte sizes."""
+    text = json.dumps(data, separators=(',', ':')).encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(text)
+    sizes = {'bytes': len(text)}
+    if compress:
+        packed = gzip.compress(text, compresslevel=9, mtime=0)
+        with open(path + '.gz', 'wb') as f:
+            f.write(packed)
+        sizes['gzip_bytes'] = len(packed)
+    return sizes
+
+
+def build_tiles(input_path, output_dir, min_zoom=0, max_zoom=12, min_overlap=0.9,
+                compress=True):
+    """
+    Simplify, deduplicate and tile a FeatureCollection.
+
+    Parameters
+    ----------
+    input_path : str
+        Combined GeoJSON file
+    output_dir : str
+        Directory for the tile pyramid
+    min_zoom, max_zoom : int
+        Zoom range to build
+    min_overlap : float
+        IoU above which overlapping labels count as duplicates (None keeps all)
+    compress : bool
+        Also write `.gz` copies
+
+    Returns
+    -------
+    dict
+        The tile index written to `index.json`
+    """
+    from shapely.geometry import mapping, shape
+
+    if not 0 <= min_zoom <= max_zoom:
+        raise ValueError(f"Zoom range must satisfy 0 <= min_zoom <= max_zoom "
+                         f"(got {min_zoom}..{max_zoom})")
+
+    with open(input_path) as f:
+        collection = json.load(f)
+    features = collection['features']
+    geometries = [shape(feature['geometry']) for feature in features]
+    print(f"Loaded {len(features)} features from {input_path}")
+
+    if min_overlap is not None:
+        kept = deduplicate(geometries, min_overlap)
+        print(f"Dropped {len(features) - len(kept)} duplicate labels")
+        features = [features[i] for i in kept]
+        geometries = [geometries[i] for i in kept]
+
+    index = {'min_zoom': min_zoom, 'max_zoom': max_zoom, 'zooms': {}}
+    extra = {'crs': collection['crs']} if 'crs' in collection else {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        tolerance = pixel_size(zoom)
+        decimals = zoom_decimals(zoom)
+        tiles = {}
+        level_features = []
+        for feature, geometry in zip(features, geometries):
+            simplified = geometry.simplify(tolerance, preserve_topology=True)
+            if simplified.is_empty or simplified.area < tolerance ** 2:
+                simplified = geometry.representative_point()
+            coordinates = round_coordinates(mapping(simplified)['coordinates'], decimals)
+            geometry_type, coordinates = drop_collapsed_rings(simplified.geom_type, coordinates)
+            if geometry_type is None:
+                # Every ring collapsed by rounding
+                point = geometry.representative_point()
+                geometry_type = point.geom_type
+                coordinates = round_coordinates(mapping(point)['coordinates'], decimals)
+            out = {
+                'type': 'Feature',
+                'properties': feature.get('properties'),
+                'geometry': {'type': geometry_type, 'coordinates': coordinates},
+            }
+            level_features.append(out)
+            west, south, east, north = geometry.bounds
+            x0, y0 = tile_xy(west, north, zoom)
+            x1, y1 = tile_xy(east, south, zoom)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    tiles.setdefault((x, y), []).append(out)
+
+        sizes = {}
+        for (x, y), tile_features in sorted(tiles.items()):
+            path = os.path.join(output_dir, str(zoom), str(x), f'{y}.json')
+            tile = dict({'type': 'FeatureCollection', 'features': tile_features}, **extra)
+            sizes[f'{x}/{y}'] = _dump(tile, path, compress)
+        index['zooms'][str(zoom)] = {'decimals': decimals, 'tiles': sizes}
+
+        if zoom == max_zoom:
+            full = dict({'type': 'FeatureCollection', 'features': level_features}, **extra)
+            index['full'] = _dump(full, os.path.join(output_dir, 'full.min.json'), compress)
+
+        total = sum(s['bytes'] for s in sizes.values())
+        print(f"Zoom {zoom}: {len(tiles)} tiles, {total / 1e3:.1f} kB")
+
+    with open(os.path.join(output_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build compact per-zoom tiles from a GeoJSON file.')
+    parser.add_argument('input', help='Combined GeoJSON FeatureCollection')
+    parser.add_argument('output_dir', help='Tile output directory')
+    parser.add_argument('--min-zoom', type=int, default=0)
+    parser.add_argument('--max-zoom', type=int, default=12)
+    parser.add_argument('--min-overlap', type=float, default=0.9,
+                        help='IoU above which overlapping labels are deduplicated')
+    parser.add_argument('--no-gzip', action='store_true')
+    args = parser.parse_args()
+    if not 0 <= args.min_zoom <= args.max_zoom:
+        parser.error("--min-zoom must lie in 0..--max-zoom")
+
+    index = build_tiles(args.input, args.output_dir, args.min_zoom, args.max_zoom,
+                        args.min_overlap, compress=not args.no_gzip)
+    print(f"Full layer: {index['full']['bytes'] / 1e3:.1f} kB "
+          f"({index['full'].get('gzip_bytes', 0) / 1e3:.1f} kB gzipped)")
+
+
+if __name__ == "__main__":
+    main()